@@ -0,0 +1,152 @@
+import glob
+import os
+import numpy as np
+from bf16Codec import floatToBF16, BF16ToFloat, allBF16Codes, isFiniteBF16
+from calculateMSE_exhaustive import REFERENCE_FUNCTIONS
+from evaluateActivationDumps import DEFAULT_CHUNK_SIZE, activationCodes, codeErrorTables, iterateChunks
+from artifactCache import cachedArtifact
+
+"""
+Histogram-weighted error metrics. A BF16 design only ever sees 65,536 different inputs, so an activation dataset of any size
+reduces to a histogram of how often every BF16 code occurs, built once in a streamed pass over the dumps.
+Scoring a design against the dataset is then a dot product between that histogram and the design's per-code error vector:
+
+    MSE = sum(counts * error^2) / sum(counts)        MAE = sum(counts * |error|) / sum(counts)
+
+which costs the same for a billion activations as for the 65,536 codes. Tail errors (percentiles of |error|) come from the
+cumulative histogram with the codes sorted on their error. The histograms of dump files are kept in the artifact cache,
+keyed on path, size and modification time.
+"""
+
+TAIL_PERCENTILES = (99.0, 99.9, 99.99)
+
+
+def codeHistogram(codes):
+    """
+    Counts per BF16 code of an array of codes (any shape).
+    """
+    return np.bincount(np.asarray(codes, dtype=np.uint16).reshape(-1), minlength=1 << 16).astype(np.int64)
+
+
+def _streamHistogram(dumps, chunkSize):
+    histogram = np.zeros(1 << 16, dtype=np.int64)
+    for _, chunk in iterateChunks(dumps, chunkSize):
+        histogram += np.bincount(activationCodes(chunk), minlength=1 << 16)
+    return histogram
+
+
+@cachedArtifact("activationHistogram.activation-histogram")
+def _fileHistogram(path, size, modificationTime, chunkSize):
+    return _streamHistogram(path, chunkSize)
+
+
+def activationHistogram(dumps, chunkSize=DEFAULT_CHUNK_SIZE):
+    """
+    BF16 histogram (65,536 int64 counts) of one or more dumps: paths, glob patterns or arrays, see evaluateActivationDumps.
+    The histogram of every file is cached, so a dataset is only read once.
+    """
+    if isinstance(dumps, (str, np.ndarray)):
+        dumps = [dumps]
+    histogram = np.zeros(1 << 16, dtype=np.int64)
+    for dump in dumps:
+        if isinstance(dump, str):
+            for path in sorted(glob.glob(dump)) or [dump]:
+                status = os.stat(path)
+                histogram += _fileHistogram(os.path.abspath(path), status.st_size, status.st_mtime_ns, chunkSize)
+        else:
+            histogram += _streamHistogram(dump, chunkSize)
+    return histogram
+
+
+def gridHistogram(xmin=-6.0, xmax=6.0, step=0.0625):
+    """
+    The uniform x grid of calculateMSE_silu/gelu/DyT.py (np.arange(-6, 6.0625, 0.0625)) as a histogram, for comparison.
+    """
+    return codeHistogram(floatToBF16(np.arange(xmin, xmax + step, step).astype(np.float32)))
+
+
+def histogramErrorStats(histogram, design, reference="silu", percentiles=TAIL_PERCENTILES):
+    """
+    MSE, MAE, max-abs-error, max-ULP-error and percentiles of |error| of the design, weighted by the histogram.
+    Non-finite codes are left out. The keys match calculateMSE_exhaustive.exhaustiveErrorStats, plus "p<percentile>AbsError".
+    """
+    if isinstance(reference, str):
+        reference = REFERENCE_FUNCTIONS[reference]
+    absErrors, ulpErrors = codeErrorTables(design, reference)
+    return histogramStatsFromErrors(histogram, absErrors, ulpErrors, percentiles)
+
+
+def histogramStatsFromErrors(histogram, absErrors, ulpErrors, percentiles=TAIL_PERCENTILES):
+    """
+    histogramErrorStats for precomputed per-code error vectors, e.g. to score one design against several datasets.
+    """
+    counts = np.where(isFiniteBF16(allBF16Codes()), histogram, 0).astype(np.float64)
+    n = counts.sum()
+    occurring = counts > 0 # only these enter the dot products: codes that never occur may have inf or NaN errors
+    worst = int(np.argmax(np.where(occurring, absErrors, -1.0)))
+    stats = {
+        "MSE": float(np.dot(counts[occurring], np.square(absErrors[occurring])) / n),
+        "MAE": float(np.dot(counts[occurring], absErrors[occurring]) / n),
+        "maxAbsError": float(absErrors[worst]),
+        "maxAbsErrorAt": float(BF16ToFloat(np.uint16(worst))),
+        "maxULPError": float(np.max(ulpErrors[occurring])),
+        "n": int(n),
+    }
+    order = np.argsort(absErrors[occurring], kind="stable")
+    cumulative = np.cumsum(counts[occurring][order])
+    sortedErrors = absErrors[occurring][order]
+    for percentile in percentiles:
+        index = min(int(np.searchsorted(cumulative, n * percentile / 100, side="left")), len(sortedErrors) - 1)
+        stats[f"p{percentile:g}AbsError"] = float(sortedErrors[index])
+    return stats
+
+
+def printHistogramStats(name, stats):
+    tails = "  ".join(f"{key[:-8]}: {value:.3e}" for key, value in stats.items() if key.startswith("p") and key.endswith("AbsError"))
+    print(f"{name:<16} MSE: {stats['MSE']:.3e}  MAE: {stats['MAE']:.3e}  max|err|: {stats['maxAbsError']:.3e} "
+          f"(at x={stats['maxAbsErrorAt']:.4f})  {tails}  ({stats['n']} inputs)")
+
+
+if __name__ == "__main__":
+    import shutil
+    import tempfile
+    import time
+    from evaluateActivationDumps import evaluateDumps
+    from lutGolden import lutDesign
+    from pwlSigmoidGolden import pwlDesign
+    from invSigmoidGolden import invSigmoidDesign
+    from hsiluGolden import hsiluDesign
+
+    directory = tempfile.mkdtemp()
+    rng = np.random.default_rng(0)
+    path = os.path.join(directory, "resnet_blocks_8x64x64x320.npy")
+    dump = np.lib.format.open_memmap(path, mode="w+", dtype=np.float32, shape=(8, 64, 64, 320))
+    for i in range(len(dump)):
+        dump[i] = rng.standard_normal((64, 64, 320), dtype=np.float32) * 1.5
+    dump.flush()
+    del dump
+
+    start = time.perf_counter()
+    histogram = activationHistogram(path)
+    print(f"histogram pass: {histogram.sum() / (time.perf_counter() - start) / 1e6:.1f} M activations/s")
+    start = time.perf_counter()
+    assert np.array_equal(activationHistogram(path), histogram)
+    print(f"cached histogram: {(time.perf_counter() - start) * 1e3:.2f} ms")
+
+    designs = {"LUT 2.4": lutDesign("silu", 2, 4), "LUT 3.6": lutDesign("silu", 3, 6), "InvSigmoid 64": invSigmoidDesign(64, "silu"),
+               "PWL 10": pwlDesign("10", "silu"), "PWL 20NonUniform": pwlDesign("20NonUniform", "silu"), "h-SiLU": hsiluDesign("silu")}
+    grid = gridHistogram()
+    for name, design in designs.items():
+        start = time.perf_counter()
+        stats = histogramErrorStats(histogram, design, "silu")
+        elapsed = time.perf_counter() - start
+        printHistogramStats(name, stats)
+        print(f"{'':<16} uniform grid MSE: {histogramErrorStats(grid, design, 'silu')['MSE']:.3e}, scored in {elapsed * 1e3:.1f} ms")
+
+    # the dot products must give what the streamed evaluation of every activation gives
+    streamed = evaluateDumps(path, {"PWL 10": designs["PWL 10"]}, "silu")["PWL 10"]
+    stats = histogramErrorStats(histogram, designs["PWL 10"], "silu")
+    assert stats["n"] == streamed["n"] and stats["maxAbsError"] == streamed["maxAbsError"]
+    assert np.isclose(stats["MSE"], streamed["MSE"], rtol=1e-9) and np.isclose(stats["MAE"], streamed["MAE"], rtol=1e-9)
+    assert stats["maxULPError"] == streamed["maxULPError"]
+    shutil.rmtree(directory)
@@ -0,0 +1,134 @@
+import numpy as np
+from calculateMSE_exhaustive import REFERENCE_FUNCTIONS, exhaustiveErrorStats
+from fpUnitsGolden import fpMult16ALT, fpAdd16ALT, actualExponent
+from lutGolden import lutActivation, lutEntries, lutFromInput
+from pwlSigmoidGolden import pwlDesign, PWL_VARIANTS
+from quadraticGolden import FP_ADD_LATENCY
+from toplevelThroughputModel import ACTIVATION_LATENCIES
+
+"""
+Finds the symmetries of the target functions and prices the half-range tables they allow.
+
+findSymmetry fits f(-x) = alpha * f(x) + beta * x + gamma by least squares on x > 0. An exact fit with alpha = +-1 is an
+identity that reconstructs the negative half from the positive one:
+
+    sigmoid    f(-x) = 1 - f(x)    point symmetric: mirrored intercepts 1 - q, or 1 - f(|x|) with an FPAdd16ALT
+    tanh       f(-x) = -f(x)       odd: a sign flip, no arithmetic
+    SiLU/GELU  f(-x) = f(x) - x    f(x) - f(-x) = x: f(|x|) + x with an FPAdd16ALT
+
+For the LUT designs, the half-range table stores only the entries of sign = 0, and negative inputs go through the identity.
+The golden models then measure the extra error that costs next to the storage and latency it saves. For the PWL
+sigmoid, the two Scala variants already are the two choices.
+"""
+
+LUT_SYMMETRIES = {"silu": "silu", "gelu": "gelu", "dyt": "tanh"} # design -> function whose identity it uses
+
+
+def findSymmetry(function, xmax=8.0, samples=4097, tolerance=1e-9):
+    """
+    Returns alpha, beta, gamma of f(-x) = alpha * f(x) + beta * x + gamma, the rms residual of the fit, and the identity
+    as a string, or None if the fit is not exact or alpha is not +-1.
+    """
+    name = function if isinstance(function, str) else getattr(function, "__name__", "custom")
+    if isinstance(function, str):
+        function = REFERENCE_FUNCTIONS[function]
+    x = np.linspace(xmax / samples, xmax, samples)
+    A = np.stack([function(x), x, np.ones_like(x)], axis=1)
+    (alpha, beta, gamma), *_ = np.linalg.lstsq(A, function(-x), rcond=None)
+    residual = float(np.sqrt(np.mean(np.square(A @ [alpha, beta, gamma] - function(-x)))))
+    identity = None
+    if residual < tolerance and np.isclose(abs(alpha), 1.0, atol=1e-6):
+        terms = [f"{'' if alpha > 0 else '-'}f(x)"]
+        if not np.isclose(beta, 0.0, atol=1e-6):
+            terms.append(f"{'+' if beta > 0 else '-'} {abs(beta):g}x".replace(" 1x", " x"))
+        if not np.isclose(gamma, 0.0, atol=1e-6):
+            terms.insert(0, f"{gamma:g} -" if alpha < 0 else f"{gamma:g} +")
+            terms[1] = terms[1].lstrip("-")
+        identity = "f(-x) = " + " ".join(terms)
+    return {"function": name, "alpha": float(alpha), "beta": float(beta), "gamma": float(gamma), "residual": residual,
+            "identity": identity}
+
+
+def halfRangeLutActivation(codes, function="silu", intBits=2, fracBits=4, alpha=0x3F80):
+    """
+    The LUT design with only the sign = 0 half of its table: negative inputs read the entry of |x| and apply the identity,
+    -LUT(|x|) for DyT and LUT(|x|) + x with an FPAdd16ALT for SiLU and GELU.
+    """
+    codes = np.asarray(codes, dtype=np.uint16)
+    if function == "dyt":
+        codes = fpMult16ALT(codes, alpha) # tanh_input
+    sign = (codes >> 15) & 1
+    lutValue = lutFromInput(codes & 0x7FFF, function, intBits, fracBits)
+    if function == "dyt":
+        lutValue = np.where(sign == 1, lutValue ^ 0x8000, lutValue)
+        outOfRange = np.where(sign == 1, 0xBF80, 0x3F80)
+    else:
+        lutValue = np.where(sign == 1, fpAdd16ALT(lutValue, codes), lutValue)
+        outOfRange = np.where(sign == 1, 0, codes)
+    output = np.where(actualExponent(codes) >= intBits, outOfRange, lutValue)
+    return np.where((codes & 0x7FFF) == 0, 0, output).astype(np.uint16)
+
+
+def lutSymmetryTradeoff(function="silu", intBits=3, fracBits=6, codes=None):
+    """
+    Storage, latency and error of the full and the half-range table of one LUT design, as a dict of dicts.
+    romBits counts distinct entries like estimateArea does.
+    """
+    table = lutEntries(function, intBits, fracBits)
+    half = table[:len(table) // 2]
+    reference = REFERENCE_FUNCTIONS[LUT_SYMMETRIES[function]]
+    extraLatency = 0 if function == "dyt" else FP_ADD_LATENCY
+    full = exhaustiveErrorStats(lambda c: lutActivation(c, function, intBits, fracBits), reference, codes=codes)
+    halved = exhaustiveErrorStats(lambda c: halfRangeLutActivation(c, function, intBits, fracBits), reference, codes=codes)
+    return {
+        "full": dict(full, entries=len(table), romBits=len(np.unique(table)) * 16, latency=ACTIVATION_LATENCIES["lut"]),
+        "half": dict(halved, entries=len(half), romBits=len(np.unique(half)) * 16, latency=ACTIVATION_LATENCIES["lut"] + extraLatency),
+        "identity": findSymmetry(LUT_SYMMETRIES[function])["identity"],
+    }
+
+
+def pwlSymmetryTradeoff(function="silu", codes=None):
+    """
+    The two ways the PWL sigmoid designs use 1 - f(x): mirrored intercepts (3 coefficients per segment) or the extra adder
+    (2 coefficients per segment, 3 more cycles).
+    """
+    choices = {}
+    for choice, name in [("mirroredIntercepts", "20NonUniform"), ("extraAdder", "20NonUniformExtraAdder")]:
+        variant = PWL_VARIANTS[name]
+        stats = exhaustiveErrorStats(pwlDesign(name, function), function, codes=codes)
+        choices[choice] = dict(stats, entries=len(variant["segments"]) * (3 if variant["signedInput"] else 2),
+                               romBits=len(variant["segments"]) * 16 * (3 if variant["signedInput"] else 2),
+                               latency=ACTIVATION_LATENCIES["pwl" + name])
+    choices["identity"] = findSymmetry("sigmoid")["identity"]
+    return choices
+
+
+def printTradeoff(name, tradeoff):
+    print(f"{name}: {tradeoff['identity']}")
+    for choice, row in tradeoff.items():
+        if choice == "identity":
+            continue
+        print(f"  {choice:<20} {row['entries']:>5} entries  {row['romBits']:>6} ROM bits  {row['latency']:>2} cycles  "
+              f"MSE {row['MSE']:.3e}  max|err| {row['maxAbsError']:.3e}  max ULP {row['maxULPError']:.1f}")
+
+
+if __name__ == "__main__":
+    from bf16Codec import BF16ToFloat
+    from calculateMSE_exhaustive import rangeCodes
+
+    expected = {"sigmoid": "f(-x) = 1 - f(x)", "tanh": "f(-x) = -f(x)", "silu": "f(-x) = f(x) - x", "gelu": "f(-x) = f(x) - x"}
+    for function, identity in expected.items():
+        symmetry = findSymmetry(function)
+        print(f"{function:<8} {symmetry['identity']}  (residual {symmetry['residual']:.1e})")
+        assert symmetry["identity"] == identity, symmetry
+    assert findSymmetry(np.exp)["identity"] is None
+
+    # an odd function loses nothing with half the table, the FPAdd16ALT of SiLU/GELU rounds once more
+    codes = rangeCodes(-8.0, 8.0)
+    codes = codes[np.abs(BF16ToFloat(codes)) >= 2.0**-20] # skip the BF16toFP wrap-around, see sweepDesignSpace.sweepCodes
+    dyt = lutSymmetryTradeoff("dyt", 3, 6, codes)
+    assert dyt["half"]["MSE"] == dyt["full"]["MSE"] and dyt["half"]["romBits"] <= dyt["full"]["romBits"] // 2 + 16
+    printTradeoff("DyT LUT 3.6", dyt)
+    for function in ["silu", "gelu"]:
+        printTradeoff(f"{function} LUT 3.6", lutSymmetryTradeoff(function, 3, 6, codes))
+        printTradeoff(f"{function} PWL sigmoid, 20 segments", pwlSymmetryTradeoff(function, codes))
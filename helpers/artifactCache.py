@@ -0,0 +1,291 @@
+import functools
+import hashlib
+import importlib
+import inspect
+import json
+import os
+import sys
+import tempfile
+import types
+import numpy as np
+
+"""
+Content-addressed on-disk cache for generated tables and coefficients.
+An artifact is identified by a spec, e.g. {"table": "silu", "min": -3.9375, "max": 4.0, "step": 0.0625, "rounding": "truncate"},
+plus the version of the function that computes it: its bytecode, its default arguments and the source of every helper
+module it depends on, so editing that function or anything it calls invalidates its old entries automatically.
+Arguments must be JSON-serializable (numbers, strings, lists, dicts), arrays are rejected rather than keyed by their repr.
+Artifacts are stored as .npy files named after the sha256 of the spec and loaded memory-mapped (read-only).
+The cache directory is bounded in size: the least recently used files are removed first.
+
+    @cachedArtifact("calculateMSE_silu.silu-table", rounding="truncate")
+    def siluTable(min, max, step):
+        ...
+        return np.stack([x, y])
+
+Set ACTIVATION_CACHE_DIR to move the cache, or ACTIVATION_CACHE_DISABLE=1 to always recompute.
+"""
+
+CACHE_VERSION = 1 # bump to invalidate every artifact, e.g. after a change in bf16Codec
+DEFAULT_CACHE_DIR = os.environ.get("ACTIVATION_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".artifactCache"))
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+
+HELPERS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def _helperModule(value):
+    # the helper module a global of a module belongs to (a module, function or class of this directory), or None
+    module = value if isinstance(value, types.ModuleType) else sys.modules.get(getattr(value, "__module__", None) or "")
+    path = getattr(module, "__file__", None)
+    if path and os.path.dirname(os.path.abspath(path)) == HELPERS_DIR:
+        return module
+    return None
+
+
+def helperModules(*modules):
+    """
+    The given helper modules (modules or names) and every helper module they import from, transitively, sorted by name.
+    This follows the imports of the modules themselves, so it does not depend on what else happens to be loaded.
+    """
+    found = {}
+    pending = [module if isinstance(module, types.ModuleType) else importlib.import_module(module) for module in modules]
+    while pending:
+        module = pending.pop()
+        name = module.__spec__.name if module.__name__ == "__main__" and module.__spec__ else module.__name__
+        if name in found:
+            continue
+        found[name] = module
+        pending += [dependency for dependency in map(_helperModule, vars(module).values()) if dependency is not None]
+    return [found[name] for name in sorted(found)]
+
+
+def sourceVersion(*modules):
+    """
+    Hash of the source of the given helper modules and everything they import from this directory (see helperModules).
+    """
+    digest = hashlib.sha256()
+    for module in helperModules(*modules):
+        with open(module.__file__, "rb") as f:
+            digest.update(os.path.basename(module.__file__).encode() + f.read())
+    return digest.hexdigest()[:16]
+
+
+def codeVersion(function):
+    """
+    Hash of the bytecode, constants and default arguments of a function, including nested functions and lambdas,
+    and of the source of the helper modules it depends on (sourceVersion of its module).
+    """
+    digest = hashlib.sha256()
+    def add(code):
+        digest.update(code.co_code)
+        digest.update(repr(code.co_names).encode())
+        for constant in code.co_consts:
+            if hasattr(constant, "co_code"):
+                add(constant)
+            else:
+                digest.update(repr(constant).encode())
+    add(function.__code__)
+    digest.update(_specJSON([function.__defaults__, function.__kwdefaults__]).encode())
+    module = sys.modules.get(function.__module__)
+    if _helperModule(module) is not None:
+        digest.update(sourceVersion(module).encode())
+    return digest.hexdigest()[:16]
+
+
+def _jsonValue(value):
+    # numpy scalars are exact as Python numbers, anything else json cannot encode is an error rather than its repr
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"Artifact specs must be JSON-serializable, got {type(value).__name__}; pass arrays as lists or key them yourself.")
+
+
+def _specJSON(spec):
+    return json.dumps(spec, sort_keys=True, default=_jsonValue)
+
+
+class ArtifactCache:
+    def __init__(self, directory=DEFAULT_CACHE_DIR, maxBytes=DEFAULT_MAX_BYTES, enabled=None):
+        self.directory = directory
+        self.maxBytes = maxBytes
+        self.enabled = os.environ.get("ACTIVATION_CACHE_DISABLE", "0") in ("", "0") if enabled is None else enabled
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, spec):
+        """
+        sha256 of the spec, with the cache version and numpy version added (np.exp and friends may change between releases).
+        Raises TypeError if the spec is not JSON-serializable.
+        """
+        spec = dict(spec, cacheVersion=CACHE_VERSION, numpy=np.__version__)
+        return hashlib.sha256(_specJSON(spec).encode()).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + ".npy")
+
+    def get(self, spec):
+        """
+        Returns the stored array as a read-only memmap, or None on a miss.
+        """
+        path = self._path(self.key(spec))
+        try:
+            array = np.load(path, mmap_mode="r")
+        except (FileNotFoundError, ValueError, OSError):
+            self.misses += 1
+            return None
+        os.utime(path) # the modification time is the LRU clock
+        self.hits += 1
+        return array
+
+    def put(self, spec, array):
+        """
+        Stores the array atomically (parallel sweeps may write the same artifact), then evicts down to maxBytes.
+        Returns the stored array as a read-only memmap.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(self.key(spec))
+        fd, temporaryPath = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.save(f, np.ascontiguousarray(array))
+            os.replace(temporaryPath, path)
+        except BaseException:
+            if os.path.exists(temporaryPath):
+                os.remove(temporaryPath)
+            raise
+        self.evict(keep=path)
+        return np.load(path, mmap_mode="r")
+
+    def getOrCompute(self, spec, compute):
+        if not self.enabled:
+            self.misses += 1
+            return np.asarray(compute())
+        array = self.get(spec)
+        if array is None:
+            array = self.put(spec, np.asarray(compute()))
+        return array
+
+    def entries(self):
+        """
+        (modification time, size, path) of every artifact, least recently used first.
+        """
+        if not os.path.isdir(self.directory):
+            return []
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith(".npy"):
+                path = os.path.join(self.directory, name)
+                try:
+                    status = os.stat(path)
+                except FileNotFoundError: # removed by another process in the meantime
+                    continue
+                entries.append((status.st_mtime, status.st_size, path))
+        return sorted(entries)
+
+    def evict(self, keep=None):
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.maxBytes:
+                break
+            if path == keep:
+                continue
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def clear(self):
+        for _, _, path in self.entries():
+            os.remove(path)
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self):
+        entries = self.entries()
+        return {"hits": self.hits, "misses": self.misses, "entries": len(entries), "bytes": sum(size for _, size, _ in entries)}
+
+
+_defaultCache = None
+
+def defaultCache():
+    global _defaultCache
+    if _defaultCache is None:
+        _defaultCache = ArtifactCache()
+    return _defaultCache
+
+
+def cachedArtifact(name, cache=None, **fixedSpec):
+    """
+    Decorator that caches the array returned by a function, keyed on its name, its arguments, fixedSpec
+    (e.g. the rounding mode) and the function's code version. The arguments are bound to the parameters with their
+    defaults applied, so f(x, 3), f(x, n=3) and f(x) with n=3 as default are one artifact.
+    The name must be unique per function, e.g. prefixed with the module name.
+    """
+    def decorator(function):
+        version = codeVersion(function)
+        signature = inspect.signature(function)
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            arguments = signature.bind(*args, **kwargs)
+            arguments.apply_defaults()
+            spec = dict(fixedSpec, artifact=name, arguments=dict(arguments.arguments), codeVersion=version)
+            return (cache or defaultCache()).getOrCompute(spec, lambda: function(*args, **kwargs))
+        wrapper.uncached = function
+        return wrapper
+    return decorator
+
+
+if __name__ == "__main__":
+    import shutil
+    import time
+
+    directory = tempfile.mkdtemp()
+    cache = ArtifactCache(directory, maxBytes=3 * 8 * 100000 + 3 * 128) # room for three 100,000-element float64 arrays
+
+    @cachedArtifact("silu", cache=cache, rounding="truncate")
+    def siluTable(min, max, step):
+        x = np.arange(min, max, step)
+        return np.stack([x, x / (1 + np.exp(-x))])
+
+    start = time.perf_counter()
+    first = siluTable(-8.0, 8.0, 2**-10)
+    missTime = time.perf_counter() - start
+    start = time.perf_counter()
+    second = siluTable(-8.0, 8.0, 2**-10)
+    hitTime = time.perf_counter() - start
+    assert np.array_equal(first, second) and isinstance(second, np.memmap)
+    assert cache.hits == 1 and cache.misses == 1
+    print(f"miss: {missTime*1e3:.2f} ms, hit: {hitTime*1e3:.2f} ms")
+
+    # positional, keyword and default arguments bind to the same artifact, arrays are rejected
+    @cachedArtifact("ramp", cache=cache)
+    def ramp(n, step=1.0):
+        return np.arange(n) * step
+    ramp(4, 1.0), ramp(4, step=1.0), ramp(n=4), ramp(4)
+    assert cache.hits == 4 and cache.misses == 2
+    try:
+        ramp(np.arange(2000), 1.0)
+        raise AssertionError("an array argument must not be keyed by its repr")
+    except TypeError:
+        pass
+    # the version covers default arguments and the source of the helper modules a function uses
+    def withDefault(step=1.0):
+        return np.arange(4) * step
+    def withOtherDefault(step=2.0):
+        return np.arange(4) * step
+    assert codeVersion(withDefault) != codeVersion(withOtherDefault)
+    import generateLUTs
+    assert {"bf16Codec", "minifloatCodec"} <= {module.__name__ for module in helperModules(generateLUTs)}
+
+    # every different spec is a different artifact, and the least recently used ones get evicted
+    for i in range(5):
+        cache.getOrCompute({"artifact": "random", "seed": i}, lambda: np.random.default_rng(i).random(100000))
+    cache.get({"artifact": "random", "seed": 2}) # touch, so seed 2 survives the next eviction
+    cache.getOrCompute({"artifact": "random", "seed": 5}, lambda: np.random.default_rng(5).random(100000))
+    remaining = {os.path.basename(path) for _, _, path in cache.entries()}
+    assert cache.key({"artifact": "random", "seed": 2}) + ".npy" in remaining
+    assert cache.key({"artifact": "random", "seed": 3}) + ".npy" not in remaining
+    print(cache.stats())
+    shutil.rmtree(directory)
@@ -0,0 +1,128 @@
+import sys
+import numpy as np
+
+# Vectorized float32 <-> BF16 conversion on whole arrays.
+# A BF16 value is the upper half of a float32: 1 sign bit, 8 exponent bits, 7 mantissa bits.
+# Codes are kept as np.uint16 arrays, so all 65,536 BF16 codes fit in a single 128 KB array.
+#
+#   float32: s eeeeeeee mmmmmmm mmmmmmmmmmmmmmmm
+#   BF16:    s eeeeeeee mmmmmmm                   (the lower 16 bits are rounded away)
+
+ROUNDING_MODES = ("rne", "truncate", "rtz")
+
+BF16_SIGN_MASK = 0x8000
+BF16_EXP_MASK = 0x7F80
+BF16_MANT_MASK = 0x007F
+BF16_QUIET_NAN_BIT = 0x0040
+
+# index of the most significant uint16 half inside a float32, depends on the byte order of the machine
+_HIGH_HALF = 1 if sys.byteorder == "little" else 0
+
+
+def float32Bits(values):
+    """
+    Returns the raw bits of the values as a uint32 array, without copying if the values already are a float32 array.
+    """
+    return np.asarray(values, dtype=np.float32).view(np.uint32)
+
+
+def floatToBF16(values, rounding="rne"):
+    """
+    Converts float32 values to BF16 codes (uint16 array).
+    rounding="rne":      round to nearest, ties to even (what mantissaRounder does per value), NaNs stay NaN.
+    rounding="truncate": keep the upper 16 bits as-is (what the getSiluTableValues loops do per value).
+                         This is a zero-copy strided view on the input when it already is a float32 array.
+    rounding="rtz":      round toward zero, same as truncate for finite values, but NaNs stay NaN.
+    """
+    values = np.asarray(values, dtype=np.float32)
+    if rounding == "truncate":
+        halves = values.reshape(-1).view(np.uint16).reshape(-1, 2)
+        return halves[:, _HIGH_HALF].reshape(values.shape)
+    bits = values.view(np.uint32)
+    nan = np.isnan(values)
+    if rounding == "rne":
+        # adding 0x7FFF rounds up when the tail > 0x8000, adding the retained lsb as well breaks ties to even
+        lsb = (bits >> 16) & 1
+        codes = ((bits + 0x7FFF + lsb) >> 16).astype(np.uint16)
+    elif rounding == "rtz":
+        codes = (bits >> 16).astype(np.uint16)
+    else:
+        raise ValueError(f"Unsupported rounding mode '{rounding}'. Use one of {ROUNDING_MODES}.")
+    # a NaN with only low mantissa bits set would otherwise round/truncate into an infinity
+    return np.where(nan, (bits >> 16).astype(np.uint16) | BF16_QUIET_NAN_BIT, codes)
+
+
+def BF16ToFloat(codes):
+    """
+    Converts BF16 codes (uint16 array) to float32 values, by shifting each code into the upper half of a float32 word.
+    """
+    return (np.asarray(codes, dtype=np.uint16).astype(np.uint32) << 16).view(np.float32)
+
+
+def roundToBF16(values, rounding="rne"):
+    """
+    Quantizes float values to the nearest representable BF16 values, returned as float32.
+    """
+    return BF16ToFloat(floatToBF16(values, rounding))
+
+
+def allBF16Codes():
+    """
+    Returns all 65,536 BF16 codes in ascending code order: +0 ... +NaN, -0 ... -NaN.
+    """
+    return np.arange(1 << 16, dtype=np.uint32).astype(np.uint16)
+
+
+def isFiniteBF16(codes):
+    """
+    True for every code that is not an infinity or a NaN (exponent bits not all ones).
+    """
+    return (np.asarray(codes, dtype=np.uint16) & BF16_EXP_MASK) != BF16_EXP_MASK
+
+
+def finiteBF16Codes():
+    """
+    Returns all finite BF16 codes (65,536 - 2*256 codes with an all-ones exponent).
+    """
+    codes = allBF16Codes()
+    return codes[isFiniteBF16(codes)]
+
+
+def BF16Bits(codes):
+    """
+    Formats BF16 codes as 16-bit binary strings, e.g. for printing tables in Chisel syntax.
+    """
+    return [f"{code:016b}" for code in np.asarray(codes, dtype=np.uint16).reshape(-1).tolist()]
+
+
+def BF16Ulp(values):
+    """
+    Unit in the last place of the BF16 grid at the given values: 2^(exponent-7), with the subnormal spacing 2^-133 as minimum.
+    """
+    codes = floatToBF16(np.abs(np.asarray(values, dtype=np.float32)), rounding="rtz")
+    exponent = (codes.astype(np.int32) >> 7) & 0xFF
+    return np.ldexp(np.float64(1.0), np.maximum(exponent, 1) - 127 - 7)
+
+
+if __name__ == "__main__":
+    import time
+    # every BF16 code survives a decode/encode round trip in all rounding modes
+    codes = allBF16Codes()
+    floats = BF16ToFloat(codes)
+    finite = isFiniteBF16(codes)
+    for mode in ROUNDING_MODES:
+        assert np.array_equal(floatToBF16(floats, mode)[finite], codes[finite]), f"round trip failed for {mode}"
+    # ties go to even: 1.0 + 2^-8 is exactly between 1.0 and 1.0078125
+    assert floatToBF16(np.float32(1.0 + 2**-8)) == 0x3F80
+    assert floatToBF16(np.float32(1.0078125 + 2**-8)) == 0x3F82
+    assert floatToBF16(np.float32(1.0 + 2**-8), rounding="truncate") == 0x3F80
+
+    x = np.random.default_rng(0).standard_normal(1 << 16).astype(np.float32)
+    start = time.perf_counter()
+    for _ in range(100):
+        floatToBF16(x)
+    print(f"float32 -> BF16 (rne) for 65,536 values: {(time.perf_counter() - start) / 100 * 1e6:.1f} us")
+    start = time.perf_counter()
+    for _ in range(100):
+        BF16ToFloat(codes)
+    print(f"BF16 -> float32 for 65,536 codes: {(time.perf_counter() - start) / 100 * 1e6:.1f} us")
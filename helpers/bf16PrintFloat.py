@@ -1,20 +1,17 @@
 import sys
-import struct
+from bf16Codec import floatToBF16, BF16ToFloat
+
 def BF16_to_float(bitstring):
     # Convert the 16-bit BF16 bitstring to a 32-bit float
     if isinstance(bitstring, str):
         bitstring = int(bitstring, 2)
-    bf16_bytes = struct.pack('>H', bitstring)  # Pack as big-endian unsigned short
-    float_bytes = bf16_bytes + b'\x00\x00'  # Append two zero bytes to make it 4 bytes
-    return struct.unpack('>f', float_bytes)[0]  # Unpack as big-endian float
+    return float(BF16ToFloat(bitstring)) # the BF16 bits become the upper half of the float32
 
 
 
 def float_to_BF16(floatValue):
     # Convert a float to its BF16 representation
-    float_bytes = struct.pack('>f', floatValue)  # Pack as big-endian float
-    bf16_bytes = float_bytes[:2]  # Take the first 2 bytes (most significant bits)
-    return int.from_bytes(bf16_bytes, 'big')  # Convert to integer
+    return int(floatToBF16(floatValue, rounding="truncate")) # Take the upper 16 bits (most significant bits)
 
     
 if __name__ == "__main__":
@@ -1,7 +1,5 @@
-import math
 import numpy as np
-import struct
-from typing import List
+from generateLUTs import functionTableValues
 
 #### the MSE used in the text is calculated using sbt tests, not with this python file ####
 
@@ -11,30 +9,11 @@ At samplepoints from -6 to 6 with a step of 0.0625
 """
 
 
-def getDyTTableValues(min, max, step) -> tuple[List[float], List[float]]:
-    outX = []
-    outY = []
-    for j in np.arange(min, max, step): # -3.9375 inclusive, 4.0000 exclusive
-        DyT_float = round(math.tanh(j), 6)
-        # Convert float32 to 4-byte representation (big-endian)
-        DyT_bytes = struct.pack('>f', np.float32(DyT_float))
-        # Take the first 2 bytes (most significant bits) for BF16
-        DyT_bf16_bytes = DyT_bytes[:2]
-        # Convert to bit string
-        DyT_bf16_bits = ''.join(f'{byte:08b}' for byte in DyT_bf16_bytes)
-        # Convert the bf16 back to its float representation
-        DyT_bf16_int = int(DyT_bf16_bits, 2) << 16  # Shift back to 32-bit float position
-        DyT_bf16_float = struct.unpack('>f', struct.pack('>I', DyT_bf16_int))[0]
-        outX.append(j)
-        outY.append(DyT_bf16_float) # append the DyT_bf16_float value
-    return outX, outY
-
-
 def version2MSE():
     min = -3.9375  
     max = 4.0000
     step = 0.0625 
-    _, piecewiseDyT_middle = getDyTTableValues(min, max, step) # grab only the second item in the tuple
+    piecewiseDyT_middle = functionTableValues("tanh", min, max, step)[1].tolist()
     piecewiseDyT_left = [-1] * len(np.arange(-6, -3.9375, 0.0625))  # list containing only -1 for the range -6 to -4 inclusive(step= +0.0625!)
     piecewiseDyT_right = [1] * len(np.arange(4, 6.0625, 0.0625))  # list containing only +1 for the range 4 to 6 inclusive
     # concatenate the three lists
@@ -49,7 +28,7 @@ def version2MSE():
     return mse
 
 def version2MSESetRange(min, max, step, testmin=-10.0000, testmax=10.0000):
-    _, piecewiseDyT_middle = getDyTTableValues(min, max, step) # grab only the second item in the tuple
+    piecewiseDyT_middle = functionTableValues("tanh", min, max, step)[1].tolist()
     piecewiseDyT_left = [-1] * len(np.arange(testmin, min, step))  # list containing only zeroes for the range -6 to -4 inclusive(step= +0.0625!)
     piecewiseDyT_right = [1] * len(np.arange(max, testmax+step, step))  # list containing only +1 for the range 4 to 6 inclusive
     # concatenate the three lists
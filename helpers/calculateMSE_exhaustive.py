@@ -0,0 +1,105 @@
+import math
+import numpy as np
+from bf16Codec import BF16ToFloat, BF16Ulp, finiteBF16Codes
+
+"""
+Exhaustive accuracy engine: instead of sampling a 0.0625 grid (calculateMSE_silu/gelu/DyT.py) or N=200 points (sbt tests),
+every finite BF16 input in [xmin, xmax] is pushed through the design in one vectorized pass.
+
+A design is any callable that takes a uint16 array of BF16 codes and returns either
+  - a uint16 array of BF16 codes (bit-accurate golden models of the hardware), or
+  - a float array (analytic approximations such as h-SiLU evaluated in float).
+Note that every BF16 code gets the same weight, so inputs close to zero (half of all codes have |x| < 1) weigh more than on a uniform x grid.
+"""
+
+_erf = np.frompyfunc(math.erf, 1, 1)
+
+def erf(x):
+    return _erf(np.asarray(x, dtype=np.float64)).astype(np.float64)
+
+REFERENCE_FUNCTIONS = {
+    "silu": lambda x: x / (1 + np.exp(-x)),
+    "gelu": lambda x: x * 0.5 * (1 + erf(x / np.sqrt(2))),
+    "tanh": np.tanh,
+    "sigmoid": lambda x: 1 / (1 + np.exp(-x)),
+    "exp": np.exp,
+}
+
+
+def rangeCodes(xmin=-6.0, xmax=6.0):
+    """
+    All finite BF16 codes whose value lies in [xmin, xmax], both +0 and -0 included.
+    """
+    codes = finiteBF16Codes()
+    x = BF16ToFloat(codes)
+    return codes[(x >= xmin) & (x <= xmax)]
+
+
+def designOutputToFloat(output):
+    """
+    Golden models return BF16 codes (uint16), analytic approximations return floats.
+    """
+    output = np.asarray(output)
+    if output.dtype == np.uint16:
+        return BF16ToFloat(output).astype(np.float64)
+    return output.astype(np.float64)
+
+
+def floatDesign(function):
+    """
+    Wraps a float -> float approximation, e.g. h-SiLU x*relu6(x+3)/6, into a design that takes BF16 codes.
+    """
+    return lambda codes: function(BF16ToFloat(codes).astype(np.float64))
+
+
+def errorVectors(design, reference="silu", codes=None, xmin=-6.0, xmax=6.0):
+    """
+    Returns the inputs x, the per-code errors (reference - approximation) and the BF16 ulp of the reference values.
+    """
+    if codes is None:
+        codes = rangeCodes(xmin, xmax)
+    if isinstance(reference, str):
+        reference = REFERENCE_FUNCTIONS[reference]
+    x = BF16ToFloat(codes).astype(np.float64)
+    exact = reference(x)
+    errors = exact - designOutputToFloat(design(codes))
+    return x, errors, BF16Ulp(exact)
+
+
+def exhaustiveErrorStats(design, reference="silu", xmin=-6.0, xmax=6.0, codes=None):
+    """
+    Calculates MSE, MAE, max-abs-error and max-ULP-error of the design over every finite BF16 input in [xmin, xmax].
+    """
+    x, errors, ulps = errorVectors(design, reference, codes, xmin, xmax)
+    absErrors = np.abs(errors)
+    worst = int(np.argmax(absErrors))
+    return {
+        "MSE": float(np.mean(np.square(errors))),
+        "MAE": float(np.mean(absErrors)),
+        "maxAbsError": float(absErrors[worst]),
+        "maxAbsErrorAt": float(x[worst]),
+        "maxULPError": float(np.max(absErrors / ulps)),
+        "n": int(len(x)),
+    }
+
+
+def printErrorStats(name, stats):
+    print(f"{name:<12} MSE: {stats['MSE']:.3e}  MAE: {stats['MAE']:.3e}  max|err|: {stats['maxAbsError']:.3e} (at x={stats['maxAbsErrorAt']:.4f})"
+          f"  max ULP: {stats['maxULPError']:.1f}  ({stats['n']} inputs)")
+
+
+if __name__ == "__main__":
+    import time
+    from calculateMSE_silu import relu6
+
+    hsilu = floatDesign(lambda x: (x * relu6(x+3)) / 6)
+    start = time.perf_counter()
+    stats = exhaustiveErrorStats(hsilu, "silu", xmin=-6.0, xmax=6.0)
+    elapsed = time.perf_counter() - start
+    printErrorStats("h-SiLU", stats)
+    print(f"exhaustive sweep took {elapsed*1e3:.1f} ms")
+
+    # clipping only: the error a LUT design makes outside of its range
+    for edge in [4.0, 8.0]:
+        clipped = floatDesign(lambda x, edge=edge: np.where(x <= -edge, 0.0, np.where(x >= edge, x, x / (1 + np.exp(-x)))))
+        printErrorStats(f"clip@{edge:g}", exhaustiveErrorStats(clipped, "silu", xmin=-10.0, xmax=10.0))
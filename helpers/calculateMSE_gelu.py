@@ -1,7 +1,5 @@
-import math
 import numpy as np
-import struct
-from typing import List
+from generateLUTs import functionTableValues
 import torch
 
 #### the MSE used in the text is calculated using sbt tests, not with this python file ####
@@ -12,30 +10,11 @@ At samplepoints from -6 to 6 with a step of 0.0625
 """
 
 
-def getGELUTableValues(min, max, step) -> tuple[List[float], List[float]]:
-    outX = []
-    outY = []
-    for j in np.arange(min, max, step): # -3.9375 inclusive, 4.0000 exclusive
-        GELU_float = round(j*0.5*(1+math.erf(j/math.sqrt(2))), 6)
-        # Convert float32 to 4-byte representation (big-endian)
-        GELU_bytes = struct.pack('>f', np.float32(GELU_float))
-        # Take the first 2 bytes (most significant bits) for BF16
-        GELU_bf16_bytes = GELU_bytes[:2]
-        # Convert to bit string
-        GELU_bf16_bits = ''.join(f'{byte:08b}' for byte in GELU_bf16_bytes)
-        # Convert the bf16 back to its float representation
-        GELU_bf16_int = int(GELU_bf16_bits, 2) << 16  # Shift back to 32-bit float position
-        GELU_bf16_float = struct.unpack('>f', struct.pack('>I', GELU_bf16_int))[0]
-        outX.append(j)
-        outY.append(GELU_bf16_float) # append the GELU_bf16_float value
-    return outX, outY
-
-
 def version2MSE():
     min = -3.9375  
     max = 4.0000
     step = 0.0625 
-    _, piecewiseGELU_middle = getGELUTableValues(min, max, step) # grab only the second item in the tuple
+    piecewiseGELU_middle = functionTableValues("gelu", min, max, step)[1].tolist()
     piecewiseGELU_left = [0] * len(np.arange(-6, -3.9375, 0.0625))  # list containing only zeroes for the range -6 to -4 inclusive(step= +0.0625!)
     piecewiseGELU_right = list(np.arange(4, 6.0625, 0.0625))  # GELU(x) = x
     # concatenate the three lists
@@ -50,7 +29,7 @@ def version2MSE():
     return mse
 
 def version2MSESetRange(min, max, step, testmin=-10.0000, testmax=10.0000):
-    _, piecewiseGELU_middle = getGELUTableValues(min, max, step) # grab only the second item in the tuple
+    piecewiseGELU_middle = functionTableValues("gelu", min, max, step)[1].tolist()
     piecewiseGELU_left = [0] * len(np.arange(testmin, min, step))  # list containing only zeroes for the range -6 to -4 inclusive(step= +0.0625!)
     piecewiseGELU_right = list(np.arange(max, testmax+step, step))  # GELU(x) = x
     # concatenate the three lists
@@ -1,7 +1,6 @@
 import math
 import numpy as np
-import struct
-from typing import List
+from generateLUTs import functionTableValues
 
 #### the MSE used in the text is calculated using sbt tests, not with this python file ####
 
@@ -21,30 +20,11 @@ def version1MSE():
     return mse
 
 
-def getSiluTableValues(min, max, step) -> tuple[List[float], List[float]]:
-    outX = []
-    outY = []
-    for j in np.arange(min, max, step): # -3.9375 inclusive, 4.0000 exclusive
-        silu_float = round(j/(1+math.exp(-j)), 6)
-        # Convert float32 to 4-byte representation (big-endian)
-        silu_bytes = struct.pack('>f', np.float32(silu_float))
-        # Take the first 2 bytes (most significant bits) for BF16
-        silu_bf16_bytes = silu_bytes[:2]
-        # Convert to bit string
-        silu_bf16_bits = ''.join(f'{byte:08b}' for byte in silu_bf16_bytes)
-        # Convert the bf16 back to its float representation
-        silu_bf16_int = int(silu_bf16_bits, 2) << 16  # Shift back to 32-bit float position
-        silu_bf16_float = struct.unpack('>f', struct.pack('>I', silu_bf16_int))[0]
-        outX.append(j)
-        outY.append(silu_bf16_float) # append the silu_bf16_float value
-    return outX, outY
-
-
 def version2MSE():
     min = -3.9375  
     max = 4.0000
     step = 0.0625 
-    _, piecewiseSiLU_middle = getSiluTableValues(min, max, step) # grab only the second item in the tuple
+    piecewiseSiLU_middle = functionTableValues("silu", min, max, step)[1].tolist()
     piecewiseSiLU_left = [0] * len(np.arange(-6, -3.9375, 0.0625))  # list containing only zeroes for the range -6 to -4 inclusive(step= +0.0625!)
     piecewiseSiLU_right = list(np.arange(4, 6.0625, 0.0625))  # convert NumPy array to a flat list for the range 4 to 6 inclusive
     # concatenate the three lists
@@ -60,7 +40,7 @@ def version2MSE():
 
 
 def version2MSESetRange(min, max, step, testmin=-10.0000, testmax=10.0000):
-    _, piecewiseSiLU_middle = getSiluTableValues(min, max, step) # grab only the second item in the tuple
+    piecewiseSiLU_middle = functionTableValues("silu", min, max, step)[1].tolist()
     piecewiseSiLU_left = [0] * len(np.arange(testmin, min, step))  # list containing only zeroes for the range -6 to -4 inclusive(step= +0.0625!)
     piecewiseSiLU_right = list(np.arange(max, testmax+step, step))  # convert NumPy array to a flat list for the range 4 to 6 inclusive
     # concatenate the three lists
@@ -1,20 +1,22 @@
-import math
 import numpy as np
 import struct
 from typing import List
+from minifloatCodec import minifloatUlp
 
 
 
 # calculate the unit in last place for every same-exponent segment of brainfloat16 numbers(8bit exponent, 7bit mantissa) between 0 and 8.
 def calculate_ulp_brainfloat16(start: float, end: float, num) -> List[float]:
+    return calculate_ulp_minifloat(start, end, num, "bf16")
+
+# the same for any format of minifloatCodec: "fp16" (5bit exponent, 10bit mantissa), "e4m3", "e5m2" or a custom "e<x>m<y>"
+def calculate_ulp_minifloat(start: float, end: float, num, format="bf16") -> List[float]:
     ulps = []
     for i in np.linspace(start, end, num):
-        # Convert the float to brainfloat16 representation
-        exp = math.floor(math.log2(abs(i)))
         # bf16 = struct.pack('>e', i)
         # exp = struct.unpack('>H', bf16)[0] >> 7  # Extract exponent bits
         # mantissa = struct.unpack('>H', bf16)[0] & 0x3FF  # Extract mantissa bits
-        ulp = 2 ** exp * 2 ** (-7)  # Calculate ULP
+        ulp = float(minifloatUlp(i, format))  # 2 ** exp * 2 ** (-mantBits), the subnormal spacing as minimum
         ulps.append(ulp)
     # for exp in range(-126, 2): # inputs range from [2^-126 * (1+2^-7), 8) 8 exclusive
     #     # Calculate the ULP for every same-exponent segment
@@ -44,4 +46,7 @@ if __name__ == "__main__":
     print(f"ULPs in the range [{start}, {end}]")
     print(f"Average ULP: {average_ulp}")
     print("len:", len(ulps))
+    for format in ["fp16", "e5m2", "e4m3"]:
+        _, average_ulp = calculate_ulp_minifloat(start, end, num, format)
+        print(f"Average ULP ({format}): {average_ulp}")
 
@@ -0,0 +1,104 @@
+import functools
+import numpy as np
+from artifactCache import defaultCache, sourceVersion
+from bf16Codec import allBF16Codes
+
+"""
+Compiles a design into its 65,536-entry output table: every design is a unary function on BF16 codes, so running its
+golden model once over all codes captures its exact behaviour in 128 KB. The compiled design is then a single np.take,
+a drop-in for the golden model wherever a design callable is expected (exhaustiveErrorStats, evaluateDumps,
+histogramErrorStats, the plots).
+
+Tables are stored in the artifact cache, keyed on the design spec (a sweepDesignSpace configuration or an explicit spec)
+and on the source of the golden model modules of the design and what they import (artifactCache.sourceVersion), so
+changing a golden model recompiles its designs and nothing else does.
+"""
+
+TABLE_SIZE = 1 << 16
+# the modules buildDesign takes the golden model of each family from
+FAMILY_MODULES = {
+    "lut": ("lutGolden",),
+    "invSigmoid": ("invSigmoidGolden",),
+    "hsilu": ("hsiluGolden",),
+    "pwlSigmoid": ("pwlSigmoidGolden", "optimizePWLBreakpoints", "searchBitSliceSegmentations"),
+    "pwlSiLU": ("pwlSiLUGolden",),
+    "quadratic": ("quadraticGolden", "optimizeQuadraticSegments"),
+}
+
+
+def modelVersion(design, modules=None):
+    """
+    Version of the golden model of a design: the sourceVersion of modules, by default those of FAMILY_MODULES for a
+    configuration dict, or the module the callable is defined in.
+    """
+    if modules is None:
+        if isinstance(design, dict):
+            modules = FAMILY_MODULES[design["family"]]
+        else:
+            modules = (getattr(design, "func", design).__module__,) # through functools.partial
+    return sourceVersion(*modules)
+
+
+def apply(table, codes, out=None):
+    """
+    The compiled design on an array of BF16 codes: one gather from its table.
+    """
+    return np.take(table, codes, out=out)
+
+
+def compileTable(design, spec=None, cache=None, modules=None):
+    """
+    The output codes of a design for all 65,536 input codes, as a read-only uint16 array. design is a sweepDesignSpace
+    configuration dict (its own spec) or a callable on BF16 codes, which is only cached when a spec is given.
+    modules are the helper modules the golden model comes from, see modelVersion.
+    """
+    if spec is not None or isinstance(design, dict):
+        version = modelVersion(design, modules)
+    if isinstance(design, dict):
+        from sweepDesignSpace import buildDesign
+        spec = spec or {key: value for key, value in design.items() if key != "name"}
+        design = buildDesign(design)
+    compute = lambda: np.asarray(design(allBF16Codes()), dtype=np.uint16)
+    if spec is None:
+        return compute()
+    spec = dict(artifact="compiled-design", design=spec, modelVersion=version)
+    return (cache or defaultCache()).getOrCompute(spec, compute)
+
+
+def compileDesign(design, spec=None, cache=None, modules=None):
+    """
+    A callable on BF16 codes that looks the output up in the compiled table, see compileTable.
+    The table is the first argument of the partial: compileDesign(...).args[0].
+    """
+    table = np.ascontiguousarray(compileTable(design, spec, cache, modules)) # in memory, a gather from a memmap pages it in anyway
+    assert table.shape == (TABLE_SIZE,) and table.dtype == np.uint16
+    return functools.partial(apply, table)
+
+
+if __name__ == "__main__":
+    import time
+    from lutGolden import lutDesign
+    from pwlSigmoidGolden import pwlSiLUGELU
+
+    config = {"name": "SiLU-PWL20NonUniform", "family": "pwlSigmoid", "function": "silu", "variant": "20NonUniform"}
+    # the version does not depend on what else happens to be imported
+    version = modelVersion({"family": "lut"})
+    import sweepDesignSpace
+    assert modelVersion({"family": "lut"}) == version == modelVersion(lutDesign("silu", 2, 4))
+    start = time.perf_counter()
+    compiled = compileDesign(config)
+    print(f"compiled {config['name']} in {time.perf_counter() - start:.2f} s")
+    start = time.perf_counter()
+    compiled = compileDesign(config)
+    print(f"loaded from the cache in {(time.perf_counter() - start) * 1e3:.1f} ms")
+
+    codes = np.random.default_rng(0).integers(0, TABLE_SIZE, size=1 << 24, dtype=np.uint16)
+    assert np.array_equal(compiled(codes[:1 << 20]), pwlSiLUGELU(codes[:1 << 20], "20NonUniform", "silu"))
+    assert np.array_equal(compileDesign(lutDesign("gelu", 3, 6))(codes[:1 << 20]), lutDesign("gelu", 3, 6)(codes[:1 << 20]))
+
+    out = np.empty_like(codes)
+    for name, design in [("golden model", lambda c: pwlSiLUGELU(c, "20NonUniform", "silu")), ("compiled", compiled),
+                         ("compiled, preallocated output", lambda c: apply(compiled.args[0], c, out=out))]:
+        start = time.perf_counter()
+        design(codes)
+        print(f"{name:<30} {len(codes) / (time.perf_counter() - start) / 1e6:8.1f} M elements/s")
@@ -0,0 +1,261 @@
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from bf16Codec import allBF16Codes
+from rangeGNGolden import bf16Divide
+
+"""
+Bit-accurate golden model of the hardfloat divider as rangeGN uses it: DivSqrtRecFN_small(8, 8, options = 0) with
+sqrtOp = 0 and roundingMode 0, vectorized over uint16 arrays of BF16 operand codes. Every step of the recoded-format
+path in src/main/scala/hardfloat is modelled on the integer fields, with the widths of the Chisel:
+
+    recFNFromFN, rawFloatFromRecFN  BF16 -> 17-bit recoded float -> raw float (subnormals normalized, 9-bit exponent)
+    DivSqrtRawFN_small              special cases, exponent difference and one quotient bit per cycle (restoring division)
+    RoundAnyRawFNToRecFN            round to nearest even on the 9 + 1 quotient bits plus the sticky remainder bit
+    FNFromRecFN                     recoded float -> BF16, every NaN becomes 0x7FC0
+
+The quotient bits only depend on the two 7-bit fractions, so the iteration runs once on the 128 x 128 fraction pairs and
+is gathered from that table. io.out only holds the quotient in the cycle outValid_div is set: rangeGN keeps inValid high,
+so the divider restarts on the same operands in the next cycle and io.out shows partial quotients until it is done again.
+"""
+
+SIG_WIDTH = 8
+MIN_NORM_EXP = 130 # (1 << (expWidth - 1)) + 2
+MIN_NONZERO_EXP = MIN_NORM_EXP - SIG_WIDTH + 1
+NAN_EXP = 7 << 6
+INF_EXP = 6 << 6
+DEFAULT_ROWS_PER_CHUNK = 64 # 64 a codes x 65,536 b codes per chunk of the exhaustive check
+
+
+# countLeadingZeros of a 7-bit fraction: PriorityEncoder(Reverse(x)), which gives 6 for 0
+_LEADING_ZEROS_7 = np.array([6] + [7 - v.bit_length() for v in range(1, 128)], dtype=np.int64)
+
+
+def rawFloatFromFN(codes):
+    """
+    rawFloatFromFN(8, 8): dict of isNaN, isInf, isZero, sign, sExp (9 bits, 123..384 for finite numbers) and
+    sig (0 ## !isZero ## fraction, subnormals normalized).
+    """
+    codes = np.asarray(codes, dtype=np.uint16).astype(np.int64)
+    sign = (codes >> 15) & 1
+    expIn = (codes >> 7) & 0xFF
+    fractIn = codes & 0x7F
+    isZeroExpIn = expIn == 0
+    isZeroFractIn = fractIn == 0
+    normDist = _LEADING_ZEROS_7[fractIn]
+    subnormFract = ((fractIn << normDist) & 0x3F) << 1
+    adjustedExp = (np.where(isZeroExpIn, normDist ^ 0x1FF, expIn) + (0x80 | np.where(isZeroExpIn, 2, 1))) & 0x1FF
+    isZero = isZeroExpIn & isZeroFractIn
+    isSpecial = (adjustedExp >> 7) == 3
+    return {"isNaN": isSpecial & ~isZeroFractIn, "isInf": isSpecial & isZeroFractIn, "isZero": isZero, "sign": sign,
+            "sExp": adjustedExp, "sig": (~isZero).astype(np.int64) << 7 | np.where(isZeroExpIn, subnormFract, fractIn)}
+
+
+def recFNFromFN(codes):
+    """
+    The 17-bit recoded float of BF16 codes, as the divider wrapper feeds its operands to DivSqrtRecFNToRaw_small.
+    """
+    raw = rawFloatFromFN(codes)
+    top = np.where(raw["isZero"], 0, raw["sExp"] >> 6) | raw["isNaN"].astype(np.int64)
+    return raw["sign"] << 16 | top << 13 | (raw["sExp"] & 0x3F) << 7 | (raw["sig"] & 0x7F)
+
+
+def rawFloatFromRecFN(recoded):
+    """
+    rawFloatFromRecFN(8, 8) of 17-bit recoded floats, the same dict as rawFloatFromFN.
+    """
+    recoded = np.asarray(recoded, dtype=np.int64)
+    exp = (recoded >> 7) & 0x1FF
+    isZero = (exp >> 6) == 0
+    isSpecial = (exp >> 7) == 3
+    return {"isNaN": isSpecial & (((exp >> 6) & 1) == 1), "isInf": isSpecial & (((exp >> 6) & 1) == 0), "isZero": isZero,
+            "sign": (recoded >> 16) & 1, "sExp": exp, "sig": (~isZero).astype(np.int64) << 7 | (recoded & 0x7F)}
+
+
+def divideSignificands(sigA, sigB):
+    """
+    The division iteration of DivSqrtRawFN_small for significands 0 ## 1 ## fraction: returns the quotient bits sigX_Z
+    (bit 9 set when sigA >= sigB, then one bit per cycle down to bit 1, or bit 0 when cycle 2 is not skipped)
+    and notZeroRem_Z, the sticky bit of the remainder.
+    """
+    sigA = np.asarray(sigA, dtype=np.int64)
+    sigB = np.asarray(sigB, dtype=np.int64)
+    # entering: rem = rawA.sig << 1, trialTerm = rawB.sig << 1
+    trialRem = (sigA << 1) - (sigB << 1)
+    newBit = trialRem >= 0
+    rem = np.where(newBit, trialRem, sigA << 1) & 0x3FF
+    sigX = newBit.astype(np.int64) << (SIG_WIDTH + 1)
+    notZeroRem = trialRem != 0
+    fractB = (sigB & 0x7F) << 1
+    skipCycle2 = newBit # sigX_Z(sigWidth + 1) at cycleNum 3
+    for cycleNum in range(SIG_WIDTH + 2, 1, -1):
+        trialRem = (rem << 1) - (fractB | 1 << SIG_WIDTH)
+        newBit = trialRem >= 0
+        if cycleNum == 2:
+            newBit &= ~skipCycle2
+        notZeroRem = np.where(newBit, trialRem != 0, notZeroRem)
+        rem = np.where(newBit, trialRem, rem << 1) & 0x3FF
+        sigX |= np.where(newBit, (1 << cycleNum) >> 2, 0)
+    return sigX, notZeroRem
+
+
+_quotientTable = None
+
+def _quotientBits(sigA, sigB):
+    # divideSignificands gathered from the table of the 128 x 128 fraction pairs
+    global _quotientTable
+    if _quotientTable is None:
+        fractions = np.arange(128)
+        sigX, notZeroRem = divideSignificands(0x80 | fractions[:, None], 0x80 | fractions[None, :])
+        _quotientTable = (sigX << 1 | notZeroRem).astype(np.int16)
+    return _quotientTable[sigA & 0x7F, sigB & 0x7F].astype(np.int64)
+
+
+def divideRawFN(rawA, rawB):
+    """
+    DivSqrtRawFN_small for sqrtOp = 0: the raw quotient (sExp, sig with 9 quotient bits and the sticky bit) and the
+    exception flags invalidExc and infiniteExc, as the dict RoundRawFNToRecFN takes.
+    """
+    invalid = (rawA["isZero"] & rawB["isZero"]) | (rawA["isInf"] & rawB["isInf"])
+    isSigNaN = lambda raw: raw["isNaN"] & (((raw["sig"] >> 6) & 1) == 0)
+    majorExc = isSigNaN(rawA) | isSigNaN(rawB) | invalid | (~rawA["isNaN"] & ~rawA["isInf"] & rawB["isZero"])
+    isNaN = rawA["isNaN"] | rawB["isNaN"] | invalid
+
+    sExpQuot = rawA["sExp"] + ((rawB["sExp"] >> 8) * -256 + (~rawB["sExp"] & 0xFF)) # Cat(b.sExp(8), ~b.sExp(7, 0)).asSInt
+    sSatExpQuot = np.where(sExpQuot >= NAN_EXP, 6 << 6 | (sExpQuot & 0x3F), sExpQuot)
+    sSatExpQuot = (sSatExpQuot & 0x3FF) - (sSatExpQuot & 0x200) * 2 # a 10-bit SInt
+    return {"isNaN": isNaN, "isInf": rawA["isInf"] | rawB["isZero"], "isZero": rawA["isZero"] | rawB["isInf"],
+            "sign": rawA["sign"] ^ rawB["sign"], "sExp": sSatExpQuot, "sig": _quotientBits(rawA["sig"], rawB["sig"]),
+            "invalidExc": majorExc & isNaN, "infiniteExc": majorExc & ~isNaN}
+
+
+def roundRawFNToRecFN(raw):
+    """
+    RoundAnyRawFNToRecFN(8, 10, 8, 8, 0) with round_near_even: the 17-bit recoded float of a raw quotient.
+    """
+    sExp, sig = raw["sExp"], raw["sig"]
+    doShiftSigDown1 = (sig >> (SIG_WIDTH + 2)) & 1
+    # lowMask(sAdjustedExp(8, 0), 121, 130): one extra round bit per exponent below the smallest normal one
+    subnormalBits = np.clip(MIN_NORM_EXP - (sExp & 0x1FF), 0, SIG_WIDTH + 1)
+    roundMask = (((1 << subnormalBits) - 1) | doShiftSigDown1) << 2 | 3
+    shiftedRoundMask = roundMask >> 1
+    roundPosMask = ~shiftedRoundMask & roundMask
+    roundPosBit = (sig & roundPosMask) != 0
+    anyRoundExtra = (sig & shiftedRoundMask) != 0
+    roundedSig = np.where(roundPosBit,
+                          (((sig | roundMask) >> 2) + 1) & ~np.where(~anyRoundExtra, roundMask >> 1, 0),
+                          (sig & ~roundMask) >> 2)
+    sRoundedExp = sExp + (roundedSig >> SIG_WIDTH)
+    commonExpOut = sRoundedExp & 0x1FF
+    commonFractOut = np.where(doShiftSigDown1 == 1, roundedSig >> 1, roundedSig) & 0x7F
+    totalUnderflow = sRoundedExp < MIN_NONZERO_EXP
+
+    isNaNOut = raw["invalidExc"] | raw["isNaN"]
+    notNaNIsSpecialInfOut = raw["infiniteExc"] | raw["isInf"]
+    commonCase = ~isNaNOut & ~notNaNIsSpecialInfOut & ~raw["isZero"]
+    isInfOut = notNaNIsSpecialInfOut | (commonCase & ((sRoundedExp >> 7) >= 3)) # overflow rounds to infinity
+    expOut = (commonExpOut & ~np.where(raw["isZero"] | totalUnderflow, NAN_EXP, 0) & ~np.where(isInfOut, 1 << 6, 0)) \
+        | np.where(isInfOut, INF_EXP, 0) | np.where(isNaNOut, NAN_EXP, 0)
+    fractOut = np.where(isNaNOut | raw["isZero"] | totalUnderflow, np.where(isNaNOut, 1 << 6, 0), commonFractOut)
+    return np.where(isNaNOut, 0, raw["sign"]) << 16 | expOut << 7 | fractOut
+
+
+def FNFromRecFN(recoded):
+    """
+    FNFromRecFN(8, 8): BF16 codes of 17-bit recoded floats.
+    """
+    raw = rawFloatFromRecFN(recoded)
+    isSubnormal = raw["sExp"] < MIN_NORM_EXP
+    denormShiftDist = (1 - raw["sExp"]) & 0x7
+    denormFract = ((raw["sig"] >> 1) >> denormShiftDist) & 0x7F
+    expOut = np.where(isSubnormal, 0, (raw["sExp"] - 129) & 0xFF) | np.where(raw["isNaN"] | raw["isInf"], 0xFF, 0)
+    fractOut = np.where(isSubnormal, denormFract, np.where(raw["isInf"], 0, raw["sig"] & 0x7F))
+    return (raw["sign"] << 15 | expOut << 7 | fractOut).astype(np.uint16)
+
+
+def divSqrtRecFNSmall(a, b):
+    """
+    io.out of DivSqrtRecFN_small(8, 8, 0) for io.a = a, io.b = b (BF16 codes, broadcast), sqrtOp = 0, roundingMode 0.
+    """
+    quotient = divideRawFN(rawFloatFromRecFN(recFNFromFN(a)), rawFloatFromRecFN(recFNFromFN(b)))
+    return FNFromRecFN(roundRawFNToRecFN(quotient))
+
+
+def divSqrtCycles(a, b):
+    """
+    Cycles from the one inValid is accepted in until outValid_div: 1 if an operand is zero, infinite or NaN,
+    9 when the first quotient bit is set (cycle 2 is skipped), 10 otherwise.
+    """
+    rawA, rawB = rawFloatFromFN(a), rawFloatFromFN(b)
+    special = lambda raw: raw["isNaN"] | raw["isInf"] | raw["isZero"]
+    skipCycle2 = rawA["sig"] >= rawB["sig"]
+    return np.where(special(rawA) | special(rawB), 1, np.where(skipCycle2, SIG_WIDTH + 1, SIG_WIDTH + 2))
+
+
+def _checkRows(aCodes, maxExamples):
+    # model vs reference for the a codes against every b code
+    b = allBF16Codes()
+    mismatches = np.zeros(len(aCodes), dtype=np.int64)
+    examples = []
+    for i, a in enumerate(aCodes):
+        model = divSqrtRecFNSmall(a, b)
+        expected = bf16Divide(np.full_like(b, a), b)
+        different = np.flatnonzero(model != expected)
+        mismatches[i] = len(different)
+        examples += [(int(a), int(b[j]), int(model[j]), int(expected[j])) for j in different[:maxExamples - len(examples)]]
+    return aCodes, mismatches, examples
+
+
+def exhaustiveDividerCheck(aCodes=None, rowsPerChunk=DEFAULT_ROWS_PER_CHUNK, workers=None, maxExamples=16, progress=False):
+    """
+    Compares divSqrtRecFNSmall with bf16Divide for the a codes (all 65,536 by default) against all 65,536 b codes,
+    in chunks of rowsPerChunk a codes spread over worker processes. Returns pairs, mismatches, mismatchesPerA
+    (65,536 counts, 0 for the a codes not checked) and up to maxExamples (a, b, model, reference) tuples.
+    """
+    aCodes = allBF16Codes() if aCodes is None else np.asarray(aCodes, dtype=np.uint16)
+    mismatchesPerA = np.zeros(1 << 16, dtype=np.int64)
+    examples = []
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        chunks = [executor.submit(_checkRows, aCodes[first:first + rowsPerChunk], maxExamples)
+                  for first in range(0, len(aCodes), rowsPerChunk)]
+        for done, chunk in enumerate(chunks, 1):
+            rows, mismatches, chunkExamples = chunk.result()
+            mismatchesPerA[rows] = mismatches
+            examples += chunkExamples[:maxExamples - len(examples)]
+            if progress:
+                pairs = min(done * rowsPerChunk, len(aCodes)) * 65536
+                print(f"  {pairs / (time.perf_counter() - start) / 1e6:.1f} M pairs/s, {done}/{len(chunks)} chunks, "
+                      f"{int(mismatchesPerA.sum())} mismatches", flush=True)
+    return {"pairs": len(aCodes) * 65536, "mismatches": int(mismatchesPerA.sum()), "mismatchesPerA": mismatchesPerA,
+            "examples": examples}
+
+
+if __name__ == "__main__":
+    import sys
+    from bf16Codec import floatToBF16
+
+    # the recoded format of a few operands, see recFNFromFNWrapper
+    assert recFNFromFN(0x3F80) == 0x08000 and recFNFromFN(0x0000) >> 13 == 0 and recFNFromFN(0x7F80) == 0x0C000
+    assert rawFloatFromRecFN(recFNFromFN(0x7FC1))["isNaN"] and rawFloatFromFN(0x0001)["sExp"] == MIN_NONZERO_EXP
+    codes = allBF16Codes()
+    assert np.array_equal(FNFromRecFN(recFNFromFN(codes)), codes) # NaN payloads included
+
+    # the points of DivSqrtRecFN_smallTest and rangeGNTest
+    assert divSqrtRecFNSmall(0x3F80, 0x4040) == 0x3EAB # 1 / 3
+    assert divSqrtRecFNSmall(floatToBF16(np.float32(-4.5)), floatToBF16(np.float32(9.0))) == floatToBF16(np.float32(-0.5))
+    assert divSqrtRecFNSmall(0x0000, 0x0000) == 0x7FC0 and divSqrtRecFNSmall(0x3F80, 0x8000) == 0xFF80
+    assert divSqrtRecFNSmall(0x7F7F, 0x0001) == 0x7F80 and divSqrtRecFNSmall(0x0001, 0x7F7F) == 0x0000
+    assert np.all(divSqrtCycles(floatToBF16(np.float32([1.0, 1.5, 0.0])), floatToBF16(np.float32(1.25))) == [10, 9, 1])
+
+    # every 256th a code (all exponents, both signs, zeros, infinities and NaNs) against the IEEE quotient,
+    # or all 2^32 operand pairs with --exhaustive
+    exhaustive = "--exhaustive" in sys.argv
+    start = time.perf_counter()
+    result = exhaustiveDividerCheck(None if exhaustive else np.arange(0, 1 << 16, 256) | np.arange(256) & 0x7F,
+                                    rowsPerChunk=16, progress=exhaustive)
+    elapsed = time.perf_counter() - start
+    print(f"{result['pairs']:,} operand pairs in {elapsed:.1f} s ({result['pairs'] / elapsed / 1e6:.1f} M pairs/s): "
+          f"{result['mismatches']} quotients differ from the correctly rounded one")
+    for a, b, model, expected in result["examples"]:
+        print(f"  0x{a:04X} / 0x{b:04X}: divider 0x{model:04X}, IEEE 0x{expected:04X}")
@@ -0,0 +1,215 @@
+import glob
+import numpy as np
+from bf16Codec import floatToBF16, BF16ToFloat, BF16Ulp, allBF16Codes, isFiniteBF16
+from calculateMSE_exhaustive import REFERENCE_FUNCTIONS, designOutputToFloat
+
+"""
+Streaming accuracy evaluation on real activation tensors, e.g. the SiLU/GELU inputs of a Stable Diffusion UNet pass
+(64x64x320, 32x32x640, ...) captured as .npy files. The dumps are memory-mapped and pushed through the designs in chunks
+of chunkSize elements, so neither the tensor nor an error array is ever held in RAM as a whole: only running sums,
+maxima and counts are kept per design.
+
+Accepted dumps:
+  float32/float64/float16  rounded to BF16 (RNE) first, the way the activations reach the hardware
+  uint16/int16             already BF16 codes, e.g. torch.bfloat16 tensors saved with .view(torch.int16).numpy()
+Infinities and NaNs are counted but not scored.
+"""
+
+DEFAULT_CHUNK_SIZE = 1 << 20 # 2 MB of BF16 codes, 8 MB of float64 errors per design at a time
+
+
+def activationCodes(values):
+    """
+    BF16 codes of a chunk of activations.
+    """
+    values = np.asarray(values)
+    if values.dtype in (np.uint16, np.int16):
+        return values.view(np.uint16)
+    return floatToBF16(values.astype(np.float32, copy=False), rounding="rne")
+
+
+class ErrorAccumulator:
+    """
+    Running error statistics, with the same keys as calculateMSE_exhaustive.exhaustiveErrorStats.
+    """
+    def __init__(self):
+        self.n = 0
+        self.nonFinite = 0
+        self.sumSquares = 0.0
+        self.sumAbs = 0.0
+        self.maxAbsError = -1.0
+        self.maxAbsErrorAt = float("nan")
+        self.maxAbsErrorIndex = -1
+        self.maxULPError = 0.0
+
+    def update(self, x, errors, ulps, offset=0, nonFinite=0):
+        """
+        Adds a chunk of inputs x, errors and reference ulps. offset is the flat index of the chunk in the dump(s).
+        """
+        self.nonFinite += nonFinite
+        if len(errors) == 0:
+            return
+        absErrors = np.abs(errors)
+        self._add(absErrors, len(errors), offset, lambda worst: x[worst])
+        self.maxULPError = max(self.maxULPError, float(np.max(absErrors / ulps)))
+
+    def updateAbsErrors(self, codes, absErrors, offset=0, nonFinite=0):
+        """
+        Adds a chunk of absolute errors gathered from a per-code table, including the (zero) entries of non-finite codes.
+        The max ulp error is not tracked here.
+        """
+        self.nonFinite += nonFinite
+        if len(absErrors):
+            self._add(absErrors, len(absErrors) - nonFinite, offset, lambda worst: float(BF16ToFloat(codes[worst])))
+
+    def _add(self, absErrors, n, offset, inputAt):
+        self.n += n
+        self.sumSquares += float(np.dot(absErrors, absErrors))
+        self.sumAbs += float(np.sum(absErrors))
+        worst = int(np.argmax(absErrors))
+        if absErrors[worst] > self.maxAbsError:
+            self.maxAbsError = float(absErrors[worst])
+            self.maxAbsErrorAt = float(inputAt(worst))
+            self.maxAbsErrorIndex = offset + worst
+
+    def stats(self):
+        return {
+            "MSE": self.sumSquares / self.n if self.n else float("nan"),
+            "MAE": self.sumAbs / self.n if self.n else float("nan"),
+            "maxAbsError": self.maxAbsError,
+            "maxAbsErrorAt": self.maxAbsErrorAt,
+            "maxAbsErrorIndex": self.maxAbsErrorIndex,
+            "maxULPError": self.maxULPError,
+            "n": self.n,
+            "nonFinite": self.nonFinite,
+        }
+
+
+def iterateChunks(dumps, chunkSize=DEFAULT_CHUNK_SIZE):
+    """
+    Yields (flat offset, chunk) over one or more dumps: paths, glob patterns or arrays, read in the order given.
+    Files are opened with mmap_mode="r", so only the chunk being processed is paged in.
+    """
+    if isinstance(dumps, (str, np.ndarray)):
+        dumps = [dumps]
+    offset = 0
+    for dump in dumps:
+        if isinstance(dump, str):
+            paths = sorted(glob.glob(dump)) or [dump]
+            arrays = (np.load(path, mmap_mode="r") for path in paths)
+        else:
+            arrays = [dump]
+        for array in arrays:
+            flat = array.reshape(-1) # a view for C-contiguous memmaps, nothing is read yet
+            for start in range(0, len(flat), chunkSize):
+                yield offset + start, flat[start:start + chunkSize]
+            offset += len(flat)
+
+
+def codeErrorTables(design, reference):
+    """
+    The design and the reference are functions of the BF16 code alone, so the error of every one of the 65,536 codes is
+    computed once up front. Returns per-code absolute errors and ulp errors, both 0 for non-finite codes.
+    """
+    codes = allBF16Codes()
+    finite = isFiniteBF16(codes)
+    with np.errstate(over="ignore", invalid="ignore"): # exp(-x) of the most negative codes, NaN codes
+        x = BF16ToFloat(codes).astype(np.float64)
+        exact = np.where(finite, reference(np.where(finite, x, 0.0)), 0.0)
+        absErrors = np.where(finite, np.abs(exact - designOutputToFloat(design(codes))), 0.0)
+    ulpErrors = absErrors / np.where(finite, BF16Ulp(exact), 1.0)
+    return absErrors, ulpErrors
+
+
+def evaluateDumps(dumps, designs, reference="silu", chunkSize=DEFAULT_CHUNK_SIZE, perCodeTables=True):
+    """
+    Evaluates several designs ({name: callable on BF16 codes}) on the same dumps in one pass, so every chunk is read once.
+    With perCodeTables (the default) every design is evaluated on the 65,536 codes once, and a chunk only costs one gather
+    per design plus a sum, a dot product and an argmax. perCodeTables=False runs the designs on every chunk instead.
+    Returns {name: stats}.
+    """
+    if isinstance(reference, str):
+        reference = REFERENCE_FUNCTIONS[reference]
+    accumulators = {name: ErrorAccumulator() for name in designs}
+    if perCodeTables:
+        tables = {name: codeErrorTables(design, reference) for name, design in designs.items()}
+        seen = np.zeros(1 << 16, dtype=bool) # every code that occurs, the max ulp error is taken over those at the end
+    for offset, chunk in iterateChunks(dumps, chunkSize):
+        codes = activationCodes(chunk)
+        finite = isFiniteBF16(codes)
+        nonFinite = len(codes) - int(np.count_nonzero(finite))
+        if perCodeTables:
+            seen[codes] = True
+            for name, (absTable, _) in tables.items():
+                # non-finite codes have error 0 in the table, they only have to be left out of n
+                accumulators[name].updateAbsErrors(codes, absTable[codes], offset, nonFinite)
+            continue
+        if nonFinite:
+            codes = codes[finite]
+        x = BF16ToFloat(codes).astype(np.float64)
+        exact = reference(x)
+        ulps = BF16Ulp(exact)
+        for name, design in designs.items():
+            errors = exact - designOutputToFloat(design(codes))
+            # the chunk offset only locates the worst input exactly when nothing was dropped before it
+            accumulators[name].update(x, errors, ulps, offset, nonFinite)
+    if perCodeTables:
+        for name, (_, ulpTable) in tables.items():
+            accumulators[name].maxULPError = float(np.max(ulpTable[seen], initial=0.0))
+    return {name: accumulator.stats() for name, accumulator in accumulators.items()}
+
+
+def evaluateDump(dumps, design, reference="silu", chunkSize=DEFAULT_CHUNK_SIZE, perCodeTables=True):
+    """
+    Error statistics of one design on one or more dumps, see evaluateDumps.
+    """
+    return evaluateDumps(dumps, {"design": design}, reference, chunkSize, perCodeTables)["design"]
+
+
+def printDumpStats(name, stats):
+    print(f"{name:<12} MSE: {stats['MSE']:.3e}  MAE: {stats['MAE']:.3e}  max|err|: {stats['maxAbsError']:.3e} "
+          f"(at x={stats['maxAbsErrorAt']:.4f}, element {stats['maxAbsErrorIndex']})  max ULP: {stats['maxULPError']:.1f}"
+          f"  ({stats['n']} inputs, {stats['nonFinite']} non-finite)")
+
+
+if __name__ == "__main__":
+    import os
+    import shutil
+    import tempfile
+    import time
+    from calculateMSE_exhaustive import exhaustiveErrorStats
+    from lutGolden import lutDesign
+    from pwlSigmoidGolden import pwlDesign
+
+    # a stand-in for captured UNet activations: 8 maps of 64x64x320, clustered around 0 like real SiLU inputs
+    directory = tempfile.mkdtemp()
+    rng = np.random.default_rng(0)
+    path = os.path.join(directory, "resnet_blocks_8x64x64x320.npy")
+    dump = np.lib.format.open_memmap(path, mode="w+", dtype=np.float32, shape=(8, 64, 64, 320))
+    for i in range(len(dump)):
+        dump[i] = rng.standard_normal((64, 64, 320), dtype=np.float32) * 1.5
+    dump[-1, -1, -1, -2:] = [np.inf, np.nan] # at the very end, so both modes report the same element index
+    dump.flush()
+    del dump
+
+    designs = {"LUT 3.6": lutDesign("silu", 3, 6), "PWL 10": pwlDesign("10", "silu")}
+    results = {}
+    for perCodeTables in [True, False]:
+        start = time.perf_counter()
+        results[perCodeTables] = evaluateDumps(path, designs, "silu", perCodeTables=perCodeTables)
+        elapsed = time.perf_counter() - start
+        print(f"perCodeTables={perCodeTables}: {8*64*64*320 / elapsed / 1e6:.1f} M activations/s for {len(designs)} designs")
+    for name, stats in results[True].items():
+        printDumpStats(name, stats)
+        assert stats == results[False][name] or all(np.isclose(stats[key], results[False][name][key], rtol=1e-9) for key in stats)
+
+    # chunking must not change anything compared to the in-memory evaluation, here on the last map with an odd chunk size
+    lastMap = np.load(path, mmap_mode="r")[-1]
+    codes = activationCodes(np.asarray(lastMap))
+    codes = codes[isFiniteBF16(codes)]
+    for name, design in designs.items():
+        expected = exhaustiveErrorStats(design, "silu", codes=codes)
+        stats = evaluateDump(lastMap, design, "silu", chunkSize=100003)
+        assert stats["n"] == expected["n"] and stats["nonFinite"] == 2 and stats["maxAbsError"] == expected["maxAbsError"]
+        assert np.isclose(stats["MSE"], expected["MSE"], rtol=1e-9) and np.isclose(stats["MAE"], expected["MAE"], rtol=1e-9)
+    shutil.rmtree(directory)
@@ -0,0 +1,176 @@
+import numpy as np
+
+"""
+Bit-accurate golden models of the BF16 arithmetic units in src/main/scala/silu, vectorized over uint16 arrays of BF16 codes.
+They reproduce what the Chisel produces, not IEEE: no guard/sticky bits, no infinity/NaN handling, and
+exponent arithmetic that wraps around in 8 bits just like the Chisel UInt operators do.
+
+    FPMult16ALT (FPMult.scala, 1cc): 8x8-bit mantissa product, rounded with MantissaRounder (round half up on 1 bit)
+    FPAdd16ALT  (FPAdd.scala, 3cc):  align by truncating shift, add/subtract, normalize with a leading-zero count
+    BF16toFP    (BF16toFP.scala):    BF16 -> unsigned fixed point with intBits.fracBits, used for segment/LUT selection
+"""
+
+def _fields(codes):
+    codes = np.asarray(codes, dtype=np.uint16).astype(np.int32)
+    sign = (codes >> 15) & 1
+    exponent = (codes >> 7) & 0xFF
+    # FloatWrapper: prepend the implicit 1, or a 0 for denormals (exponent 0)
+    mantissa = (codes & 0x7F) | np.where(exponent != 0, 0x80, 0)
+    zero = (codes & 0x7FFF) == 0
+    return sign, exponent, mantissa, zero
+
+
+def _pack(sign, exponent, mantissa):
+    return ((sign << 15) | ((exponent & 0xFF) << 7) | (mantissa & 0x7F)).astype(np.uint16)
+
+
+# number of leading zeros of an 8-bit value: PriorityEncoder(Reverse(x)) in FPAddStage4
+_LEADING_ZEROS_8 = np.array([8] + [7 - int(v).bit_length() + 1 for v in range(1, 256)], dtype=np.int32)
+
+
+def fpMult16ALT(a, b):
+    """
+    BF16 multiplication as done by FPMult16ALT.
+    """
+    signA, expA, mantA, zeroA = _fields(a)
+    signB, expB, mantB, zeroB = _fields(b)
+    sign = signA ^ signB
+    exponentSum = (expA + expB) & 0xFF # stage1_exponent is only 8 bits wide
+    product = mantA * mantB # 16-bit product of the two 8-bit mantissas
+    zero = zeroA | zeroB
+
+    lead = ((product >> 15) & 1) == 1 # product >= 2.0: normalize by incrementing the exponent
+    exponent = np.where(lead, exponentSum - 126, exponentSum - 127) & 0xFF
+    rounderIn = np.where(lead, (product >> 7) & 0xFF, (product >> 6) & 0xFF) # mantissa_reg(14,7) or mantissa_reg(13,6)
+    exponent = np.where(zero, 0, exponent)
+    rounderIn = np.where(zero, 0, rounderIn)
+
+    # MantissaRounder(8): out = in(7,1) + in(0), carry when all 8 bits are ones (out wraps to 0)
+    mantissa = ((rounderIn >> 1) + (rounderIn & 1)) & 0x7F
+    carry = rounderIn == 0xFF
+    exponent = np.where(carry, exponent + 1, exponent) & 0xFF
+    return _pack(sign, exponent, mantissa)
+
+
+def fpAdd16ALT(a, b):
+    """
+    BF16 addition as done by the four stages of FPAdd16ALT.
+    """
+    signA, expA, mantA, _ = _fields(a)
+    signB, expB, mantB, _ = _fields(b)
+
+    # stage 1: the operand with the larger exponent sets exponent and sign (a wins ties)
+    expDiff = expA - expB
+    bLarger = expDiff < 0
+    shift = np.abs(expDiff)
+    exponent = np.where(bLarger, expB, expA)
+    sign = np.where(bLarger, signB, signA)
+    sub = signA ^ signB
+
+    # stage 2: shift the smaller mantissa right, bits shifted out are lost
+    largerMant = np.where(bLarger, mantB, mantA)
+    smallerMant = np.where(bLarger, mantA, mantB)
+    shiftedMant = np.where(shift > 8, 0, smallerMant >> np.minimum(shift, 8))
+
+    # stage 3: 9-bit add or subtract, catch the overflow bit
+    mantSum = np.where(sub == 1, largerMant - shiftedMant, largerMant + shiftedMant) & 0x1FF
+    overflow = ((mantSum >> 8) & 1) == 1
+    negative = overflow & (sub == 1) # same exponents and |b| > |a|: negate and flip the sign
+    carried = overflow & (sub == 0) # sum >= 2.0: shift back by one and increment the exponent
+    mantissa = np.where(negative, (-(mantSum & 0xFF)) & 0xFF, np.where(carried, (mantSum >> 1) & 0xFF, mantSum & 0xFF))
+    sign = np.where(negative, sign ^ 1, sign)
+    exponent = np.where(carried, exponent + 1, exponent) & 0xFF
+
+    # stage 4: normalize so the leading one ends up in the implicit bit
+    normShift = _LEADING_ZEROS_8[mantissa]
+    isZero = mantissa == 0
+    mantissaOut = np.where(isZero, 0, (mantissa << np.minimum(normShift, 7)) & 0x7F)
+    exponentOut = np.where(isZero, 0, exponent - normShift) & 0xFF
+    return _pack(sign, exponentOut, mantissaOut)
+
+
+def actualExponent(codes):
+    """
+    exp.asSInt - 127.S(8.W) as used by the PWL and LUT designs: an 8-bit signed result, so exponents >= 255 wrap around.
+    """
+    exponent = (np.asarray(codes, dtype=np.uint16).astype(np.int32) >> 7) & 0xFF
+    return ((exponent - 127 + 128) & 0xFF) - 128
+
+
+def bf16ToFixedPoint(codes, intBits=2, fracBits=4):
+    """
+    Conversion done by BF16toFP(intBits, fracBits), returns (sign, intPart, fracPart) as int32 arrays.
+    The implicit 1 is always prepended and the 6-bit shift wraps around, so denormals and values far below 2^-fracBits
+    do not map to 0 like in a real fixed-point conversion, bits above intBits are dropped.
+    """
+    codes = np.asarray(codes, dtype=np.uint16).astype(np.int64)
+    sign = ((codes >> 15) & 1).astype(np.int32)
+    exponent = (codes >> 7) & 0xFF
+    mantissa = codes & 0x7F
+    normalizedMantissa = 0x80 | mantissa
+    shift = (exponent - 127 - (7 - fracBits)) & 0x3F # shift is a 6-bit SInt wire
+    shift = np.where(shift >= 32, shift - 64, shift)
+    width = intBits + fracBits
+    shiftedLeft = (normalizedMantissa << np.clip(shift, 0, 31)) & ((1 << width) - 1)
+    shiftedRight = normalizedMantissa >> np.clip(-shift, 0, 32)
+    value = np.where(shift >= 0, shiftedLeft, shiftedRight) & ((1 << width) - 1)
+    value = np.where((exponent == 0) & (mantissa == 0), 0, value).astype(np.int32)
+    return sign, value >> fracBits, value & ((1 << fracBits) - 1)
+
+
+if __name__ == "__main__":
+    import time
+    from bf16Codec import floatToBF16, BF16ToFloat
+
+    def bf16(value):
+        return floatToBF16(np.float32(value), rounding="truncate") # floatToBigIntBF16 in FloatUtils.scala truncates as well
+
+    # vectors from FPMultTest.scala
+    assert fpMult16ALT(bf16(0.0), bf16(3.0)) == bf16(0.0)
+    product = BF16ToFloat(fpMult16ALT(bf16(-4.562719), bf16(0.43761528)))
+    assert abs(product - (-1.9967154)) < 2**(0-7), product # was -1.0 before the MantissaRounder overflow fix
+    assert fpMult16ALT(0x3F80, 0x3F80) == 0x3F80 # 1.0 * 1.0
+    assert fpMult16ALT(0xBF80, 0x4040) == 0xC040 # -1.0 * 3.0
+    assert fpMult16ALT(0x3FFF, 0x3F81) == 0x4000 # 1.9921875 * 1.0078125 = 2.0077: rounder carry into the exponent
+    assert fpMult16ALT(0x8000, 0x4040) == 0x8000 # -0 * 3.0 keeps the xor of the signs
+
+    # vectors from FPAddTest.scala and the 3.0 offset of hsilugelu.scala
+    assert fpAdd16ALT(bf16(0.0), bf16(0.0)) == 0x0000
+    assert fpAdd16ALT(0x3F80, 0x3F80) == 0x4000 # 1 + 1 = 2
+    assert fpAdd16ALT(0x3F80, 0xBF80) == 0x0000 # 1 - 1 = +0
+    assert fpAdd16ALT(0xBF80, 0x3F80) == 0x8000 # -1 + 1 = -0, the sign of a is kept
+    assert fpAdd16ALT(0xC000, 0x4040) == 0x3F80 # -2 + 3 = 1
+    assert fpAdd16ALT(0x3F80, 0xBF00) == 0x3F00 # 1 - 0.5 = 0.5, the 1-f(-x) mirror of the sigmoid designs
+    assert fpAdd16ALT(0x3FC0, 0xC000) == 0xBF00 # 1.5 - 2 = -0.5, subtraction with b larger
+
+    # random vectors with the tolerances of FPMultTest.scala and FPAddTest.scala
+    rng = np.random.default_rng(0)
+    for scale in [10000.0, 14.0, 0.1]:
+        a = (rng.random(100000, dtype=np.float32) * scale - scale/2).astype(np.float32)
+        b = (rng.random(100000, dtype=np.float32) * scale - scale/2).astype(np.float32)
+        aBF16, bBF16 = bf16(a), bf16(b)
+        exact = BF16ToFloat(aBF16).astype(np.float64) * BF16ToFloat(bBF16)
+        maxDiff = np.exp2(np.floor(np.log2(np.abs(exact))) - 5)
+        assert np.all(np.abs(BF16ToFloat(fpMult16ALT(aBF16, bBF16)) - exact) < maxDiff), f"FPMult16ALT out of tolerance for scale {scale}"
+        exact = BF16ToFloat(aBF16).astype(np.float64) + BF16ToFloat(bBF16)
+        with np.errstate(divide="ignore"): # a + (-a) = 0 gives maxDiff 0, the golden model must then return exactly 0
+            maxDiff = np.exp2(np.floor(np.log2(np.abs(exact))))
+        assert np.all(np.abs(BF16ToFloat(fpAdd16ALT(aBF16, bBF16)) - exact) <= maxDiff), f"FPAdd16ALT out of tolerance for scale {scale}"
+
+    # BF16toFP: 2.75 = 0b10.11 and -0.1875 = -0b0.0011, the truncation of 0.1 and the wrapped conversion of a tiny input
+    assert [int(v[0]) for v in bf16ToFixedPoint([bf16(2.75)], 3, 7)] == [0, 2, 0b1100000]
+    assert [int(v[0]) for v in bf16ToFixedPoint([bf16(-0.1875)], 2, 4)] == [1, 0, 0b0011]
+    assert [int(v[0]) for v in bf16ToFixedPoint([bf16(0.1)], 3, 7)] == [0, 0, 12] # 0.1 * 128 = 12.8
+    assert [int(v[0]) for v in bf16ToFixedPoint([0x2080], 3, 7)] == [0, 4, 0] # 2^-62: shift -62 wraps around to +2, so 0x80 << 2 = 4.0
+    assert actualExponent(0x4040) == 1 and actualExponent(0x3F00) == -1 and actualExponent(0x7F80) == -128
+
+    a = rng.integers(0, 1 << 16, size=1 << 22, dtype=np.uint16)
+    b = rng.integers(0, 1 << 16, size=1 << 22, dtype=np.uint16)
+    start = time.perf_counter()
+    fpMult16ALT(a, b)
+    multTime = time.perf_counter() - start
+    start = time.perf_counter()
+    fpAdd16ALT(a, b)
+    addTime = time.perf_counter() - start
+    print(f"FPMult16ALT: {len(a)/multTime/1e6:.1f} M operations/s, FPAdd16ALT: {len(a)/addTime/1e6:.1f} M operations/s")
+    print("all FPMult16ALT, FPAdd16ALT and BF16toFP vectors passed")
@@ -1,22 +1,43 @@
 import math
+import os
+import re
 import numpy as np
 import struct
+from bf16Codec import floatToBF16, BF16ToFloat
+from minifloatCodec import floatToMinifloat, formatWidth, getFormat, FORMATS
+from artifactCache import cachedArtifact
 
-def mantissaRounder(function_bytes):
+# (intBits, fracBits) of every LUT flavour in siluLUT.scala, geluLUT.scala and DyTLUT.scala, in the order of their if/else chain
+LUT_CONFIGURATIONS = [(2, 4), (2, 5), (2, 6), (3, 4), (3, 5), (3, 6)]
+
+_SCALA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src", "main", "scala")
+LUT_SCALA_FILES = {
+    "silu": os.path.join(_SCALA_DIR, "silu", "siluLUT.scala"),
+    "gelu": os.path.join(_SCALA_DIR, "gelu", "geluLUT.scala"),
+    "tanh": os.path.join(_SCALA_DIR, "DyT", "DyTLUT.scala"),
+}
+
+# (function, intBits, fracBits) of the committed tables whose -0.0 entry holds -0 instead of +0
+NEGATIVE_ZERO_ENTRIES = {("tanh", 2, 4), ("tanh", 2, 5), ("tanh", 3, 4), ("tanh", 3, 5)}
+
+_erf = np.frompyfunc(math.erf, 1, 1)
+
+TABLE_FUNCTIONS = {
+    "silu": lambda x: x / (1 + np.exp(-x)),
+    "tanh": np.tanh,
+    "gelu": lambda x: x * 0.5 * (1 + _erf(x / math.sqrt(2)).astype(np.float64)),
+}
+
+def mantissaRounder(function_bytes, format="bf16"):
     """
     Rounds the mantissa of a float32 to the nearest BF16 value, if tied round to even.
+    Takes the 4-byte big-endian float32 representation, returns the 2-byte big-endian BF16 representation.
+    Other formats of minifloatCodec (format="fp16", "e4m3", ...) return as many bytes as their width needs.
+    For whole arrays, use bf16Codec.floatToBF16(values, rounding="rne") directly.
     """
-    # Take the first 2 bytes (most significant bits) for BF16
-    rounded_function_bf16_bytes = function_bytes[:2]
-    # Convert the last 2 bytes to an integer for comparison
-    mantissa_tail = int.from_bytes(function_bytes[2:4], byteorder='big')
-    retained_mantissa = int.from_bytes(rounded_function_bf16_bytes, byteorder='big')
-    if ((mantissa_tail > 0x8000) or (mantissa_tail==0x8000 and retained_mantissa&1)): # If (bit 15 is 1 and any lower bit is 1) or if (bit 15 is 1 and LSB of retained 7-bit mantissa is 1), round up
-        # Convert the first 2 bytes to int, add 1, then back to bytes
-        rounded_bf16_int = int.from_bytes(rounded_function_bf16_bytes, byteorder='big') + 1 # rounding up
-        return rounded_bf16_int.to_bytes(2, byteorder='big')
-    else:
-        return rounded_function_bf16_bytes # else we can just truncate(=rounding down)
+    function_float = np.frombuffer(function_bytes, dtype='>f4')
+    code = int(floatToMinifloat(function_float, format, rounding="rne")[0])
+    return code.to_bytes((formatWidth(format) + 7) // 8, byteorder='big')
 
 def printIndexedFunctionTableExtensive(function="silu", intBits=2, fracBits=4, sigmoidEntries=32):
     error_tolerance = 0.032
@@ -161,6 +182,113 @@ def printOrderedIndexedFunctionTableInChiselSyntax(function="silu", intBits=2, f
         print(f"\"b{function_bf16_bits}\".U,")
 
 
+_CHISEL_LUT_PATTERN = re.compile(r"(intBits == (\d+) && fracBits == (\d+)\) \{[^\n]*\n\s*VecInit\(Seq\([^\n]*\n)( *)(.*?)(\n\s*\)\))",
+                                 re.DOTALL)
+
+
+def readChiselLUTs(function="silu", path=None):
+    """
+    The committed tables of the Scala LUT module, as {(intBits, fracBits): uint16 array of BF16 codes}.
+    """
+    with open(path or LUT_SCALA_FILES[function]) as f:
+        source = f.read()
+    return {(int(match.group(2)), int(match.group(3))): np.array([int(code, 2) for code in re.findall(r'"b([01]+)"\.U', match.group(5))],
+                                                                 dtype=np.uint16)
+            for match in _CHISEL_LUT_PATTERN.finditer(source)}
+
+
+@cachedArtifact("generateLUTs.function-lut", rounding="rne")
+def buildFunctionTable(function="silu", intBits=2, fracBits=4, format="bf16"):
+    """
+    Returns the LUT as a uint16 array of BF16 codes, in the order printOrderedIndexedFunctionTableInChiselSyntax prints it:
+    the index is Cat(sign, int, frac), so 0 up to max-step first, then -0.0 (a zero entry), then -step down to -(max-step).
+    The -0.0 entry is +0, like the printer writes it, except for the tables of NEGATIVE_ZERO_ENTRIES.
+    With format="fp16", "e4m3", ... the entries are codes of that minifloatCodec format instead (saturating).
+    """
+    step = float(pow(2, -fracBits))
+    max = float(pow(2, intBits))
+    positive = np.arange(0.0000, max, +step)
+    negative = np.arange(-step, -max, -step)
+    x = np.concatenate([positive, [0.0], negative])
+    values = np.round(TABLE_FUNCTIONS[function](x), (fracBits+intBits))
+    if getFormat(format) is FORMATS["bf16"]:
+        table = floatToBF16(values.astype(np.float32), rounding="rne")
+    else:
+        table = floatToMinifloat(values, format, rounding="rne", saturate=True)
+    table[len(positive)] = 1 << (formatWidth(format) - 1) if (function, intBits, fracBits) in NEGATIVE_ZERO_ENTRIES else 0 # -0.0
+    return table
+
+
+@cachedArtifact("generateLUTs.function-table-values", rounding="truncate")
+def functionTableValues(function="silu", min=-3.9375, max=4.0, step=0.0625):
+    """
+    The LUT values the calculateMSE and visualizeFunctions scripts plot and compare, as a (2, n) float array: x from min
+    (inclusive) to max (exclusive) and the function of TABLE_FUNCTIONS rounded to 6 decimals, truncated to BF16.
+    """
+    x = np.arange(min, max, step)
+    values = np.round(TABLE_FUNCTIONS[function](x), 6)
+    return np.stack([x, BF16ToFloat(floatToBF16(values.astype(np.float32), rounding="truncate"))])
+
+
+@cachedArtifact("generateLUTs.exp2-lut", rounding="rne")
+def buildExp2Table(fracBits=7, format="bf16"):
+    """
+    Returns the range-reduced exp2 table of softmaxGolden.py: entry k is 2^(k / 2^fracBits) for k = 0 ... 2^fracBits - 1,
+    as BF16 codes in [1, 2). The exponent of every entry is 127, so the hardware only stores the 7 mantissa bits and
+    splices in the integer part of the input as the exponent.
+    With format="fp16", "e4m3", ... the entries are codes of that minifloatCodec format instead.
+    """
+    values = np.exp2(np.arange(1 << fracBits) / (1 << fracBits))
+    if getFormat(format) is FORMATS["bf16"]:
+        return floatToBF16(values.astype(np.float32), rounding="rne")
+    return floatToMinifloat(values, format, rounding="rne", saturate=True)
+
+
+@cachedArtifact("generateLUTs.reciprocal-lut", rounding="rne")
+def buildReciprocalTable(mantissaBits=7, format="bf16"):
+    """
+    Returns the reciprocal table of reciprocalGolden.py: entry k is 1 / m for the mantissa interval
+    m in [1 + k / 2^mantissaBits, 1 + (k + 1) / 2^mantissaBits), at its geometric midpoint, as BF16 codes in (0.5, 1].
+    With mantissaBits = 7 every mantissa has its own entry, which is then 1 / m itself, correctly rounded.
+    With format="fp16", "e4m3", ... the entries are codes of that minifloatCodec format instead.
+    """
+    k = np.arange(1 << mantissaBits)
+    low, high = 1 + k / (1 << mantissaBits), 1 + (k + 1) / (1 << mantissaBits)
+    values = 1 / low if mantissaBits >= 7 else 1 / np.sqrt(low * high)
+    if getFormat(format) is FORMATS["bf16"]:
+        return floatToBF16(values.astype(np.float32), rounding="rne")
+    return floatToMinifloat(values, format, rounding="rne", saturate=True)
+
+
+def chiselTableEntries(table, indent="      ", format="bf16"):
+    """
+    Formats a table as the body of a VecInit(Seq(...)) block, one "b...".U entry per line, as wide as the format.
+    """
+    width = formatWidth(format)
+    return ",\n".join(f"{indent}\"b{code:0{width}b}\".U" for code in table.tolist())
+
+
+def writeChiselLUTs(function="silu", path=None):
+    """
+    Regenerates every VecInit(Seq(...)) block of the Scala LUT module in place, one for each of the LUT_CONFIGURATIONS.
+    The if/else chain, comments and the fallback entry are kept as they are.
+    """
+    path = path or LUT_SCALA_FILES[function]
+    with open(path) as f:
+        source = f.read()
+    pattern = _CHISEL_LUT_PATTERN
+    written = []
+    def replaceBlock(match):
+        intBits, fracBits = int(match.group(2)), int(match.group(3))
+        written.append((intBits, fracBits))
+        indent = match.group(4) # keep the indentation the entries already have in this file
+        return match.group(1) + chiselTableEntries(buildFunctionTable(function, intBits, fracBits), indent) + match.group(6)
+    source = pattern.sub(replaceBlock, source)
+    assert sorted(written) == sorted(LUT_CONFIGURATIONS), f"found LUT blocks {written} in {path}, expected {LUT_CONFIGURATIONS}"
+    with open(path, "w") as f:
+        f.write(source)
+
+
 def printIndices(intBits=2, fracBits=4):
     step = float(pow(2, -fracBits))
     max = float(pow(2, intBits))
@@ -170,6 +298,13 @@ def printIndices(intBits=2, fracBits=4):
         print(f"({j}, {int(j < 0)}_{int(abs(j)):0{intBits}b}.{frac_part:0{fracBits}b})")
 
 if __name__ == "__main__":
+    # the generator reproduces every committed table byte for byte
+    for function in LUT_SCALA_FILES:
+        committed = readChiselLUTs(function)
+        assert sorted(committed) == sorted(LUT_CONFIGURATIONS)
+        for (intBits, fracBits), table in committed.items():
+            assert np.array_equal(buildFunctionTable(function, intBits, fracBits), table), (function, intBits, fracBits)
+
     # printIndexedFunctionTableExtensive(function="silu", intBits=2, fracBits=4)
     # printIndexedFunctionTableExtensive(function="sigmoidInv", sigmoidEntries=32)
 
@@ -180,5 +315,9 @@ if __name__ == "__main__":
     # printIndexedSiluTableSimple()
 
     # printOrderedIndexedFunctionTableInChiselSyntax(function="tanh", intBits=3, fracBits=6)
+
+    # regenerate all six LUT flavours in siluLUT.scala, geluLUT.scala and DyTLUT.scala at once:
+    # for function in LUT_SCALA_FILES:
+    #     writeChiselLUTs(function)
     
     # printIndices(intBits=2, fracBits=4)
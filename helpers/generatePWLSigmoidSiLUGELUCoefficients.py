@@ -1,6 +1,8 @@
 import struct
 import numpy as np
 import math
+from bf16Codec import floatToBF16
+from artifactCache import cachedArtifact
 # This file generates PWL (1st order approximation) coefficients for approximating segments ofthe sigmoid function:
 #
 #                                         y
@@ -47,7 +49,8 @@ import math
 # 2 segments: equally spaced x-values between 4 and 6
 # each segment is linearly interpolated as y = m*x + q, using the local slope m and y-intercept q, which are saved in a LUT: storing 10*2=20 values
 
-def createBreakpoints(min, max, step, function):
+@cachedArtifact("generatePWLSigmoidSiLUGELUCoefficients.breakpoints")
+def _createBreakpoints(min, max, step, function):
     breakpoints = []
     # Create breakpoints for the sigmoid function, or for the silu function
     j= min
@@ -71,7 +74,11 @@ def createBreakpoints(min, max, step, function):
         # breakpoints.append((round(j,14), round(function_bf16_float, 14))) # round to 9 decimal places
         breakpoints.append((j, function_float))
         j += step
-    return breakpoints
+    return np.array(breakpoints)
+
+
+def createBreakpoints(min, max, step, function):
+    return [tuple(breakpoint) for breakpoint in _createBreakpoints(min, max, step, function).tolist()]
 
 
 def calculateSlopesAndYIntercepts(breakpoints):
@@ -92,18 +99,11 @@ def calculateSlopesAndYIntercepts(breakpoints):
 def mantissaRounder(function_bytes):
     """
     Rounds the mantissa of a float32 to the nearest BF16 value, if tied round to even.
+    Takes the 4-byte big-endian float32 representation, returns the 2-byte big-endian BF16 representation.
+    For whole arrays, use bf16Codec.floatToBF16(values, rounding="rne") directly.
     """
-    # Take the first 2 bytes (most significant bits) for BF16
-    rounded_function_bf16_bytes = function_bytes[:2]
-    # Convert the last 2 bytes to an integer for comparison
-    mantissa_tail = int.from_bytes(function_bytes[2:4], byteorder='big')
-    retained_mantissa = int.from_bytes(rounded_function_bf16_bytes, byteorder='big')
-    if ((mantissa_tail > 0x8000) or (mantissa_tail==0x8000 and retained_mantissa&1)): # If (bit 15 is 1 and any lower bit is 1) or if (bit 15 is 1 and LSB of retained 7-bit mantissa is 1), round up
-        # Convert the first 2 bytes to int, add 1, then back to bytes
-        rounded_bf16_int = int.from_bytes(rounded_function_bf16_bytes, byteorder='big') + 1 # rounding up
-        return rounded_bf16_int.to_bytes(2, byteorder='big')
-    else:
-        return rounded_function_bf16_bytes # else we can just truncate(=rounding down)
+    function_float = np.frombuffer(function_bytes, dtype='>f4')
+    return int(floatToBF16(function_float, rounding="rne")[0]).to_bytes(2, byteorder='big')
 
 
 def printBF16AndFPValues(values):
@@ -0,0 +1,64 @@
+import numpy as np
+from fpUnitsGolden import fpMult16ALT, fpAdd16ALT
+from pwlSigmoidGolden import SIGMOID_SCALES
+
+"""
+Bit-accurate golden model of hsilugelu.scala and relu6.scala, vectorized over uint16 arrays of BF16 codes:
+
+    product = x * 1.0 (h-SiLU) or x * 1.703125 (h-GELU)    fpmult0
+    output  = (x * relu6(product + 3.0)) * 0.166015625     fpadd, relu6, fpmult1, fpmult2
+
+The three constants (offset 3.0, scale 1/6 and the GELU gain) can be swapped to explore neighbouring hard-sigmoid designs,
+relu6 itself always clips at 6.
+"""
+
+HSILU_OFFSET = 0x4040 # 3.0 = 1.5 * 2^1
+HSILU_SCALE = 0x3E2A # 1/6 ~ 0.166015625, magic_val
+RELU6_MAX = 0x40C0 # 6.0 = 1.5 * 2^2
+
+
+def relu6(codes):
+    """
+    relu6.scala: 0 for negative inputs and +0, 6.0 from an exponent of 130 (>= 8) or for 6 <= x < 8, otherwise the input.
+    """
+    codes = np.asarray(codes, dtype=np.uint16)
+    exponent = (codes >> 7) & 0xFF
+    clipped = (exponent >= 130) | ((exponent == 129) & (((codes >> 6) & 1) == 1))
+    output = np.where(clipped, RELU6_MAX, codes)
+    return np.where(((codes >> 15) == 1) | (codes == 0), 0, output).astype(np.uint16)
+
+
+def hsiluGELU(codes, function="silu", offset=HSILU_OFFSET, scale=HSILU_SCALE, gain=None):
+    """
+    Output of hsilugelu for BF16 inputs, gain defaults to the in_select constant of the function (1.0 or 1.703125).
+    """
+    codes = np.asarray(codes, dtype=np.uint16)
+    product = fpMult16ALT(codes, SIGMOID_SCALES[function] if gain is None else gain)
+    return fpMult16ALT(fpMult16ALT(codes, relu6(fpAdd16ALT(product, offset))), scale)
+
+
+def hsiluDesign(function="silu", offset=HSILU_OFFSET, scale=HSILU_SCALE, gain=None):
+    """
+    The h-SiLU/h-GELU design as a callable on BF16 codes, to pass to calculateMSE_exhaustive.exhaustiveErrorStats.
+    """
+    return lambda codes: hsiluGELU(codes, function, offset, scale, gain)
+
+
+if __name__ == "__main__":
+    from bf16Codec import BF16ToFloat
+    from calculateMSE_exhaustive import exhaustiveErrorStats, printErrorStats, rangeCodes
+
+    assert relu6(0xBF80) == 0 and relu6(0x0000) == 0 and relu6(0x8000) == 0
+    assert relu6(0x4080) == 0x4080 # 4.0
+    assert relu6(0x40B0) == 0x40B0 # 5.5
+    assert relu6(0x40C0) == RELU6_MAX # 6.0
+    assert relu6(0x4100) == RELU6_MAX # 8.0
+
+    assert hsiluGELU(0x3F80) == 0x3F2A # 1 * relu6(4) * 0.166015625 = 0.6640625
+    assert hsiluGELU(0x4040) == fpMult16ALT(0x4190, HSILU_SCALE) # 3 * 6 = 18
+    assert hsiluGELU(0xC080) == 0x8000 # -4: relu6(-1) = 0, -4 * 0 = -0
+
+    codes = rangeCodes(-8.0, 8.0)
+    codes = codes[np.abs(BF16ToFloat(codes)) >= 2.0**-100] # skip the FPMult16ALT exponent underflow, see pwlSigmoidGolden.py
+    for function in ["silu", "gelu"]:
+        printErrorStats(f"h-{function}", exhaustiveErrorStats(hsiluDesign(function), function, codes=codes))
@@ -0,0 +1,85 @@
+import numpy as np
+from fpUnitsGolden import fpMult16ALT, fpAdd16ALT, bf16ToFixedPoint, actualExponent
+from pwlSigmoidGolden import BF16_ONE, SIGMOID_SCALES
+
+"""
+Bit-accurate golden model of siluandgeluUsingInvSigmoid32/64/128.scala, vectorized over uint16 arrays of BF16 codes.
+The inverted LUT stores sigmoid inputs instead of outputs: threshold k is the FP3.7 value of logit(0.5 + k/(2*entries)),
+rounded down, so the index of the equally spaced sigmoid output is found by comparing BF16toFP(3, 7) of the input against it:
+
+    sigmoidInput = x * 1.0 (SiLU) or x * 1.703125 (GELU)         fpmult1
+    index        = 1 + number of thresholds <= |sigmoidInput|     the when-tree on in_a_fp
+    sigmoid      = Cat(0_01111110, index, 0...) = 0.5 + index/(2*entries)   for x >= 0
+                   1.0 - that, in an FPAdd16ALT                   for x < 0
+    output       = x * sigmoid                                    fpmult2
+
+The sigmoid saturates to 0 or 1 for |sigmoidInput| >= 8.
+"""
+
+def inverseSigmoidThresholds(entries=32):
+    """
+    in_a_fp thresholds (FP3.7 integers) of the when-tree for index 2 up to entries-1.
+    """
+    k = np.arange(2, entries)
+    y = 0.5 + k / (2 * entries)
+    return np.floor(np.log(y / (1 - y)) * 2**7).astype(np.int32)
+
+
+def invSigmoidFromInput(sigmoidInput, entries=32):
+    """
+    Value of sigmoidReg for the BF16 sigmoid input, i.e. the output of fpmult1.
+    """
+    log2Entries = int(entries).bit_length() - 1
+    assert entries == 1 << log2Entries and 2 <= log2Entries <= 7, "the index must fit in the 7 mantissa bits"
+    sigmoidInput = np.asarray(sigmoidInput, dtype=np.uint16)
+    sign = (sigmoidInput >> 15) & 1
+    _, aInt, aFrac = bf16ToFixedPoint(sigmoidInput, 3, 7)
+    index = 1 + np.searchsorted(inverseSigmoidThresholds(entries), (aInt << 7) | aFrac, side="right")
+    positive = (0x3F00 | (index << (7 - log2Entries))).astype(np.uint16) # Cat("b0_01111110".U, index, 0.U)
+    sigmoid = np.where(sign == 1, fpAdd16ALT(BF16_ONE, 0x8000 | positive), positive) # 1 - f(-x)
+    sigmoid = np.where(actualExponent(sigmoidInput) >= 3, np.where(sign == 1, 0, BF16_ONE), sigmoid)
+    return sigmoid.astype(np.uint16)
+
+
+def invSigmoidSiLUGELU(codes, entries=32, function="silu"):
+    """
+    Output of siluandgeluUsingInvSigmoid<entries> for BF16 inputs: x * sigmoid(x) or x * sigmoid(1.703125x).
+    """
+    codes = np.asarray(codes, dtype=np.uint16)
+    sigmoid = invSigmoidFromInput(fpMult16ALT(codes, SIGMOID_SCALES[function]), entries)
+    sigmoid = np.where((codes & 0x7FFF) == 0, 0, sigmoid) # in_a = +-0
+    return fpMult16ALT(codes, sigmoid)
+
+
+def invSigmoidDesign(entries=32, function="silu"):
+    """
+    The inverted sigmoid design as a callable on BF16 codes, to pass to calculateMSE_exhaustive.exhaustiveErrorStats.
+    """
+    return lambda codes: invSigmoidSiLUGELU(codes, entries, function)
+
+
+if __name__ == "__main__":
+    import os
+    import re
+    from bf16Codec import BF16ToFloat
+    from calculateMSE_exhaustive import exhaustiveErrorStats, printErrorStats, rangeCodes
+
+    # the thresholds must be exactly the in_a_fp literals of the Scala when-trees
+    scalaDir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src", "main", "scala", "gelu")
+    for entries in [32, 64, 128]:
+        with open(os.path.join(scalaDir, f"siluandgeluUsingInvSigmoid{entries}.scala")) as f:
+            literals = sorted({int(literal.replace("_", ""), 2) for literal in re.findall(r'in_a_fp >= "b([01_]+)"', f.read())})
+        assert literals == inverseSigmoidThresholds(entries).tolist(), f"thresholds of siluandgeluUsingInvSigmoid{entries} differ"
+
+    # 1.0 = 001.0000000 lies between logit(0.5 + 14/64) = 0.9946 and logit(0.5 + 15/64) = 1.0609: index 14
+    assert invSigmoidSiLUGELU(0x3F80, 32) == 0x3F38 # 0.5 + 14/64 = 0.71875
+    assert invSigmoidSiLUGELU(0xBF80, 32) == 0xBE90 # -1 * (1 - 0.71875)
+    assert invSigmoidSiLUGELU(0x3C00, 32) == fpMult16ALT(0x3C00, 0x3F04) # 2^-7 < 0.125: index 1, 0.5 + 1/64
+    assert invSigmoidSiLUGELU(0x4100, 128) == 0x4100 # 8.0 saturates: sigmoid = 1
+    assert invSigmoidSiLUGELU(0x8000, 64) == 0x8000 # -0 * 0: fpmult2 keeps the xor of the signs
+
+    codes = rangeCodes(-8.0, 8.0)
+    codes = codes[np.abs(BF16ToFloat(codes)) >= 2.0**-100] # skip the FPMult16ALT exponent underflow, see pwlSigmoidGolden.py
+    for function in ["silu", "gelu"]:
+        for entries in [32, 64, 128]:
+            printErrorStats(f"{function} {entries}", exhaustiveErrorStats(invSigmoidDesign(entries, function), function, codes=codes))
@@ -0,0 +1,95 @@
+import numpy as np
+from fpUnitsGolden import fpMult16ALT, bf16ToFixedPoint, actualExponent
+from generateLUTs import buildFunctionTable
+from minifloatCodec import minifloatToBF16, getFormat, FORMATS
+
+"""
+Bit-accurate golden model of the zero-order LUT designs siluUsingLUT.scala, geluUsingLUT.scala and DyTUsingLUT.scala,
+vectorized over uint16 arrays of BF16 codes:
+
+    index  = Cat(sign, int, frac) of BF16toFP(intBits, fracBits)
+    output = LUT[index]                      for |x| < 2^intBits
+             0 or x (SiLU/GELU), -1 or +1 (DyT)  for |x| >= 2^intBits
+             0                               for x = +-0
+
+DyT first multiplies the input with alpha in an FPMult16ALT, the LUT then holds tanh.
+The LUT contents come from generateLUTs.buildFunctionTable, which writes the Scala tables. With entryFormat "fp16", "e4m3",
+"e5m2", ... the entries are stored in that minifloatCodec format and widened to BF16 when they are read.
+"""
+
+LUT_FUNCTIONS = {"silu": "silu", "gelu": "gelu", "dyt": "tanh"} # design -> function stored in the LUT
+
+
+def lutEntries(function="silu", intBits=2, fracBits=4, entryFormat="bf16"):
+    """
+    The LUT as BF16 codes, as the datapath reads them from a table stored in entryFormat.
+    """
+    if getFormat(entryFormat) is FORMATS["bf16"]:
+        return np.asarray(buildFunctionTable(LUT_FUNCTIONS[function], intBits, fracBits))
+    return minifloatToBF16(buildFunctionTable(LUT_FUNCTIONS[function], intBits, fracBits, format=entryFormat), entryFormat)
+
+
+def lutFromInput(codes, function="silu", intBits=2, fracBits=4, entryFormat="bf16"):
+    """
+    Output of the LUT design for its (already scaled) input, before the out-of-range and zero checks.
+    """
+    sign, intPart, fracPart = bf16ToFixedPoint(codes, intBits, fracBits)
+    index = (sign << (intBits + fracBits)) | (intPart << fracBits) | fracPart
+    return lutEntries(function, intBits, fracBits, entryFormat)[index]
+
+
+def lutActivation(codes, function="silu", intBits=2, fracBits=4, alpha=0x3F80, entryFormat="bf16"):
+    """
+    Output of siluUsingLUT, geluUsingLUT or DyTUsingLUT (function="dyt", tanh(alpha * x)) for BF16 inputs.
+    """
+    codes = np.asarray(codes, dtype=np.uint16)
+    if function == "dyt":
+        codes = fpMult16ALT(codes, alpha) # tanh_input
+    return lutOutput(codes, lutFromInput(codes, function, intBits, fracBits, entryFormat), function, intBits)
+
+
+def lutOutput(codes, lutValue, function="silu", intBits=2):
+    """
+    The out-of-range and zero checks on the (already scaled) input, around the value read from the table.
+    """
+    sign = (codes >> 15) & 1
+    if function == "dyt":
+        outOfRange = np.where(sign == 1, 0xBF80, 0x3F80) # -1 or +1
+    else:
+        outOfRange = np.where(sign == 1, 0, codes) # 0 or x
+    output = np.where(actualExponent(codes) >= intBits, outOfRange, lutValue)
+    return np.where((codes & 0x7FFF) == 0, 0, output).astype(np.uint16)
+
+
+def lutDesign(function="silu", intBits=2, fracBits=4, entryFormat="bf16"):
+    """
+    The LUT design as a callable on BF16 codes, to pass to calculateMSE_exhaustive.exhaustiveErrorStats.
+    """
+    return lambda codes: lutActivation(codes, function, intBits, fracBits, entryFormat=entryFormat)
+
+
+if __name__ == "__main__":
+    from bf16Codec import BF16ToFloat
+    from calculateMSE_exhaustive import exhaustiveErrorStats, printErrorStats, rangeCodes
+    from generateLUTs import LUT_CONFIGURATIONS
+
+    # 1.0 = 01.0000 is entry 16 of the 2.4 table, -1.0 = 1_01.0000 is entry 64 + 16
+    assert lutActivation(0x3F80, "silu", 2, 4) == buildFunctionTable("silu", 2, 4)[16]
+    assert lutActivation(0xBF80, "silu", 2, 4) == buildFunctionTable("silu", 2, 4)[64 + 16]
+    assert lutActivation(0x4080, "silu", 2, 4) == 0x4080 # 4.0 is out of range: x
+    assert lutActivation(0xC080, "gelu", 2, 4) == 0x0000 # -4.0 is out of range: 0
+    assert lutActivation(0x4080, "silu", 3, 4) == buildFunctionTable("silu", 3, 4)[64] # but in range of the 3.4 table
+    assert lutActivation(0xC100, "dyt", 3, 6) == 0xBF80 # -8.0: -1
+    assert lutActivation(0x8000, "dyt", 2, 4) == 0x0000
+
+    # BF16toFP wraps for inputs far below 2^-fracBits (see fpUnitsGolden.py), so those are left out here
+    codes = rangeCodes(-8.0, 8.0)
+    codes = codes[np.abs(BF16ToFloat(codes)) >= 2.0**-20]
+    for function, reference in [("silu", "silu"), ("gelu", "gelu"), ("dyt", "tanh")]:
+        for intBits, fracBits in LUT_CONFIGURATIONS:
+            stats = exhaustiveErrorStats(lutDesign(function, intBits, fracBits), reference, codes=codes)
+            printErrorStats(f"{function} {intBits}.{fracBits}", stats)
+        # the 3.6 table with its entries stored in narrower formats
+        for entryFormat in ["fp16", "e5m2", "e4m3"]:
+            stats = exhaustiveErrorStats(lutDesign(function, 3, 6, entryFormat), reference, codes=codes)
+            printErrorStats(f"{function} 3.6 {entryFormat}", stats)
@@ -0,0 +1,255 @@
+import functools
+import numpy as np
+from bf16Codec import ROUNDING_MODES, floatToBF16, BF16ToFloat
+
+"""
+Vectorized conversion between floats and small floating-point formats with any exponent and mantissa width, the
+generalization of bf16Codec to FP16, the two OCP FP8 formats and custom ExMy formats. Codes are kept as uint16 arrays
+(uint8 would do for FP8, but uint16 keeps every format interchangeable in the tables and golden models).
+
+    format  exponent  mantissa  bias  largest finite  special values
+    bf16    8         7         127   3.39e38         IEEE: infinities and NaNs at the all-ones exponent
+    fp16    5         10        15    65504           IEEE
+    e5m2    5         2         15    57344           IEEE
+    e4m3    4         3         7     448             OCP E4M3FN: no infinities, only S.1111.111 is NaN
+
+A format is a dict as in FORMATS; minifloatFormat(expBits, mantBits) builds an IEEE-like custom one.
+Values that round beyond the largest finite number become infinity, or NaN in a format without infinities
+(saturate=True clamps to the largest finite number instead).
+"""
+
+FORMATS = {
+    "bf16": {"name": "bf16", "expBits": 8, "mantBits": 7, "bias": 127, "infinities": True},
+    "fp16": {"name": "fp16", "expBits": 5, "mantBits": 10, "bias": 15, "infinities": True},
+    "e5m2": {"name": "e5m2", "expBits": 5, "mantBits": 2, "bias": 15, "infinities": True},
+    "e4m3": {"name": "e4m3", "expBits": 4, "mantBits": 3, "bias": 7, "infinities": False},
+}
+
+
+def minifloatFormat(expBits, mantBits, bias=None, infinities=True):
+    """
+    A custom ExMy format, by default IEEE-like with bias 2^(expBits-1) - 1, e.g. minifloatFormat(3, 4).
+    Names like "e3m4" passed to the functions below are built the same way.
+    """
+    if expBits < 2 or mantBits < 1 or expBits + mantBits + 1 > 16:
+        raise ValueError(f"Unsupported format E{expBits}M{mantBits}: 2 to 14 exponent bits, at least 1 mantissa bit, 16 bits at most.")
+    bias = (1 << (expBits - 1)) - 1 if bias is None else bias
+    return {"name": f"e{expBits}m{mantBits}", "expBits": expBits, "mantBits": mantBits, "bias": bias, "infinities": infinities}
+
+
+def getFormat(format):
+    """
+    The format dict for a name in FORMATS, an "e<x>m<y>" name or a format dict.
+    """
+    if isinstance(format, dict):
+        return format
+    if format in FORMATS:
+        return FORMATS[format]
+    if format.startswith("e") and "m" in format:
+        expBits, mantBits = format[1:].split("m")
+        return minifloatFormat(int(expBits), int(mantBits))
+    raise ValueError(f"Unsupported format '{format}'. Use one of {list(FORMATS)} or 'e<exponent bits>m<mantissa bits>'.")
+
+
+def formatWidth(format):
+    """
+    Number of bits of a code: sign, exponent and mantissa.
+    """
+    format = getFormat(format)
+    return 1 + format["expBits"] + format["mantBits"]
+
+
+def _limits(format):
+    # the exponent field of the largest finite number, its mantissa field and value
+    expBits, mantBits = format["expBits"], format["mantBits"]
+    if format["infinities"]:
+        maxExp, maxMant = (1 << expBits) - 2, (1 << mantBits) - 1
+    else: # the all-ones exponent holds numbers too, up to the NaN mantissa S.11..1.11..1
+        maxExp, maxMant = (1 << expBits) - 1, (1 << mantBits) - 2
+    return maxExp, maxMant, np.ldexp(1.0 + maxMant / (1 << mantBits), maxExp - format["bias"])
+
+
+def largestFinite(format):
+    return float(_limits(getFormat(format))[2])
+
+
+def _nanCode(format):
+    format = getFormat(format)
+    expMask = ((1 << format["expBits"]) - 1) << format["mantBits"]
+    return expMask | (1 << (format["mantBits"] - 1)) if format["infinities"] else expMask | ((1 << format["mantBits"]) - 1)
+
+
+def floatToMinifloat(values, format="bf16", rounding="rne", saturate=False):
+    """
+    Converts float values to codes of the format (uint16 array), rounding="rne" or "rtz" ("truncate" is rtz as well).
+    For bf16 this is bf16Codec.floatToBF16 on the float32 values.
+    """
+    format = getFormat(format)
+    if rounding not in ROUNDING_MODES:
+        raise ValueError(f"Unsupported rounding mode '{rounding}'. Use one of {ROUNDING_MODES}.")
+    if format is FORMATS["bf16"] and not saturate:
+        return floatToBF16(values, rounding)
+    values = np.asarray(values, dtype=np.float64)
+    expBits, mantBits, bias = format["expBits"], format["mantBits"], format["bias"]
+    maxExp, maxMant, maxValue = _limits(format)
+    sign = np.signbit(values).astype(np.uint16)
+    magnitude = np.abs(values)
+    finite = np.isfinite(magnitude)
+    magnitude = np.where(finite, magnitude, 0.0)
+
+    # the quantum of the binade, subnormals share the one of the smallest exponent
+    _, exponent = np.frexp(magnitude)
+    exponent = np.maximum(exponent - 1, 1 - bias)
+    quantum = np.ldexp(1.0, exponent - mantBits)
+    steps = magnitude / quantum # exact, a power of two scaling
+    steps = np.rint(steps) if rounding == "rne" else np.floor(steps) # np.rint rounds half to even
+    rounded = steps * quantum
+
+    # back to fields: the rounding may have carried into the next binade
+    _, roundedExponent = np.frexp(rounded)
+    normal = rounded >= np.ldexp(1.0, 1 - bias)
+    expField = np.where(normal, roundedExponent - 1 + bias, 0)
+    mantField = np.where(normal, np.ldexp(rounded, mantBits - (roundedExponent - 1)) - (1 << mantBits),
+                         np.ldexp(rounded, mantBits - (1 - bias)))
+    codes = (expField.astype(np.int64) << mantBits) | mantField.astype(np.int64)
+
+    maxCode = (maxExp << mantBits) | maxMant
+    infCode = ((1 << expBits) - 1) << mantBits if format["infinities"] else _nanCode(format)
+    overflow = rounded > maxValue
+    codes = np.where(overflow, maxCode if saturate or rounding != "rne" else infCode, codes)
+    infinite = ~finite & ~np.isnan(values)
+    codes = np.where(infinite, maxCode if saturate else infCode, codes)
+    codes = np.where(np.isnan(values), _nanCode(format), codes)
+    return (sign.astype(np.int64) << (expBits + mantBits) | codes).astype(np.uint16)
+
+
+@functools.lru_cache(maxsize=None)
+def _decodeTable(expBits, mantBits, bias, infinities):
+    codes = np.arange(1 << (1 + expBits + mantBits), dtype=np.int64)
+    sign = np.where(codes >> (expBits + mantBits), -1.0, 1.0)
+    expField = (codes >> mantBits) & ((1 << expBits) - 1)
+    mantField = codes & ((1 << mantBits) - 1)
+    magnitude = np.where(expField == 0, np.ldexp(mantField / (1 << mantBits), 1 - bias),
+                         np.ldexp(1.0 + mantField / (1 << mantBits), expField - bias))
+    allOnes = expField == (1 << expBits) - 1
+    if infinities:
+        magnitude = np.where(allOnes, np.where(mantField == 0, np.inf, np.nan), magnitude)
+    else:
+        magnitude = np.where(allOnes & (mantField == (1 << mantBits) - 1), np.nan, magnitude)
+    table = sign * magnitude
+    table.setflags(write=False)
+    return table
+
+
+def minifloatToFloat(codes, format="bf16"):
+    """
+    Converts codes of the format to float64 values (every format up to 16 bits is exact in float64).
+    """
+    format = getFormat(format)
+    codes = np.asarray(codes, dtype=np.uint16)
+    if format is FORMATS["bf16"]:
+        return BF16ToFloat(codes).astype(np.float64)
+    table = _decodeTable(format["expBits"], format["mantBits"], format["bias"], format["infinities"])
+    return table[codes & ((1 << formatWidth(format)) - 1)]
+
+
+def roundToMinifloat(values, format="bf16", rounding="rne", saturate=False):
+    """
+    Quantizes float values to the nearest values of the format, returned as float64.
+    """
+    return minifloatToFloat(floatToMinifloat(values, format, rounding, saturate), format)
+
+
+def bf16StoredAs(codes, format="bf16"):
+    """
+    BF16 codes after a round trip through the format (RNE, saturating): what a BF16 datapath reads back from a table or
+    coefficient ROM whose entries are stored in the narrower format. E4M3 and E5M2 values widen to BF16 exactly.
+    """
+    codes = np.asarray(codes, dtype=np.uint16)
+    if getFormat(format) is FORMATS["bf16"]:
+        return codes
+    return minifloatToBF16(floatToMinifloat(BF16ToFloat(codes).astype(np.float64), format, "rne", saturate=True), format)
+
+
+def minifloatToBF16(codes, format="bf16"):
+    """
+    Codes of the format widened (or for fp16 rounded to nearest even) to BF16 codes.
+    """
+    return floatToBF16(minifloatToFloat(codes, format).astype(np.float32), "rne")
+
+
+def allCodes(format="bf16"):
+    """
+    Every code of the format in ascending code order: positive numbers first, then the negative ones.
+    """
+    return np.arange(1 << formatWidth(format), dtype=np.uint32).astype(np.uint16)
+
+
+def isFiniteMinifloat(codes, format="bf16"):
+    """
+    True for every code that is not an infinity or a NaN.
+    """
+    return np.isfinite(minifloatToFloat(codes, format))
+
+
+def finiteCodes(format="bf16"):
+    codes = allCodes(format)
+    return codes[isFiniteMinifloat(codes, format)]
+
+
+def minifloatBits(codes, format="bf16"):
+    """
+    Formats codes as binary strings of the format's width, e.g. 8 bits for "b...".U entries of an FP8 table.
+    """
+    width = formatWidth(format)
+    return [f"{code:0{width}b}" for code in np.asarray(codes, dtype=np.uint16).reshape(-1).tolist()]
+
+
+def minifloatUlp(values, format="bf16"):
+    """
+    Unit in the last place of the format's grid at the given values: 2^(exponent - mantBits), with the subnormal
+    spacing 2^(1 - bias - mantBits) as minimum. For bf16 this is bf16Codec.BF16Ulp.
+    """
+    format = getFormat(format)
+    magnitude = np.abs(np.asarray(values, dtype=np.float64))
+    magnitude = np.where(np.isfinite(magnitude), magnitude, 0.0)
+    _, exponent = np.frexp(magnitude)
+    exponent = np.where(magnitude > 0, exponent - 1, 1 - format["bias"])
+    return np.ldexp(np.float64(1.0), np.maximum(exponent, 1 - format["bias"]) - format["mantBits"])
+
+
+if __name__ == "__main__":
+    from bf16Codec import BF16Ulp
+
+    # bf16 through the generic path must agree with bf16Codec, for every rounding mode and special value
+    rng = np.random.default_rng(0)
+    values = np.concatenate([rng.standard_normal(100000) * 10.0 ** rng.integers(-40, 38, 100000),
+                             [0.0, -0.0, np.inf, -np.inf, np.nan, 3.4e38, 1e-45]]).astype(np.float32)
+    generic = dict(FORMATS["bf16"]) # a copy, so floatToMinifloat does not take the bf16Codec shortcut
+    for rounding in ["rne", "rtz"]:
+        expected = floatToBF16(values, rounding)
+        codes = floatToMinifloat(values, generic, rounding)
+        same = (codes == expected) | (np.isnan(values) & np.isnan(minifloatToFloat(codes, generic)))
+        assert np.all(same), values[~same][:5]
+    with np.errstate(invalid="ignore"): # the signaling NaN codes
+        assert np.array_equal(minifloatToFloat(allCodes(generic), generic), BF16ToFloat(allCodes("bf16")).astype(np.float64), equal_nan=True)
+    finite = np.abs(values) < 3e38
+    assert np.array_equal(minifloatUlp(values[finite], "bf16"), BF16Ulp(values[finite]))
+
+    # fp16 must agree with numpy's float16, which rounds to nearest even
+    values16 = rng.standard_normal(100000) * 10.0 ** rng.integers(-9, 6, 100000)
+    with np.errstate(over="ignore"):
+        assert np.array_equal(floatToMinifloat(values16, "fp16"), values16.astype(np.float16).view(np.uint16))
+    assert np.array_equal(minifloatToFloat(allCodes("fp16"), "fp16"), allCodes("fp16").view(np.float16).astype(np.float64), equal_nan=True)
+
+    # FP8: every code round-trips, and the largest numbers match the OCP specification
+    for name in ["e4m3", "e5m2", "e3m4"]:
+        codes = finiteCodes(name)
+        assert np.array_equal(floatToMinifloat(minifloatToFloat(codes, name), name), codes)
+        print(f"{name}: {len(codes)} finite codes, largest {largestFinite(name):g}, "
+              f"smallest subnormal {minifloatToFloat(np.uint16(1), name):g}, {formatWidth(name)} bits")
+    assert largestFinite("e4m3") == 448 and largestFinite("e5m2") == 57344
+    assert floatToMinifloat(1000.0, "e4m3") == 0x7F and floatToMinifloat(1000.0, "e4m3", saturate=True) == 0x7E
+    assert floatToMinifloat(1e6, "e5m2") == 0x7C and floatToMinifloat(0.3, "e4m3") == 0x2A # 0.3 -> 0.3125
+    assert minifloatBits(floatToMinifloat(-1.5, "e4m3"), "e4m3") == ["10111100"]
+    assert bf16StoredAs(0x3F9A, "e4m3") == 0x3FA0 and bf16StoredAs(0x3F9A, "fp16") == 0x3F9A # 1.203125 -> 1.25
@@ -0,0 +1,165 @@
+import math
+import numpy as np
+from bf16Codec import floatToBF16, BF16ToFloat
+from estimateArea import designResources
+from fpUnitsGolden import fpMult16ALT, fpAdd16ALT, bf16ToFixedPoint
+from lutGolden import LUT_FUNCTIONS, lutEntries, lutOutput
+from minifloatCodec import floatToMinifloat, minifloatToBF16, formatWidth
+from quadraticGolden import FP_ADD_LATENCY
+from toplevelThroughputModel import ACTIVATION_LATENCIES
+
+"""
+Bipartite and multipartite decompositions of the direct LUTs of siluUsingLUT, geluUsingLUT and DyTUsingLUT.
+The n = 1 + intBits + fracBits bit index Cat(sign, int, frac) of BF16toFP is split from the top into x0 (a bits),
+x1 (b bits) and x2, and x2 again into x2_1, x2_2, ... (c_1, c_2, ... bits):
+
+    LUT[x0 x1 x2] ~ TIV[x0 x1] + TO_1[x0' x2_1] + TO_2[x0'' x2_2] + ...
+
+where TIV holds the initial values and every offset table TO_i is indexed by x2_i and the top a_i bits of x0. The sign is
+the top bit of x0, so no table entry straddles zero. A split is (a, b, [(a_1, c_1), (a_2, c_2), ...]): one offset table is
+the bipartite case, more are multipartite. The tables are the least-squares fit of the 1-f table on its own grid
+(alternating least squares, exact in one pass for bipartite), rounded to BF16, with the offsets refitted to the rounded
+initial values. The golden model adds the table outputs with FPAdd16ALTs, an adder tree over the offsets and TIV.
+ROM bits count the distinct entries of every table, the way estimateArea prices the direct LUT they are compared with.
+"""
+
+
+def _splitKeys(split, n):
+    """
+    For every one of the 2^n indices, the entry it reads in TIV and in each offset table.
+    """
+    a, b, offsets = split
+    assert a >= 1 and b >= 0 and a + b + sum(c for _, c in offsets) == n, f"split {split} does not cover {n} index bits"
+    index = np.arange(1 << n)
+    keys = [index >> (n - a - b)] # TIV[x0 x1]
+    low = n - a - b
+    for ai, ci in offsets:
+        assert 1 <= ai <= a, f"offset table index {ai} bits of x0, x0 only has {a}"
+        low -= ci
+        x2i = (index >> low) & ((1 << ci) - 1)
+        keys.append(((index >> (n - ai)) << ci) | x2i)
+    return keys
+
+
+def fitMultipartiteTables(function="silu", intBits=3, fracBits=6, split=(5, 2, [(3, 3)]), offsetFormat="bf16", iterations=20):
+    """
+    Returns the tables of a split as a dict with split, tiv and offsets (BF16 codes, the offsets as read back from
+    offsetFormat), the float fit error on the table grid (MSE against the 1-f table), the ROM bits and those of the
+    direct LUT (fullRomBits), both counted in distinct entries like estimateArea.designResources.
+    """
+    n = 1 + intBits + fracBits
+    target = BF16ToFloat(lutEntries(function, intBits, fracBits)).astype(np.float64)
+    keys = _splitKeys(split, n)
+    counts = [np.bincount(key) for key in keys]
+    tables = [np.zeros(len(count)) for count in counts]
+    for _ in range(iterations if len(keys) > 2 else 1):
+        for i, key in enumerate(keys):
+            residual = target - sum(table[k] for j, (table, k) in enumerate(zip(tables, keys)) if j != i)
+            tables[i] = np.bincount(key, residual) / counts[i]
+    fitError = float(np.mean(np.square(target - sum(table[k] for table, k in zip(tables, keys)))))
+
+    tiv = floatToBF16(tables[0].astype(np.float32))
+    residual = target - BF16ToFloat(tiv)[keys[0]]
+    offsets = []
+    for i, key in enumerate(keys[1:], start=1): # the rounding error of the earlier tables goes into the later ones
+        offset = np.bincount(key, residual) / counts[i]
+        stored = minifloatToBF16(floatToMinifloat(offset, offsetFormat, "rne", saturate=True), offsetFormat)
+        residual = residual - BF16ToFloat(stored)[key]
+        offsets.append(stored)
+    romBits = len(np.unique(tiv)) * 16 + sum(len(np.unique(offset)) for offset in offsets) * formatWidth(offsetFormat)
+    fullRomBits = designResources({"family": "lut", "function": function, "intBits": intBits, "fracBits": fracBits})["romBits"]
+    return {"function": function, "intBits": intBits, "fracBits": fracBits, "split": split, "tiv": tiv, "offsets": offsets,
+            "keys": keys, "fitError": fitError, "romBits": romBits, "fullRomBits": fullRomBits, "adders": len(offsets),
+            "latency": ACTIVATION_LATENCIES["lut"] + math.ceil(math.log2(len(offsets) + 1)) * FP_ADD_LATENCY}
+
+
+def _addTree(values):
+    while len(values) > 1:
+        values = [fpAdd16ALT(values[i], values[i + 1]) if i + 1 < len(values) else values[i] for i in range(0, len(values), 2)]
+    return values[0]
+
+
+def multipartiteFromIndex(index, tables):
+    """
+    The sum of the table outputs for LUT indices, TIV first, through a tree of FPAdd16ALTs.
+    """
+    values = [tables["tiv"][tables["keys"][0][index]]]
+    values += [offset[key[index]] for offset, key in zip(tables["offsets"], tables["keys"][1:])]
+    return _addTree(values)
+
+
+def multipartiteActivation(codes, tables, alpha=0x3F80):
+    """
+    Output of the LUT design with its table replaced by the multipartite tables, for BF16 inputs.
+    """
+    function, intBits, fracBits = tables["function"], tables["intBits"], tables["fracBits"]
+    codes = np.asarray(codes, dtype=np.uint16)
+    if function == "dyt":
+        codes = fpMult16ALT(codes, alpha) # tanh_input
+    sign, intPart, fracPart = bf16ToFixedPoint(codes, intBits, fracBits)
+    index = (sign << (intBits + fracBits)) | (intPart << fracBits) | fracPart
+    return lutOutput(codes, multipartiteFromIndex(index, tables), function, intBits)
+
+
+def multipartiteDesign(tables):
+    """
+    The multipartite design as a callable on BF16 codes, to pass to calculateMSE_exhaustive.exhaustiveErrorStats.
+    """
+    return lambda codes: multipartiteActivation(codes, tables)
+
+
+def enumerateSplits(n=10, maxOffsetTables=2):
+    """
+    Every split of n index bits with at least one bit in x0, x1 and every x2_i, and one or up to maxOffsetTables offset tables.
+    """
+    splits = []
+    def offsetSplits(a, bits, tables):
+        if tables == 1:
+            return [[(ai, bits)] for ai in range(1, a + 1)]
+        return [[(ai, ci)] + rest for ci in range(1, bits) for ai in range(1, a + 1) for rest in offsetSplits(a, bits - ci, tables - 1)]
+    for a in range(1, n - 1):
+        for b in range(1, n - a):
+            for tables in range(1, min(maxOffsetTables, n - a - b) + 1):
+                splits += [(a, b, offsets) for offsets in offsetSplits(a, n - a - b, tables)]
+    return splits
+
+
+def searchMultipartite(function="silu", intBits=3, fracBits=6, maxOffsetTables=2, offsetFormat="bf16"):
+    """
+    Fits every split and returns those on the Pareto front of ROM bits against the fit error, fewest ROM bits first.
+    """
+    candidates = sorted((fitMultipartiteTables(function, intBits, fracBits, split, offsetFormat)
+                         for split in enumerateSplits(1 + intBits + fracBits, maxOffsetTables)),
+                        key=lambda tables: (tables["romBits"], tables["fitError"]))
+    front = []
+    for tables in candidates:
+        if not front or tables["fitError"] < front[-1]["fitError"]:
+            front.append(tables)
+    return front
+
+
+if __name__ == "__main__":
+    from calculateMSE_exhaustive import exhaustiveErrorStats, rangeCodes
+    from lutGolden import lutDesign
+
+    # index 10 011 101 reads TIV[10 011] and TO_1[1 101], the top bit of x0 with x2
+    keys = _splitKeys((2, 3, [(1, 3)]), 8)
+    assert keys[0][0b10_011_101] == 0b10011 and keys[1][0b10_011_101] == 0b1_101
+
+    codes = rangeCodes(-8.0, 8.0)
+    codes = codes[np.abs(BF16ToFloat(codes)) >= 2.0**-20] # skip the BF16toFP wrap-around, see sweepDesignSpace.sweepCodes
+    for function in ["silu", "gelu", "dyt"]:
+        reference = LUT_FUNCTIONS[function]
+        full = exhaustiveErrorStats(lutDesign(function, 3, 6), reference, codes=codes)
+        fullRomBits = designResources({"family": "lut", "function": function, "intBits": 3, "fracBits": 6})["romBits"]
+        print(f"{function} LUT 3.6: {fullRomBits} ROM bits (distinct entries)  MSE {full['MSE']:.3e}  max|err| {full['maxAbsError']:.3e}")
+        for offsetFormat in ["bf16", "e5m2"]:
+            # the front below the ROM of the 1-f table, printed where it is within 1.5x of its MSE
+            for tables in searchMultipartite(function, 3, 6, offsetFormat=offsetFormat):
+                assert tables["fullRomBits"] == fullRomBits
+                if tables["romBits"] >= fullRomBits:
+                    continue
+                stats = exhaustiveErrorStats(multipartiteDesign(tables), reference, codes=codes)
+                if stats["MSE"] <= 1.5 * full["MSE"]:
+                    print(f"  {str(tables['split']):<28} offsets {offsetFormat:<5} {tables['romBits']:>6} ROM bits  {tables['adders']} "
+                          f"adders  {tables['latency']} cycles  MSE {stats['MSE']:.3e}  max|err| {stats['maxAbsError']:.3e}")
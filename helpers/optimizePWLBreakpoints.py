@@ -0,0 +1,195 @@
+import numpy as np
+from bf16Codec import floatToBF16, BF16ToFloat, roundToBF16
+from calculateMSE_exhaustive import REFERENCE_FUNCTIONS
+
+"""
+Optimal breakpoint placement for PWL (1st order) approximations, instead of the hand-picked equal-y/equal-x segmentations
+of generatePWLSigmoidSiLUGELUCoefficients.py.
+
+Candidate breakpoints are the points of the fixed-point grid (step 2^-fracBits, what BF16toFP compares in hardware) that are
+also exactly representable in BF16. The error of every possible segment [c_i, c_j) is computed up front on a dense uniform
+sample of the range, then dynamic programming picks the segmentation with the lowest total error for the segment budget:
+  norm="mse": least-squares line per segment, segment cost = sum of squared errors (prefix sums, so all N^2 costs at once)
+  norm="max": secant line shifted by half its error band per segment, segment cost = max abs error (evaluated in chunks per start)
+              this is the minimax line for segments without an inflection point, like the sigmoid and tanh on x >= 0
+Finally the slopes and intercepts are rounded to BF16, picking the best pair among the neighbouring BF16 codes of each,
+and the error is reported again with those BF16 coefficients.
+"""
+
+def candidateBreakpoints(xmin=0.0, xmax=6.0, fracBits=7):
+    """
+    Multiples of 2^-fracBits in [xmin, xmax] that are exactly representable in BF16.
+    """
+    grid = np.arange(np.ceil(xmin * 2**fracBits), np.floor(xmax * 2**fracBits) + 1) / 2**fracBits
+    return grid[roundToBF16(grid).astype(np.float64) == grid]
+
+
+def _segmentCostsMSE(candidates, samples, y):
+    # prefix sums of 1, x, x^2, y, xy and y^2 over the samples, x relative to the range start for a bit more precision
+    x = samples - candidates[0]
+    prefix = np.zeros((6, len(samples) + 1))
+    prefix[:, 1:] = np.cumsum(np.stack([np.ones_like(x), x, x*x, y, x*y, y*y]), axis=1)
+    bounds = np.searchsorted(samples, candidates, side="left")
+    sums = prefix[:, bounds[None, :]] - prefix[:, bounds[:, None]] # sums[:, i, j] over the samples in [c_i, c_j)
+    n, sx, sxx, sy, sxy, syy = sums
+    with np.errstate(divide="ignore", invalid="ignore"):
+        determinant = n * sxx - sx * sx
+        slope = (n * sxy - sx * sy) / determinant
+        intercept = (sy - slope * sx) / n
+        sse = syy - slope * sxy - intercept * sy # residual of the least-squares fit
+    sse = np.where(determinant > 0, np.maximum(sse, 0.0), np.where(n > 0, 0.0, np.inf)) # 0 or 1 sample: exact fit
+    sse[np.tril_indices(len(candidates))] = np.inf # only j > i are segments
+    return sse
+
+
+def _segmentCostsMax(candidates, samples, y, function):
+    fc = function(candidates)
+    bounds = np.searchsorted(samples, candidates, side="left")
+    costs = np.full((len(candidates), len(candidates)), np.inf)
+    for i in range(len(candidates) - 1):
+        ends = np.arange(i + 1, len(candidates))
+        slope = (fc[ends] - fc[i]) / (candidates[ends] - candidates[i])
+        inside = slice(bounds[i], bounds[-1] + 1)
+        deviation = y[inside][None, :] - (fc[i] + slope[:, None] * (samples[inside][None, :] - candidates[i]))
+        inSegment = samples[inside][None, :] <= candidates[ends][:, None]
+        band = np.where(inSegment, deviation, -np.inf).max(axis=1) - np.where(inSegment, deviation, np.inf).min(axis=1)
+        costs[i, ends] = band / 2
+    return costs
+
+
+def _dynamicProgramming(costs, segments, combine):
+    """
+    best[k][j]: lowest error to cover [c_0, c_j) with k+1 segments. Returns the candidate indices of the breakpoints.
+    """
+    best = costs[0].copy()
+    choices = []
+    for _ in range(segments - 1):
+        total = combine(best[:, None], costs)
+        choice = np.argmin(total, axis=0)
+        choices.append(choice)
+        best = total[choice, np.arange(len(best))]
+    end = len(best) - 1
+    indices = [end]
+    for choice in reversed(choices):
+        indices.append(int(choice[indices[-1]]))
+    indices.append(0)
+    return sorted(set(indices))
+
+
+def _fitSegment(x, y, norm):
+    if norm == "mse":
+        slope, intercept = np.polyfit(x, y, 1)
+    else:
+        slope = (y[-1] - y[0]) / (x[-1] - x[0])
+        deviation = y - slope * x
+        intercept = (deviation.max() + deviation.min()) / 2
+    return slope, intercept
+
+
+def _quantizeSegment(x, y, slope, intercept, norm, neighbours=2):
+    """
+    Rounds slope and intercept to BF16, then tries the neighbouring BF16 codes of both (the rounding errors of the two interact)
+    and keeps the pair with the lowest segment error.
+    """
+    offsets = np.arange(-neighbours, neighbours + 1)
+    slopeCodes = (floatToBF16(np.float32(slope)).astype(np.int32) + offsets).astype(np.uint16)
+    interceptCodes = (floatToBF16(np.float32(intercept)).astype(np.int32) + offsets).astype(np.uint16)
+    slopes = BF16ToFloat(slopeCodes).astype(np.float64)[:, None, None]
+    intercepts = BF16ToFloat(interceptCodes).astype(np.float64)[None, :, None]
+    errors = y[None, None, :] - (slopes * x[None, None, :] + intercepts)
+    cost = np.mean(np.square(errors), axis=2) if norm == "mse" else np.max(np.abs(errors), axis=2)
+    bestSlope, bestIntercept = np.unravel_index(np.argmin(cost), cost.shape)
+    return slopeCodes[bestSlope], interceptCodes[bestIntercept]
+
+
+def evaluatePWL(x, breakpoints, slopes, intercepts):
+    """
+    Evaluates the PWL approximation in float64, segment i covers [breakpoints[i], breakpoints[i+1]).
+    """
+    segment = np.clip(np.searchsorted(breakpoints, x, side="right") - 1, 0, len(slopes) - 1)
+    return np.asarray(slopes)[segment] * x + np.asarray(intercepts)[segment]
+
+
+def optimizeBreakpoints(function="sigmoid", segments=10, norm="mse", xmin=0.0, xmax=6.0, fracBits=7, samplesPerStep=4):
+    """
+    Returns the segmentation with the lowest error for the segment budget as a dict with
+    breakpoints (segment starts), slopes, intercepts (BF16-rounded floats), their BF16 codes,
+    the error before and after rounding the coefficients, and for the sigmoid the mirrored intercepts q' = 1 - q.
+    """
+    if norm not in ("mse", "max"):
+        raise ValueError(f"Unsupported norm '{norm}'. Use 'mse' or 'max'.")
+    name = function if isinstance(function, str) else getattr(function, "__name__", "custom")
+    if isinstance(function, str):
+        function = REFERENCE_FUNCTIONS[function]
+    candidates = candidateBreakpoints(xmin, xmax, fracBits)
+    samples = np.arange(len(candidates) * samplesPerStep + 1) * ((candidates[-1] - candidates[0]) / (len(candidates) * samplesPerStep)) + candidates[0]
+    y = function(samples)
+
+    if norm == "mse":
+        costs = _segmentCostsMSE(candidates, samples, y)
+        combine = np.add
+    else:
+        costs = _segmentCostsMax(candidates, samples, y, function)
+        combine = np.maximum
+    indices = _dynamicProgramming(costs, segments, combine)
+    breakpoints = candidates[indices]
+
+    slopes, intercepts, slopesBF16, interceptsBF16 = [], [], [], []
+    for start, end in zip(breakpoints[:-1], breakpoints[1:]):
+        inSegment = (samples >= start) & (samples <= end)
+        slope, intercept = _fitSegment(samples[inSegment], y[inSegment], norm)
+        slopeCode, interceptCode = _quantizeSegment(samples[inSegment], y[inSegment], slope, intercept, norm)
+        slopes.append(slope)
+        intercepts.append(intercept)
+        slopesBF16.append(slopeCode)
+        interceptsBF16.append(interceptCode)
+    slopesBF16 = np.array(slopesBF16, dtype=np.uint16)
+    interceptsBF16 = np.array(interceptsBF16, dtype=np.uint16)
+
+    def error(slopes, intercepts):
+        errors = y - evaluatePWL(samples, breakpoints, slopes, intercepts)
+        return float(np.mean(np.square(errors))) if norm == "mse" else float(np.max(np.abs(errors)))
+
+    result = {
+        "function": name,
+        "norm": norm,
+        "breakpoints": breakpoints[:-1].tolist(), # segment starts, the last segment ends at xmax
+        "xmax": float(breakpoints[-1]),
+        "slopes": BF16ToFloat(slopesBF16).astype(np.float64).tolist(),
+        "intercepts": BF16ToFloat(interceptsBF16).astype(np.float64).tolist(),
+        "slopesBF16": slopesBF16,
+        "interceptsBF16": interceptsBF16,
+        "error": error(slopes, intercepts),
+        "quantizedError": error(BF16ToFloat(slopesBF16).astype(np.float64), BF16ToFloat(interceptsBF16).astype(np.float64)),
+    }
+    if name == "sigmoid":
+        result["mirroredIntercepts"] = BF16ToFloat(floatToBF16(np.float32(1.0) - np.asarray(intercepts, dtype=np.float32))).astype(np.float64).tolist()
+    return result
+
+
+def printSegmentation(result):
+    print(f"{result['function']}, {len(result['slopes'])} segments, {result['norm']}: {result['error']:.3e}, "
+          f"with BF16 coefficients: {result['quantizedError']:.3e}")
+    ends = result["breakpoints"][1:] + [result["xmax"]]
+    for start, end, slope, intercept, code in zip(result["breakpoints"], ends, result["slopes"], result["intercepts"], result["slopesBF16"].tolist()):
+        print(f"  [{start:.6f}, {end:.6f}): m = {slope:.6f}, q = {intercept:.6f}   (m = b{code:016b})")
+
+
+if __name__ == "__main__":
+    import time
+    from calculateMSE_exhaustive import exhaustiveErrorStats, printErrorStats, rangeCodes
+    from pwlSigmoidGolden import pwlVariant, pwlDesign
+
+    for norm in ["mse", "max"]:
+        start = time.perf_counter()
+        result = optimizeBreakpoints("sigmoid", segments=10, norm=norm, xmin=0.0, xmax=6.0, fracBits=7)
+        print(f"optimized in {time.perf_counter() - start:.2f} s")
+        printSegmentation(result)
+
+    # the same budget as siluandgeluPWLSigmoid10Segments, scored bit-accurately on the hardware datapath
+    codes = rangeCodes(-8.0, 8.0)
+    codes = codes[np.abs(BF16ToFloat(codes)) >= 2.0**-100] # skip the FPMult16ALT exponent underflow, see pwlSigmoidGolden.py
+    optimized = pwlVariant(result["breakpoints"], result["slopes"], result["intercepts"], fracBits=7, saturateOnInt=True)
+    for function in ["silu", "gelu"]:
+        printErrorStats(f"10 {function}", exhaustiveErrorStats(pwlDesign("10", function), function, codes=codes))
+        printErrorStats(f"DP {function}", exhaustiveErrorStats(pwlDesign(optimized, function), function, codes=codes))
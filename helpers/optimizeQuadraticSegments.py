@@ -0,0 +1,129 @@
+import numpy as np
+from bf16Codec import floatToBF16, BF16ToFloat
+from calculateMSE_exhaustive import REFERENCE_FUNCTIONS
+from optimizePWLBreakpoints import candidateBreakpoints, _dynamicProgramming
+
+"""
+Optimal segmentations for piecewise quadratic (2nd order) approximations y = (a*x + b)*x + c, the counterpart of
+optimizePWLBreakpoints.py for one more multiply-add per segment.
+
+The candidate breakpoints are the same BF16-representable points of the fixed-point grid. The least-squares parabola of
+every segment [c_i, c_j) comes from cumulative sums of (x - c_i)^k over the samples, one start c_i at a time, so short
+segments far from 0 do not lose their precision to the cancellation of global prefix sums. Dynamic programming then picks
+the segmentation with the lowest total squared error, and the coefficients are rounded to BF16 by trying the neighbouring
+BF16 codes of a, b and c together. The coefficients are for x itself, as the hardware evaluates them on its input.
+"""
+
+QUADRATIC_RANGES = {"sigmoid": (0.0, 8.0), "tanh": (0.0, 4.0)} # fitted on |x|, the golden model saturates above the range
+
+
+def _segmentCostsQuadratic(candidates, samples, y):
+    costs = np.full((len(candidates), len(candidates)), np.inf)
+    bounds = np.searchsorted(samples, candidates, side="left")
+    for i in range(len(candidates) - 1):
+        x = samples[bounds[i]:] - candidates[i]
+        powers = np.stack([np.ones_like(x), x, x**2, x**3, x**4, y[bounds[i]:], x * y[bounds[i]:], x**2 * y[bounds[i]:],
+                           y[bounds[i]:]**2])
+        sums = np.cumsum(powers, axis=1)[:, bounds[i + 1:] - bounds[i] - 1] # over the samples in [c_i, c_j)
+        s0, s1, s2, s3, s4, sy, sxy, sxxy, syy = sums
+        normal = np.stack([np.stack([s0, s1, s2], -1), np.stack([s1, s2, s3], -1), np.stack([s2, s3, s4], -1)], -2)
+        rhs = np.stack([sy, sxy, sxxy], -1)
+        fit = s0 >= 3 # fewer samples than coefficients fit exactly
+        coefficients = np.zeros_like(rhs)
+        coefficients[fit] = np.linalg.solve(normal[fit], rhs[fit][..., None])[..., 0]
+        sse = syy - np.sum(coefficients * rhs, axis=-1) # residual of the least-squares fit
+        costs[i, i + 1:] = np.where(fit, np.maximum(sse, 0.0), 0.0)
+    return costs
+
+
+def _quantizeQuadratic(x, y, coefficients, neighbours=2):
+    """
+    Rounds a, b and c to BF16, then tries the neighbouring BF16 codes of all three and keeps the triple with the lowest
+    squared error on the segment, evaluated in Horner form like the hardware.
+    """
+    offsets = np.arange(-neighbours, neighbours + 1)
+    codes = [(floatToBF16(np.float32(coefficient)).astype(np.int32) + offsets).astype(np.uint16) for coefficient in coefficients]
+    a, b, c = [BF16ToFloat(code).astype(np.float64) for code in codes]
+    errors = y - ((a[:, None, None, None] * x + b[None, :, None, None]) * x + c[None, None, :, None])
+    best = np.unravel_index(np.argmin(np.mean(np.square(errors), axis=-1)), errors.shape[:3])
+    return tuple(code[index] for code, index in zip(codes, best))
+
+
+def evaluateQuadratic(x, breakpoints, a, b, c):
+    """
+    Evaluates the piecewise quadratic approximation in float64, segment i covers [breakpoints[i], breakpoints[i+1]).
+    """
+    segment = np.clip(np.searchsorted(breakpoints, x, side="right") - 1, 0, len(a) - 1)
+    return (np.asarray(a)[segment] * x + np.asarray(b)[segment]) * x + np.asarray(c)[segment]
+
+
+def optimizeQuadraticSegments(function="sigmoid", segments=4, xmin=None, xmax=None, fracBits=7, samplesPerStep=4):
+    """
+    Returns the segmentation with the lowest MSE for the segment budget as a dict with breakpoints (segment starts), xmax,
+    the coefficients a, b, c (BF16-rounded floats) and their BF16 codes, and the MSE before and after rounding the coefficients.
+    """
+    name = function if isinstance(function, str) else getattr(function, "__name__", "custom")
+    xmin = QUADRATIC_RANGES.get(name, (0.0, 8.0))[0] if xmin is None else xmin
+    xmax = QUADRATIC_RANGES.get(name, (0.0, 8.0))[1] if xmax is None else xmax
+    if isinstance(function, str):
+        function = REFERENCE_FUNCTIONS[function]
+    candidates = candidateBreakpoints(xmin, xmax, fracBits)
+    samples = np.arange(len(candidates) * samplesPerStep + 1) * ((candidates[-1] - candidates[0]) / (len(candidates) * samplesPerStep)) + candidates[0]
+    y = function(samples)
+
+    indices = _dynamicProgramming(_segmentCostsQuadratic(candidates, samples, y), segments, np.add)
+    breakpoints = candidates[indices]
+
+    fitted, quantized = [], []
+    for start, end in zip(breakpoints[:-1], breakpoints[1:]):
+        inSegment = (samples >= start) & (samples <= end)
+        coefficients = np.polyfit(samples[inSegment], y[inSegment], 2)
+        fitted.append(coefficients)
+        quantized.append(_quantizeQuadratic(samples[inSegment], y[inSegment], coefficients))
+    fitted = np.array(fitted)
+    aBF16, bBF16, cBF16 = [np.array(codes, dtype=np.uint16) for codes in zip(*quantized)]
+
+    def error(a, b, c):
+        return float(np.mean(np.square(y - evaluateQuadratic(samples, breakpoints, a, b, c))))
+
+    decoded = [BF16ToFloat(codes).astype(np.float64) for codes in (aBF16, bBF16, cBF16)]
+    return {
+        "function": name,
+        "breakpoints": breakpoints[:-1].tolist(), # segment starts, the last segment ends at xmax
+        "xmax": float(breakpoints[-1]),
+        "a": decoded[0].tolist(),
+        "b": decoded[1].tolist(),
+        "c": decoded[2].tolist(),
+        "aBF16": aBF16,
+        "bBF16": bBF16,
+        "cBF16": cBF16,
+        "error": error(*fitted.T),
+        "quantizedError": error(*decoded),
+    }
+
+
+def printQuadraticSegmentation(result):
+    print(f"{result['function']}, {len(result['a'])} quadratic segments: {result['error']:.3e}, "
+          f"with BF16 coefficients: {result['quantizedError']:.3e}")
+    ends = result["breakpoints"][1:] + [result["xmax"]]
+    for start, end, a, b, c in zip(result["breakpoints"], ends, result["a"], result["b"], result["c"]):
+        print(f"  [{start:.6f}, {end:.6f}): a = {a: .6f}, b = {b: .6f}, c = {c: .6f}")
+
+
+if __name__ == "__main__":
+    import time
+    from optimizePWLBreakpoints import optimizeBreakpoints
+
+    # a single segment on a parabola is exact, up to the BF16 rounding of the coefficients
+    parabola = lambda x: (0.25 * x - 0.5) * x + 1.0
+    result = optimizeQuadraticSegments(parabola, segments=1, xmin=0.0, xmax=2.0)
+    assert result["error"] < 1e-20 and result["quantizedError"] == 0.0 and result["a"] == [0.25]
+
+    for function in QUADRATIC_RANGES:
+        for segments in [2, 4, 8]:
+            start = time.perf_counter()
+            result = optimizeQuadraticSegments(function, segments)
+            elapsed = time.perf_counter() - start
+            linear = optimizeBreakpoints(function, 2 * segments, "mse", *QUADRATIC_RANGES[function], fracBits=7)
+            print(f"optimized in {elapsed:.2f} s, {2 * segments} linear segments: {linear['quantizedError']:.3e}")
+            printQuadraticSegmentation(result)
@@ -0,0 +1,150 @@
+import numpy as np
+from fpUnitsGolden import fpMult16ALT, fpAdd16ALT, bf16ToFixedPoint, actualExponent
+
+"""
+Bit-accurate golden model of siluPWL24Segments.scala (SiLU5a) and siluPWL30SegmentsDetailAroundZero.scala (SiLU5b), the
+first-order PWL designs that approximate SiLU directly instead of the sigmoid, vectorized over uint16 arrays of BF16 codes:
+
+    segment = searchsorted(breakpoints, BF16toFP(3, 2)(x))   the when-tree on in_a_fp = |x| in FP3.2, one table per sign
+    output  = m * x + q                                      fpmult1 + fpadd1
+              0 for x = +-0, x for x >= 6 and 0 for x <= -6 (or actual_exp >= 3)
+
+A segment shares its intercept with its mirror image, only the slopes differ between the signs.
+The values follow the registers once the input has been held long enough, like in the sbt tests (6 cycles per input).
+"""
+
+# segment tables, copied from the Scala when-trees: (in_a_fp where the segment starts, slope m, intercept q).
+# 12 uniform segments of width 0.5 per sign between 0 and 6
+_UNIFORM_12_INTERCEPTS = [
+    0b0000000000000000, 0b1011110111011110, 0b1011111010000101, 0b1011111011000010, 0b1011111011011110, 0b1011111011011010,
+    0b1011111011000011, 0b1011111010100010, 0b1011111010000001, 0b1011111001000110, 0b1011111000010100, 0b1011110111011000,
+]
+_UNIFORM_12_NEGATIVE_SLOPES = [
+    0b0011111011000001, 0b0011111000100100, 0b0011110000011010, 0b1011110110010000, 0b1011110111001000, 0b1011110111000010,
+    0b1011110110100011, 0b1011110101111011, 0b1011110100111000, 0b1011110100000011, 0b1011110010110110, 0b1011110001110111,
+]
+_UNIFORM_12_POSITIVE_SLOPES = [
+    0b0011111100011111, 0b0011111101010111, 0b0011111101111110, 0b0011111110001001, 0b0011111110001100, 0b0011111110001100,
+    0b0011111110001010, 0b0011111110001000, 0b0011111110000110, 0b0011111110000100, 0b0011111110000011, 0b0011111110000010,
+]
+_UNIFORM_12_NEGATIVE = [(2 * i, m, q) for i, (m, q) in enumerate(zip(_UNIFORM_12_NEGATIVE_SLOPES, _UNIFORM_12_INTERCEPTS))]
+_UNIFORM_12_POSITIVE = [(2 * i, m, q) for i, (m, q) in enumerate(zip(_UNIFORM_12_POSITIVE_SLOPES, _UNIFORM_12_INTERCEPTS))]
+
+# the 30 segment design cuts [0, 1) into quarters for both signs and [1, 2) into quarters for x > 0 only,
+# from 2 on it is the 24 segment design
+PWL_SILU_VARIANTS = {
+    "24Uniform": {"scala": "siluPWL24Segments", "negative": _UNIFORM_12_NEGATIVE, "positive": _UNIFORM_12_POSITIVE},
+    "30NonUniform": {"scala": "siluPWL30SegmentsDetailAroundZero",
+                     "negative": [
+                         (0b000_00, 0b0011111011100000, 0b0000000000000000),
+                         (0b000_01, 0b0011111010100010, 0b1011110011110111),
+                         (0b000_10, 0b0011111001010100, 0b1011110110101110),
+                         (0b000_11, 0b0011110111101000, 0b1011111000011111),
+                         (0b001_00, 0b0011110000011010, 0b1011111010000101),
+                         (0b001_10, 0b1011110110010000, 0b1011111011000010),
+                     ] + _UNIFORM_12_NEGATIVE[4:],
+                     "positive": [
+                         (0b000_00, 0b0011111100010000, 0b0000000000000000),
+                         (0b000_01, 0b0011111100101111, 0b1011110011110111),
+                         (0b000_10, 0b0011111101001011, 0b1011110110101110),
+                         (0b000_11, 0b0011111101100011, 0b1011111000011111),
+                         (0b001_00, 0b0011111101110110, 0b1011111001101101),
+                         (0b001_01, 0b0011111110000010, 0b1011111010011011),
+                         (0b001_10, 0b0011111110000111, 0b1011111010111001),
+                         (0b001_11, 0b0011111110001011, 0b1011111011001111),
+                     ] + _UNIFORM_12_POSITIVE[4:]},
+}
+
+
+def _segmentArrays(segments):
+    starts = np.array([segment[0] for segment in segments], dtype=np.int32)
+    assert starts[0] == 0 and np.all(np.diff(starts) > 0), "segments must start at 0 and be sorted on their breakpoints"
+    slopes = np.array([segment[1] for segment in segments], dtype=np.uint16)
+    intercepts = np.array([segment[2] for segment in segments], dtype=np.uint16)
+    return starts[1:], slopes, intercepts
+
+
+def pwlSiLU(codes, variant="24Uniform"):
+    """
+    Output of the direct PWL SiLU design for BF16 inputs.
+    """
+    if isinstance(variant, str):
+        variant = PWL_SILU_VARIANTS[variant]
+    codes = np.asarray(codes, dtype=np.uint16)
+    sign = (codes >> 15) & 1
+    _, aInt, aFrac = bf16ToFixedPoint(codes, 3, 2)
+    inAFp = (aInt << 2) | aFrac
+
+    slope = np.zeros(codes.shape, dtype=np.uint16)
+    intercept = np.zeros(codes.shape, dtype=np.uint16)
+    for signValue, name in [(1, "negative"), (0, "positive")]:
+        breakpoints, slopes, intercepts = _segmentArrays(variant[name])
+        segment = np.searchsorted(breakpoints, inAFp, side="right")
+        slope = np.where(sign == signValue, slopes[segment], slope)
+        intercept = np.where(sign == signValue, intercepts[segment], intercept)
+    output = fpAdd16ALT(fpMult16ALT(codes, slope), intercept)
+
+    saturated = (actualExponent(codes) >= 3) | (aInt >= 6)
+    output = np.where(saturated, np.where(sign == 1, 0, codes), output)
+    output = np.where((codes & 0x7FFF) == 0, 0, output) # a = +-0
+    return output.astype(np.uint16)
+
+
+def pwlSiLUDesign(variant="24Uniform"):
+    """
+    The design as a callable on BF16 codes, to pass to calculateMSE_exhaustive.exhaustiveErrorStats.
+    """
+    return lambda codes: pwlSiLU(codes, variant)
+
+
+if __name__ == "__main__":
+    import os
+    import re
+    from bf16Codec import BF16ToFloat
+    from calculateMSE_exhaustive import exhaustiveErrorStats, printErrorStats, rangeCodes
+
+    # every coefficient and breakpoint in the tables must appear as a literal in its Scala file
+    scalaDir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src", "main", "scala", "silu")
+    for name, variant in PWL_SILU_VARIANTS.items():
+        with open(os.path.join(scalaDir, variant["scala"] + ".scala")) as f:
+            scalaLiterals = {int(literal.replace("_", ""), 2) for literal in re.findall(r'"b([01_]+)"', f.read())}
+        for segment in variant["negative"] + variant["positive"]:
+            for literal in segment:
+                assert literal in scalaLiterals, f"literal {literal:b} of variant {name} not found in {variant['scala']}.scala"
+
+    # the vectors of the sbt tests
+    for name, positiveOutput in [("24Uniform", 0x3F9E), ("30NonUniform", 0x3F9D)]:
+        assert pwlSiLU(0x3FC0, name) == positiveOutput # 1.5
+        assert pwlSiLU(0xBFC0, name) == 0xBE8C # -1.5
+        assert pwlSiLU(0x0000, name) == 0x0000 and pwlSiLU(0x8000, name) == 0x0000
+    assert pwlSiLU(0x40C0) == 0x40C0 and pwlSiLU(0xC0C0) == 0x0000 # +-6 saturate
+
+    # the MSE the sbt tests print, recorded in visualizeParetoCurves.py: 201 inputs from -8 to 8 in float32 steps of 16/200,
+    # truncated to BF16, against SiLU of the truncated input, accumulated in float32
+    a, step, inputs = np.float32(-8.0), np.float32(16.0) / np.float32(200), []
+    while a <= np.float32(8.0):
+        inputs.append(a)
+        a = np.float32(a + step)
+    codes = (np.array(inputs, dtype=np.float32).view(np.uint32) >> 16).astype(np.uint16)
+    x = BF16ToFloat(codes)
+    expected = (x.astype(np.float64) / (1 + np.exp(-x.astype(np.float64)))).astype(np.float32)
+    for name, recordedMSE in [("24Uniform", 8.53e-5), ("30NonUniform", 7.23e-5)]:
+        mse = np.float32(0)
+        for difference in expected - BF16ToFloat(pwlSiLU(codes, name)):
+            mse = np.float32(mse + difference * difference)
+        mse = mse / np.float32(len(codes))
+        print(f"{name} sbt test MSE: {mse:.3e} (recorded {recordedMSE:.2e})")
+        assert abs(mse - recordedMSE) < 0.005e-5, f"{name} does not reproduce the recorded MSE"
+
+    # as in pwlSigmoidGolden.py, m * x underflows and wraps around in FPMult16ALT for tiny inputs, counted separately.
+    # Unlike x * sigmoid, m * x + q does not hide a wrong segment for small x: where the 6-bit shift of BF16toFP wraps
+    # around, |x| < 0.25 selects a segment with q != 0, and those inputs dominate the exhaustive MSE.
+    codes = rangeCodes(-6.0, 6.0)
+    x = BF16ToFloat(codes)
+    tiny = (np.abs(x) < 2.0**-100) & (x != 0)
+    _, aInt, aFrac = bf16ToFixedPoint(codes, 3, 2)
+    print(f"{int(np.sum((np.abs(x) < 0.25) & (((aInt << 2) | aFrac) != 0)))} inputs with |x| < 0.25 leave segment 0 in BF16toFP(3, 2)")
+    for name in PWL_SILU_VARIANTS:
+        wrapped = int(np.sum(~(np.abs(BF16ToFloat(pwlSiLU(codes[tiny], name))) <= 1.0)))
+        printErrorStats(name, exhaustiveErrorStats(pwlSiLUDesign(name), "silu", codes=codes[~tiny]))
+        print(f"{'':<12} {wrapped} of {int(np.sum(tiny))} inputs with 0 < |x| < 2^-100 wrap around to |output| > 1 or NaN")
@@ -0,0 +1,320 @@
+import numpy as np
+from bf16Codec import floatToBF16
+from fpUnitsGolden import fpMult16ALT, fpAdd16ALT, bf16ToFixedPoint, actualExponent
+from minifloatCodec import bf16StoredAs
+
+"""
+Bit-accurate golden model of the siluandgeluPWLSigmoid*Segments.scala family, vectorized over uint16 arrays of BF16 codes.
+All variants share one datapath, only the segment table and a few flags differ:
+
+    sigmoidInput = x * 1.0 (SiLU) or x * 1.703125 (GELU)            fpmult0
+    segment      = searchsorted(breakpoints, BF16toFP(sigmoidInput))  the when/elsewhen tree on in_a_fp
+    sigmoid      = m * sigmoidInput + q                              fpmult1 + fpadd1
+                   for x < 0: 1 - sigmoid(|x|) with an extra adder, or m * x + q' with mirrored intercepts
+    output       = x * sigmoid                                        fpmult2
+
+The values follow the registers once the input has been held long enough, like in the sbt tests (8 or 11 cycles per input).
+"""
+
+BF16_ONE = 0x3F80
+SIGMOID_SCALES = {"silu": 0x3F80, "gelu": 0x3FDA} # fpmult0.io.b: 1.0 or 1.703125
+
+# segment tables, copied from the Scala when-trees: (in_a_fp where the segment starts, slope m, intercept q[, mirrored intercept q'])
+# 8 equal-y segments between 0 and 4 of the 10 and 12 segment designs, in_a_fp is FP3.7
+_EQUAL_Y_8_SEGMENTS = [
+    (0b000_0000000, 0b0_01111100_1111111, 0b0_01111110_0000000),
+    (0b000_0011110, 0b0_01111100_1110111, 0b0_01111110_0000000),
+    (0b000_0111110, 0b0_01111100_1101000, 0b0_01111110_0000010),
+    (0b000_1100000, 0b0_01111100_1010010, 0b0_01111110_0000111),
+    (0b001_0000110, 0b0_01111100_0110100, 0b0_01111110_0001110),
+    (0b001_0110010, 0b0_01111100_0001110, 0b0_01111110_0011011),
+    (0b001_1101001, 0b0_01111011_1000001, 0b0_01111110_0110000),
+    (0b010_0111011, 0b0_01111010_0100001, 0b0_01111110_1010011),
+]
+
+# 16 equal-y segments between 0 and 4 of the 18 segment design.
+# The 0.621094 breakpoint is written as "b000_100111" (= 39) inside the in_a_fp >= 62 branch, so it is always taken
+# and the segment with slope 0b0011111001101101 can never be selected: [62, 96) uses the next segment's coefficients.
+_EQUAL_Y_16_SEGMENTS = [
+    (0b000_0000000, 0b0_011111010000000, 0b0_011111100000000),
+    (0b000_0001111, 0b0011111001111110, 0b0011111100000000),
+    (0b000_0011110, 0b0011111001111010, 0b0011111100000000),
+    (0b000_0101110, 0b0011111001110101, 0b0011111100000001),
+    (0b000_0111110, 0b0011111001100100, 0b0011111100000011),
+    (0b000_1100000, 0b0011111001011001, 0b0011111100000101),
+    (0b000_1110011, 0b0011111001001011, 0b0011111100001000),
+    (0b001_0000110, 0b0011111000111101, 0b0011111100001100),
+    (0b001_0011011, 0b0011111000101100, 0b0011111100010001),
+    (0b001_0110010, 0b0011111000011010, 0b0011111100011000),
+    (0b001_1001100, 0b0011111000000101, 0b0011111100100000),
+    (0b001_1101001, 0b0011110111011100, 0b0011111100101010),
+    (0b010_0001101, 0b0011110110101100, 0b0011111100110111),
+    (0b010_0111011, 0b0011110101101110, 0b0011111101000111),
+    (0b010_1111110, 0b0011110011110011, 0b0011111101011101),
+]
+
+# 2 equal-x segments between 4 and 6, and 2 more between 6 and 8 in the 12 segment design
+_EQUAL_X_4_TO_6_SEGMENTS = [
+    (0b100_0000000, 0b0_01111000_0111001, 0b0_01111110_1110000),
+    (0b101_0000000, 0b0_01110111_0001010, 0b0_01111110_1111001),
+]
+_EQUAL_X_6_TO_8_SEGMENTS = [
+    (0b110_0000000, 0b0_01110101_1001101, 0b0_01111110_1111101),
+    (0b111_0000000, 0b0_01110100_0010111, 0b0_01111110_1111111),
+]
+
+# 4 equal-x segments between 0 and 2, then 16 between 2 and 6, in_a_fp is FP3.2
+_NONUNIFORM_20_SEGMENTS = [
+    (0b000_00, 0b0011111001111011, 0b0011111100000000, 0b0011111100000000),
+    (0b000_10, 0b0011111001011110, 0b0011111100000100, 0b0011111011111001),
+    (0b001_00, 0b0011111000110001, 0b0011111100001111, 0b0011111011100010),
+    (0b001_10, 0b0011111000000001, 0b0011111100100001, 0b0011111010111111),
+    (0b010_00, 0b0011110111000011, 0b0011111100110001, 0b0011111010011111),
+    (0b010_01, 0b0011110110100000, 0b0011111100111011, 0b0011111010001011),
+    (0b010_10, 0b0011110110000001, 0b0011111101000100, 0b0011111001101111),
+    (0b010_11, 0b0011110101001111, 0b0011111101001101, 0b0011111001001100),
+    (0b011_00, 0b0011110100100101, 0b0011111101010101, 0b0011111000101101),
+    (0b011_01, 0b0011110100000011, 0b0011111101011100, 0b0011111000010001),
+    (0b011_10, 0b0011110011010000, 0b0011111101100010, 0b0011110111110010),
+    (0b011_11, 0b0011110010100100, 0b0011111101100111, 0b0011110111001000),
+    (0b100_00, 0b0011110010000001, 0b0011111101101011, 0b0011110110100101),
+    (0b100_01, 0b0011110001001010, 0b0011111101101111, 0b0011110110001000),
+    (0b100_10, 0b0011110000011110, 0b0011111101110010, 0b0011110101011111),
+    (0b100_11, 0b0011101111110111, 0b0011111101110101, 0b0011110100110110),
+    (0b101_00, 0b0011101111000001, 0b0011111101110111, 0b0011110100010100),
+    (0b101_01, 0b0011101110010111, 0b0011111101111000, 0b0011110011110001),
+    (0b101_10, 0b0011101101101011, 0b0011111101111010, 0b0011110011000011),
+    (0b101_11, 0b0011101100111000, 0b0011111101111011, 0b0011110010011110),
+]
+
+# 4 segments between 0 and 2, then 32 equal-x segments between 2 and 6, in_a_fp is FP3.3.
+# The first four reuse the 20 segment coefficients but compare a 3-bit a_frac against "b10", so they split at 0.25 and 1.25.
+# Between 2 and 3, a_frac (3 bits) is compared against 6-bit literals like "b010_110" that it can never reach,
+# so only the segments with index 1, 3 and 5 are used there and the other five are unreachable.
+_NONUNIFORM_36_SEGMENTS = [
+    (0b000_000, 0b0011111001111011, 0b0011111100000000, 0b0011111100000000),
+    (0b000_010, 0b0011111001011110, 0b0011111100000100, 0b0011111011111001),
+    (0b001_000, 0b0011111000110001, 0b0011111100001111, 0b0011111011100010),
+    (0b001_010, 0b0011111000000001, 0b0011111100100001, 0b0011111010111111),
+    (0b010_000, 0b0011110111001101, 0b0011111100101110, 0b0011111010100100), # index 1
+    (0b010_010, 0b0011110110101000, 0b0011111100111000, 0b0011111010001111), # index 3
+    (0b010_100, 0b0011110110001000, 0b0011111101000010, 0b0011111001111000), # index 5
+    (0b011_000, 0b0011110100101111, 0b0011111101010011, 0b0011111000110100),
+    (0b011_001, 0b0011110100011100, 0b0011111101010111, 0b0011111000100101),
+    (0b011_010, 0b0011110100001011, 0b0011111101011010, 0b0011111000010111),
+    (0b011_011, 0b0011110011110111, 0b0011111101011101, 0b0011111000001010),
+    (0b011_100, 0b0011110011011100, 0b0011111101100000, 0b0011110111111100),
+    (0b011_101, 0b0011110011000011, 0b0011111101100011, 0b0011110111100110),
+    (0b011_110, 0b0011110010101101, 0b0011111101100110, 0b0011110111010010),
+    (0b011_111, 0b0011110010011010, 0b0011111101101000, 0b0011110110111111),
+    (0b100_000, 0b0011110010001000, 0b0011111101101010, 0b0011110110101101),
+    (0b100_001, 0b0011110001110010, 0b0011111101101100, 0b0011110110011101),
+    (0b100_010, 0b0011110001010110, 0b0011111101101110, 0b0011110110001110),
+    (0b100_011, 0b0011110000111101, 0b0011111101110000, 0b0011110110000001),
+    (0b100_100, 0b0011110000101000, 0b0011111101110001, 0b0011110101101010),
+    (0b100_101, 0b0011110000010100, 0b0011111101110011, 0b0011110101010011),
+    (0b100_110, 0b0011110000000011, 0b0011111101110100, 0b0011110100111111),
+    (0b100_111, 0b0011101111101000, 0b0011111101110101, 0b0011110100101100),
+    (0b101_000, 0b0011101111001101, 0b0011111101110110, 0b0011110100011100),
+    (0b101_001, 0b0011101110110101, 0b0011111101110111, 0b0011110100001100),
+    (0b101_010, 0b0011101110100000, 0b0011111101111000, 0b0011110011111101),
+    (0b101_011, 0b0011101110001101, 0b0011111101111001, 0b0011110011100100),
+    (0b101_100, 0b0011101101111010, 0b0011111101111010, 0b0011110011001101),
+    (0b101_101, 0b0011101101011101, 0b0011111101111010, 0b0011110010111001),
+    (0b101_110, 0b0011101101000011, 0b0011111101111011, 0b0011110010100110),
+    (0b101_111, 0b0011101100101100, 0b0011111101111011, 0b0011110010010101),
+]
+
+# signedInput:   False: the sigmoid gets |x| and negative inputs are mirrored as 1 - sigmoid(|x|) with an extra FPAdd16ALT,
+#                True: the sigmoid gets x itself and negative inputs select the mirrored intercept q' = 1 - q instead
+# saturateOnInt: besides actual_exp >= 3 (|sigmoidInput| >= 8), a_int >= 6 also saturates the sigmoid to 0 or 1
+PWL_VARIANTS = {
+    "10": {"scala": "siluandgeluPWLSigmoid10Segments", "fracBits": 7, "signedInput": False, "saturateOnInt": True,
+           "segments": _EQUAL_Y_8_SEGMENTS + _EQUAL_X_4_TO_6_SEGMENTS},
+    "12": {"scala": "siluandgeluPWLSigmoid12Segments", "fracBits": 7, "signedInput": False, "saturateOnInt": False,
+           "segments": _EQUAL_Y_8_SEGMENTS + _EQUAL_X_4_TO_6_SEGMENTS + _EQUAL_X_6_TO_8_SEGMENTS},
+    "18": {"scala": "siluandgeluPWLSigmoid18Segments", "fracBits": 7, "signedInput": False, "saturateOnInt": True,
+           "segments": _EQUAL_Y_16_SEGMENTS + _EQUAL_X_4_TO_6_SEGMENTS},
+    "20NonUniform": {"scala": "siluandgeluPWLSigmoid20NonUniformSegments", "fracBits": 2, "signedInput": True, "saturateOnInt": True,
+                     "segments": _NONUNIFORM_20_SEGMENTS},
+    "20NonUniformExtraAdder": {"scala": "siluandgeluPWLSigmoid20NonUniformSegmentsUsingExtraAdder", "fracBits": 2, "signedInput": False,
+                               "saturateOnInt": True, "segments": [segment[:3] for segment in _NONUNIFORM_20_SEGMENTS]},
+    "36NonUniform": {"scala": "siluandgeluPWLSigmoid36NonUniformSegments", "fracBits": 3, "signedInput": True, "saturateOnInt": True,
+                     "segments": _NONUNIFORM_36_SEGMENTS},
+}
+
+
+def pwlVariant(breakpoints, slopes, intercepts, mirroredIntercepts=None, fracBits=7, saturateOnInt=True):
+    """
+    Builds a variant from float coefficients, e.g. the output of calculateSlopesAndYIntercepts, to score a new segmentation without writing Scala.
+    breakpoints are the x values where the segments start (the first one should be 0), they are rounded to BF16 and converted
+    with BF16toFP(3, fracBits) like the hardware converts its input. Slopes and intercepts are rounded to BF16 (RNE, like mantissaRounder).
+    Passing mirroredIntercepts selects the q' = 1 - q technique, otherwise negative inputs get the extra adder.
+    """
+    _, intPart, fracPart = bf16ToFixedPoint(floatToBF16(np.asarray(breakpoints, dtype=np.float32)), 3, fracBits)
+    starts = ((intPart << fracBits) | fracPart).tolist()
+    slopes = floatToBF16(np.asarray(slopes, dtype=np.float32)).tolist()
+    intercepts = floatToBF16(np.asarray(intercepts, dtype=np.float32)).tolist()
+    if mirroredIntercepts is None:
+        segments = list(zip(starts, slopes, intercepts))
+    else:
+        segments = list(zip(starts, slopes, intercepts, floatToBF16(np.asarray(mirroredIntercepts, dtype=np.float32)).tolist()))
+    return {"scala": None, "fracBits": fracBits, "signedInput": mirroredIntercepts is not None, "saturateOnInt": saturateOnInt,
+            "segments": segments}
+
+
+def bitSliceIndex(codes, eMin=-2, mantissaBits=2):
+    """
+    Segment index of a bit-slice segmentation: |x| < 2^eMin is segment 0, every binade [2^e, 2^(e+1)) from eMin on is cut into
+    2^mantissaBits equal parts by the top mantissa bits. In hardware this is Cat(exp(b-1, 0), mantissa(6, 7 - mantissaBits))
+    with b = ceil(log2(3 - eMin)) (consecutive exponents have distinct low bits), a permutation of these indices, plus one
+    8-bit comparator, exponent < 127 + eMin, for segment 0. The saturation logic only checks exponent >= 3, so that
+    comparator is extra.
+    """
+    codes = np.asarray(codes, dtype=np.uint16)
+    exponent = actualExponent(codes)
+    top = (codes & 0x7F).astype(np.int32) >> (7 - mantissaBits)
+    return np.where(exponent < eMin, 0, 1 + ((exponent - eMin) << mantissaBits) + top)
+
+
+def bitSliceVariant(eMin, mantissaBits, slopes, intercepts, mirroredIntercepts):
+    """
+    A variant whose segments are selected by bitSliceIndex instead of the when-tree on BF16toFP, from float coefficients
+    (one more than (3 - eMin) * 2^mantissaBits segments, up to |x| = 8 where the sigmoid saturates).
+    Negative inputs select the mirrored intercepts, like the 20 and 36 segment non-uniform designs.
+    """
+    codes = [floatToBF16(np.asarray(values, dtype=np.float32)).tolist() for values in (slopes, intercepts, mirroredIntercepts)]
+    assert len(codes[0]) == 1 + ((3 - eMin) << mantissaBits), "one coefficient per segment expected"
+    return {"scala": None, "fracBits": 7, "signedInput": True, "saturateOnInt": False, "bitSlice": (eMin, mantissaBits),
+            "segments": [(index,) + coefficients for index, coefficients in enumerate(zip(*codes))]}
+
+
+def storedVariant(variant, coefficientFormat="bf16"):
+    """
+    The variant with its slopes and intercepts stored in a minifloatCodec format ("fp16", "e4m3", ...) and read back as BF16.
+    The breakpoints stay fixed point.
+    """
+    if isinstance(variant, str):
+        variant = PWL_VARIANTS[variant]
+    segments = [(segment[0],) + tuple(int(bf16StoredAs(coefficient, coefficientFormat)) for coefficient in segment[1:])
+                for segment in variant["segments"]]
+    return dict(variant, segments=segments)
+
+
+def _segmentArrays(variant):
+    segments = variant["segments"]
+    starts = np.array([segment[0] for segment in segments], dtype=np.int32)
+    assert starts[0] == 0 and np.all(np.diff(starts) > 0), "segments must start at 0 and be sorted on their breakpoints"
+    slopes = np.array([segment[1] for segment in segments], dtype=np.uint16)
+    intercepts = np.array([segment[2] for segment in segments], dtype=np.uint16)
+    mirroredIntercepts = np.array([segment[3] if len(segment) > 3 else segment[2] for segment in segments], dtype=np.uint16)
+    return starts[1:], slopes, intercepts, mirroredIntercepts
+
+
+def pwlSigmoidFromInput(sigmoidInput, variant="10"):
+    """
+    Value of fullRangeSigmoidReg for the (signed) BF16 sigmoid input, i.e. the output of fpmult0.
+    """
+    if isinstance(variant, str):
+        variant = PWL_VARIANTS[variant]
+    fracBits = variant["fracBits"]
+    breakpoints, slopes, intercepts, mirroredIntercepts = _segmentArrays(variant)
+
+    sigmoidInput = np.asarray(sigmoidInput, dtype=np.uint16)
+    sign = (sigmoidInput >> 15) & 1
+    if not variant["signedInput"]:
+        sigmoidInput = sigmoidInput & 0x7FFF # Cat(0.U(1.W), fpmult0.io.res(14,0))
+    _, aInt, aFrac = bf16ToFixedPoint(sigmoidInput, 3, fracBits)
+    if "bitSlice" in variant:
+        segment = np.minimum(bitSliceIndex(sigmoidInput, *variant["bitSlice"]), len(slopes) - 1) # |x| >= 8 saturates below
+    else:
+        segment = np.searchsorted(breakpoints, (aInt << fracBits) | aFrac, side="right")
+
+    intercept = np.where(sign == 1, mirroredIntercepts[segment], intercepts[segment])
+    sigmoid = fpAdd16ALT(fpMult16ALT(sigmoidInput, slopes[segment]), intercept)
+    if not variant["signedInput"]:
+        sigmoid = np.where(sign == 1, fpAdd16ALT(BF16_ONE, 0x8000 | (sigmoid & 0x7FFF)), sigmoid) # 1 - sigmoid(|x|)
+
+    saturated = actualExponent(sigmoidInput) >= 3
+    if variant["saturateOnInt"]:
+        saturated |= aInt >= 6
+    sigmoid = np.where(saturated, np.where(sign == 1, 0, BF16_ONE), sigmoid)
+    return sigmoid.astype(np.uint16)
+
+
+def pwlSiLUGELU(codes, variant="10", function="silu"):
+    """
+    Output of the PWL design for BF16 inputs: x * sigmoid(x) for function="silu", x * sigmoid(1.703125x) for function="gelu".
+    """
+    codes = np.asarray(codes, dtype=np.uint16)
+    sigmoidInput = fpMult16ALT(codes, SIGMOID_SCALES[function])
+    sigmoid = pwlSigmoidFromInput(sigmoidInput, variant)
+    sigmoid = np.where((codes & 0x7FFF) == 0, 0, sigmoid) # in_a = +-0
+    return fpMult16ALT(codes, sigmoid)
+
+
+def pwlSigmoid(codes, variant="10"):
+    """
+    The sigmoid approximation on its own, as computed for SiLU (in_select = 0).
+    """
+    codes = np.asarray(codes, dtype=np.uint16)
+    sigmoid = pwlSigmoidFromInput(fpMult16ALT(codes, SIGMOID_SCALES["silu"]), variant)
+    return np.where((codes & 0x7FFF) == 0, 0, sigmoid).astype(np.uint16)
+
+
+def pwlDesign(variant="10", function="silu", coefficientFormat="bf16"):
+    """
+    The PWL design as a callable on BF16 codes, to pass to calculateMSE_exhaustive.exhaustiveErrorStats.
+    """
+    if coefficientFormat != "bf16":
+        variant = storedVariant(variant, coefficientFormat)
+    return lambda codes: pwlSiLUGELU(codes, variant, function)
+
+
+if __name__ == "__main__":
+    import os
+    import re
+    import time
+    from bf16Codec import BF16ToFloat
+    from calculateMSE_exhaustive import exhaustiveErrorStats, printErrorStats, rangeCodes
+
+    # every coefficient and breakpoint in the tables must appear as a literal in its Scala file
+    scalaDir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src", "main", "scala", "silu")
+    for name, variant in PWL_VARIANTS.items():
+        with open(os.path.join(scalaDir, variant["scala"] + ".scala")) as f:
+            scalaLiterals = {int(literal.replace("_", ""), 2) for literal in re.findall(r'"b([01_]+)"', f.read())}
+        fracBits = variant["fracBits"]
+        for segment in variant["segments"]:
+            start, intPart, fracPart = segment[0], segment[0] >> fracBits, segment[0] & ((1 << fracBits) - 1)
+            # compared as in_a_fp, as a_int (no fraction) or as a_frac inside an a_int branch
+            assert start in scalaLiterals or (fracPart == 0 and intPart in scalaLiterals) or fracPart in scalaLiterals, \
+                f"breakpoint {start:b} of variant {name} not found in {variant['scala']}.scala"
+            for coefficient in segment[1:]:
+                assert coefficient in scalaLiterals, f"coefficient {coefficient:016b} of variant {name} not found in {variant['scala']}.scala"
+
+    # hand-computed vectors for the 10 segment design: 1.0 falls in [0.75, 1.05) with m = 0.205078, q = 0.527344
+    assert pwlSiLUGELU(0x3F80, "10") == 0x3F3B # 0.205078 + 0.527344 = 0.730469 (0.731059 exact)
+    assert pwlSiLUGELU(0xBF80, "10") == 0xBE8C # -1 * (1 - 0.730469) = -0.273438, the 0.5 lsb lost in the alignment shift
+    assert pwlSiLUGELU(0x40E0, "10") == 0x40E0 # 7.0 saturates: sigmoid = 1
+    assert pwlSiLUGELU(0xC0E0, "10") == 0x8000 # -7.0 saturates: sigmoid = 0, the output keeps the sign
+    assert pwlSiLUGELU(0x0000, "36NonUniform") == 0x0000
+
+    # below ~2^-120 the 8-bit exponent sum in FPMult16ALT underflows and wraps around, so x*sigmoid becomes huge.
+    # The sbt tests never get there, so those inputs are counted separately instead of dominating the MSE.
+    codes = rangeCodes(-8.0, 8.0)
+    x = BF16ToFloat(codes)
+    tiny = (np.abs(x) < 2.0**-100) & (x != 0)
+    for function in ["silu", "gelu"]:
+        for name in PWL_VARIANTS:
+            wrapped = int(np.sum(np.abs(BF16ToFloat(pwlSiLUGELU(codes[tiny], name, function))) > 1.0))
+            printErrorStats(f"{name} {function}", exhaustiveErrorStats(pwlDesign(name, function), function, codes=codes[~tiny]))
+            print(f"{'':<12} {wrapped} of {int(np.sum(tiny))} inputs with 0 < |x| < 2^-100 wrap around to |output| > 1")
+    assert storedVariant("10", "fp16") == PWL_VARIANTS["10"] # BF16 coefficients this close to 1 fit in FP16 exactly
+    for coefficientFormat in ["e5m2", "e4m3"]:
+        printErrorStats(f"20NonUniform silu {coefficientFormat}",
+                        exhaustiveErrorStats(pwlDesign("20NonUniform", "silu", coefficientFormat), "silu", codes=codes[~tiny]))
+
+    codes = np.random.default_rng(0).integers(0, 1 << 16, size=1 << 22, dtype=np.uint16)
+    start = time.perf_counter()
+    pwlSiLUGELU(codes, "20NonUniform")
+    print(f"golden model throughput: {len(codes) / (time.perf_counter() - start) / 1e6:.2f} M inputs/s")
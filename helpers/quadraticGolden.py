@@ -0,0 +1,156 @@
+import numpy as np
+from bf16Codec import floatToBF16, BF16ToFloat
+from fpUnitsGolden import fpMult16ALT, fpAdd16ALT, bf16ToFixedPoint, actualExponent
+from pwlSigmoidGolden import BF16_ONE, SIGMOID_SCALES
+from toplevelThroughputModel import ACTIVATION_LATENCIES, DYT_LATENCY
+
+"""
+Bit-accurate golden model of a piecewise quadratic (2nd order) design, built from the same FPMult16ALT/FPAdd16ALT
+primitives as the PWL designs, with one more multiply-add per evaluation (Horner form):
+
+    s       = x * 1.0 (SiLU), x * 1.703125 (GELU) or x * alpha (DyT)     fpmult0
+    segment = searchsorted(breakpoints, BF16toFP(3, fracBits)(s))        the when-tree on in_a_fp
+    f       = (a * s + b) * s + c                                        fpmult1 + fpadd1, fpmult2 + fpadd2
+              sigmoid, x < 0: mirrored coefficients (-a, b, 1 - c), or 1 - f(|s|) with an extra adder
+              tanh: f(|s|) with the sign of s, which costs no adder
+    output  = x * f (SiLU/GELU) or f (DyT), saturated to 0/x or -1/+1 above the fitted range
+
+The coefficients come from optimizeQuadraticSegments.py. No Scala module exists yet, so the latency assumes the
+pipelining of the PWL designs plus one FPMult16ALT (1 cycle) and one FPAdd16ALT (3 cycles) for the extra stage.
+"""
+
+FP_MULT_LATENCY = 1
+FP_ADD_LATENCY = 3
+QUADRATIC_FUNCTIONS = {"silu": "sigmoid", "gelu": "sigmoid", "dyt": "tanh"} # design -> function the segments approximate
+
+
+def quadraticVariant(breakpoints, a, b, c, xmax, function="sigmoid", fracBits=7, signedInput=True):
+    """
+    Builds a variant from float coefficients, e.g. the output of optimizeQuadraticSegments. Breakpoints and xmax are
+    converted with BF16toFP(3, fracBits) like the hardware converts its input, the coefficients are rounded to BF16.
+    signedInput selects the mirrored coefficients for negative sigmoid inputs, otherwise they get the extra adder.
+    tanh is always evaluated on |s|.
+    """
+    _, intPart, fracPart = bf16ToFixedPoint(floatToBF16(np.asarray(list(breakpoints) + [xmax], dtype=np.float32)), 3, fracBits)
+    fixed = ((intPart << fracBits) | fracPart).tolist()
+    a, b, c = [floatToBF16(np.asarray(coefficients, dtype=np.float32)) for coefficients in (a, b, c)]
+    mirroredC = floatToBF16(np.float32(1.0) - BF16ToFloat(c))
+    segments = list(zip(fixed[:-1], a.tolist(), b.tolist(), c.tolist(), (a ^ 0x8000).tolist(), mirroredC.tolist()))
+    return {"function": function, "fracBits": fracBits, "signedInput": signedInput and function == "sigmoid",
+            "end": fixed[-1] if xmax < 8 else 1 << (3 + fracBits), "segments": segments}
+
+
+def quadraticVariantFromSegmentation(result, fracBits=7, signedInput=True):
+    """
+    The variant of an optimizeQuadraticSegments result.
+    """
+    return quadraticVariant(result["breakpoints"], result["a"], result["b"], result["c"], result["xmax"], result["function"],
+                            fracBits, signedInput)
+
+
+def quadraticFromInput(s, variant):
+    """
+    The approximated sigmoid or tanh for the (signed) BF16 input s, i.e. the output of fpmult0.
+    """
+    fracBits = variant["fracBits"]
+    segments = np.array(variant["segments"], dtype=np.int64)
+    breakpoints = segments[1:, 0]
+    a, b, c, mirroredA, mirroredC = [segments[:, i].astype(np.uint16) for i in range(1, 6)]
+
+    s = np.asarray(s, dtype=np.uint16)
+    sign = (s >> 15) & 1
+    if not variant["signedInput"]:
+        s = s & 0x7FFF
+    _, sInt, sFrac = bf16ToFixedPoint(s, 3, fracBits)
+    fixed = (sInt << fracBits) | sFrac
+    segment = np.searchsorted(breakpoints, fixed, side="right")
+
+    mirrored = (sign == 1) & variant["signedInput"]
+    f = fpMult16ALT(np.where(mirrored, mirroredA[segment], a[segment]), s)
+    f = fpMult16ALT(fpAdd16ALT(f, b[segment]), s)
+    f = fpAdd16ALT(f, np.where(mirrored, mirroredC[segment], c[segment]))
+
+    saturated = (actualExponent(s) >= 3) | (fixed >= variant["end"])
+    if variant["function"] == "tanh":
+        f = (f & 0x7FFF) | (sign << 15)
+        saturatedValue = np.where(sign == 1, 0xBF80, BF16_ONE) # -1 or +1
+    else:
+        if not variant["signedInput"]:
+            f = np.where(sign == 1, fpAdd16ALT(BF16_ONE, 0x8000 | (f & 0x7FFF)), f) # 1 - f(|s|)
+        saturatedValue = np.where(sign == 1, 0, BF16_ONE)
+    return np.where(saturated, saturatedValue, f).astype(np.uint16)
+
+
+def quadraticActivation(codes, variant, function="silu", alpha=0x3F80):
+    """
+    Output of the quadratic design for BF16 inputs: x * sigmoid(x) (SiLU), x * sigmoid(1.703125x) (GELU)
+    or tanh(alpha * x) (DyT), the variant has to approximate the sigmoid or tanh accordingly.
+    """
+    if variant["function"] != QUADRATIC_FUNCTIONS[function]:
+        raise ValueError(f"A {function} design needs a {QUADRATIC_FUNCTIONS[function]} variant, got {variant['function']}.")
+    codes = np.asarray(codes, dtype=np.uint16)
+    zero = (codes & 0x7FFF) == 0
+    if function == "dyt":
+        return np.where(zero, 0, quadraticFromInput(fpMult16ALT(codes, alpha), variant)).astype(np.uint16)
+    f = np.where(zero, 0, quadraticFromInput(fpMult16ALT(codes, SIGMOID_SCALES[function]), variant))
+    return fpMult16ALT(codes, f)
+
+
+def quadraticDesign(variant, function="silu"):
+    """
+    The quadratic design as a callable on BF16 codes, to pass to calculateMSE_exhaustive.exhaustiveErrorStats.
+    """
+    return lambda codes: quadraticActivation(codes, variant, function)
+
+
+def quadraticLatency(function="silu", signedInput=True):
+    """
+    Pipeline latency in cycles: the PWL datapath (or DyTUsingLUT with its LUT read replaced by the coefficient registers)
+    plus the multiply-add stages of the polynomial.
+    """
+    extraStage = FP_MULT_LATENCY + FP_ADD_LATENCY
+    if function == "dyt":
+        return DYT_LATENCY + 2 * extraStage
+    return ACTIVATION_LATENCIES["pwl20NonUniform" if signedInput else "pwl20NonUniformExtraAdder"] + extraStage
+
+
+if __name__ == "__main__":
+    from calculateMSE_exhaustive import exhaustiveErrorStats, rangeCodes
+    from estimateArea import estimateArea
+    from optimizeQuadraticSegments import optimizeQuadraticSegments, evaluateQuadratic
+    from pwlSigmoidGolden import pwlDesign
+
+    sigmoid = optimizeQuadraticSegments("sigmoid", 4)
+    variant = quadraticVariantFromSegmentation(sigmoid)
+    # the BF16 datapath follows the float64 evaluation of the same coefficients up to its rounding,
+    # away from the BF16toFP wrap-around and FPMult16ALT underflow of tiny inputs (see sweepDesignSpace.sweepCodes)
+    x = BF16ToFloat(rangeCodes(2.0**-20, 7.9)).astype(np.float64)
+    fixedPoint = quadraticFromInput(floatToBF16(x.astype(np.float32)), variant)
+    assert np.max(np.abs(BF16ToFloat(fixedPoint) - evaluateQuadratic(x, sigmoid["breakpoints"], sigmoid["a"], sigmoid["b"], sigmoid["c"]))) < 2**-7
+    # mirrored coefficients and the extra adder both give 1 - f(|s|) for negative inputs, up to the rounding of FPAdd16ALT
+    # (1 - 0.498047 comes out as 0.507812 next to 0)
+    negative = floatToBF16(-x.astype(np.float32))
+    extraAdder = quadraticVariantFromSegmentation(sigmoid, signedInput=False)
+    assert np.max(np.abs(BF16ToFloat(quadraticFromInput(negative, variant)) - BF16ToFloat(quadraticFromInput(negative, extraAdder)))) <= 2**-7
+    assert quadraticFromInput(0x4100, variant) == BF16_ONE and quadraticFromInput(0xC100, variant) == 0
+    tanh = quadraticVariantFromSegmentation(optimizeQuadraticSegments("tanh", 4))
+    assert quadraticActivation(0xC080, tanh, "dyt") == 0xBF80 and quadraticActivation(0x8000, tanh, "dyt") == 0
+
+    # where it beats a PWL design: error, estimated area and latency, scored like the sweep
+    codes = rangeCodes(-8.0, 8.0)
+    codes = codes[np.abs(BF16ToFloat(codes)) >= 2.0**-20]
+    references = {"silu": "silu", "gelu": "gelu", "dyt": "tanh"}
+    for function in ["silu", "gelu", "dyt"]:
+        print(f"{function}:")
+        if function != "dyt":
+            for pwl in ["20NonUniform", "36NonUniform"]:
+                config = {"family": "pwlSigmoid", "function": function, "variant": pwl}
+                stats = exhaustiveErrorStats(pwlDesign(pwl, function), references[function], codes=codes)
+                print(f"  PWL{pwl:<16} MSE {stats['MSE']:.3e}  max|err| {stats['maxAbsError']:.3e}  "
+                      f"area {estimateArea(config):8.2f} um²  latency {ACTIVATION_LATENCIES['pwl' + pwl]} cycles")
+        for segments in [2, 3, 4, 6, 8]:
+            config = {"family": "quadratic", "function": function, "segments": segments}
+            variant = quadraticVariantFromSegmentation(optimizeQuadraticSegments(QUADRATIC_FUNCTIONS[function], segments))
+            stats = exhaustiveErrorStats(quadraticDesign(variant, function), references[function], codes=codes)
+            print(f"  quadratic {segments:<2} segments MSE {stats['MSE']:.3e}  max|err| {stats['maxAbsError']:.3e}  "
+                  f"area {estimateArea(config):8.2f} um²  latency {quadraticLatency(function)} cycles")
@@ -0,0 +1,176 @@
+import numpy as np
+from bf16Codec import floatToBF16, BF16ToFloat
+from fpUnitsGolden import fpMult16ALT, fpAdd16ALT
+
+"""
+Bit-accurate golden model of rangeGN.scala, vectorized over whole (..., C) tensors of BF16 codes:
+
+    sum       = FPAdd16ALT reduction tree over the N = C/32 channels of a group, pairs (0,1), (2,3), ... per level,
+                an odd element out passes on to the next level unchanged
+    mean      = sum * recip_N                                                  FPMult16ALT
+    numerator = x_i + (-mean)                                                  FPAdd16ALT, one per channel
+    range     = max + (-min)                                                   bf16LessThan trees, FPAdd16ALT
+    output    = (numerator / range) * recip_alpha                              DivSqrtRecFN_small(8, 8), FPMult16ALT
+
+With a reciprocal design (see reciprocalGolden.py) the per-channel dividers are replaced by one shared reciprocal per group:
+
+    scale     = reciprocal(range) * recip_alpha                                FPMult16ALT, once per group
+    output    = numerator * scale                                              FPMult16ALT, one per channel
+
+Like the module, the model normalizes the N channels of one group at one pixel: rangeGN never sees the H x W extent of a
+group, unlike GroupNorm. The inputs are assumed to be held for the whole latency, as rangeGNTest does, since the
+subtractors read in_a directly (the delay registers are still a TODO in rangeGN.scala).
+"""
+
+GROUPS = 32
+# C -> (recip_N, recip_alpha) as in rangeGN.scala
+RANGEGN_CONSTANTS = {
+    320: (0x3DCD, 0x4009), # 0.1, sqrt(2 * ln(10)) ~ 2.140625
+    640: (0x3D4D, 0x401C), # 0.05, sqrt(2 * ln(20)) ~ 2.4375
+    1280: (0x3CCD, 0x402D), # 0.025, sqrt(2 * ln(40)) ~ 2.703125
+}
+HARDFLOAT_NAN = 0x7FC0 # RoundAnyRawFNToRecFN outputs a positive quiet NaN
+
+
+def bf16Divide(a, b):
+    """
+    Quotient of DivSqrtRecFN_small(8, 8) with roundingMode 0: hardfloat divides IEEE-correctly, so this is a / b rounded
+    to nearest even in BF16, with subnormals, signed zeros and infinities, and 0x7FC0 for every NaN.
+    The float32 quotient is correctly rounded to 24 bits, which rounds on to BF16 without double rounding errors (24 >= 2*8 + 2).
+    divSqrtGolden.py models the divider bit by bit and checks this on every 256th a code, on all 2^32 operand
+    pairs with --exhaustive.
+    """
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        quotient = BF16ToFloat(a) / BF16ToFloat(b)
+    return np.where(np.isnan(quotient), HARDFLOAT_NAN, floatToBF16(quotient, rounding="rne")).astype(np.uint16)
+
+
+def bf16LessThan(a, b):
+    """
+    bf16LessThan of rangeGN.scala: sign first, then the magnitudes (reversed for negative numbers), so -0 < +0.
+    """
+    a = np.asarray(a, dtype=np.uint16)
+    b = np.asarray(b, dtype=np.uint16)
+    signA, signB = a >> 15, b >> 15
+    absA, absB = a & 0x7FFF, b & 0x7FFF
+    return np.where(signA != signB, signA == 1, np.where(signA == 1, absA > absB, absA < absB))
+
+
+def _reduceTree(values, f):
+    # values (..., N): pairs (0,1), (2,3), ... per level, an odd element out moves up a level, like reduceFPAdd/pipelinedReduce
+    while values.shape[-1] > 1:
+        pairs = values.shape[-1] // 2
+        reduced = f(values[..., 0:2 * pairs:2], values[..., 1:2 * pairs:2])
+        if values.shape[-1] % 2:
+            reduced = np.concatenate([reduced, values[..., -1:]], axis=-1)
+        values = reduced
+    return values[..., 0]
+
+
+def rangeGNStages(codes, reciprocal=None):
+    """
+    All intermediate values of rangeGN for a (..., C) array of BF16 codes, as a dict of arrays (the debug outputs of
+    rangeGN.scala and more): sum, mean, numerators, max, min, range, quotients and output.
+    Per-group values have shape (..., 32), per-channel values (..., C).
+    reciprocal is a callable on BF16 codes that replaces the dividers, the stages then have reciprocal and scale
+    instead of quotients.
+    """
+    codes = np.asarray(codes, dtype=np.uint16)
+    C = codes.shape[-1]
+    if C not in RANGEGN_CONSTANTS:
+        raise ValueError(f"rangeGN only exists for C in {sorted(RANGEGN_CONSTANTS)}, got C = {C}.")
+    recipN, recipAlpha = RANGEGN_CONSTANTS[C]
+    groups = codes.reshape(codes.shape[:-1] + (GROUPS, C // GROUPS))
+
+    total = _reduceTree(groups, fpAdd16ALT)
+    mean = fpMult16ALT(total, recipN)
+    numerators = fpAdd16ALT(groups, (mean ^ 0x8000)[..., None])
+    maximum = _reduceTree(groups, lambda a, b: np.where(bf16LessThan(a, b), b, a))
+    minimum = _reduceTree(groups, lambda a, b: np.where(bf16LessThan(a, b), a, b))
+    valueRange = fpAdd16ALT(maximum, minimum ^ 0x8000)
+    stages = {"sum": total, "mean": mean, "numerators": numerators.reshape(codes.shape), "max": maximum, "min": minimum,
+              "range": valueRange}
+    if reciprocal is None:
+        quotients = bf16Divide(numerators, valueRange[..., None])
+        output = fpMult16ALT(quotients, recipAlpha)
+        stages["quotients"] = quotients.reshape(codes.shape)
+    else:
+        stages["reciprocal"] = reciprocal(valueRange)
+        stages["scale"] = fpMult16ALT(stages["reciprocal"], recipAlpha)
+        output = fpMult16ALT(numerators, stages["scale"][..., None])
+    stages["output"] = output.reshape(codes.shape)
+    return stages
+
+
+def rangeGN(codes, reciprocal=None):
+    """
+    Output of rangeGN for every group of every pixel of a (..., C) array of BF16 codes, C in {320, 640, 1280}.
+    """
+    return rangeGNStages(codes, reciprocal)["output"]
+
+
+def rangeGNFloat(x):
+    """
+    The same per-pixel range normalization in float64, with the exact constants: (x - mean) * sqrt(2 ln N) / range.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    N = x.shape[-1] // GROUPS
+    groups = x.reshape(x.shape[:-1] + (GROUPS, N))
+    mean = groups.mean(axis=-1, keepdims=True)
+    valueRange = groups.max(axis=-1, keepdims=True) - groups.min(axis=-1, keepdims=True)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return ((groups - mean) * np.sqrt(2 * np.log(N)) / valueRange).reshape(x.shape)
+
+
+def groupNorm(x, groups=GROUPS, eps=1e-5):
+    """
+    Exact GroupNorm (without the affine part) of an (H, W, C) or (batch, H, W, C) feature map:
+    mean and variance over H x W x C/groups per group.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    shape = x.shape
+    if x.ndim == 3:
+        x = x[None]
+    grouped = x.reshape(x.shape[0], -1, groups, shape[-1] // groups)
+    mean = grouped.mean(axis=(1, 3), keepdims=True)
+    variance = grouped.var(axis=(1, 3), keepdims=True)
+    return ((grouped - mean) / np.sqrt(variance + eps)).reshape(shape)
+
+
+def normErrorStats(output, reference):
+    """
+    MSE, MAE and max abs error of BF16 output codes against float reference values, where the reference is finite.
+    """
+    reference = np.asarray(reference, dtype=np.float64)
+    finite = np.isfinite(reference) # a group with range 0 has no reference value
+    errors = np.abs(reference[finite] - BF16ToFloat(output)[finite].astype(np.float64))
+    return {"MSE": float(np.mean(np.square(errors))), "MAE": float(np.mean(errors)), "maxAbsError": float(np.max(errors)),
+            "n": int(errors.size), "nonFinite": int(np.count_nonzero(~finite))}
+
+
+if __name__ == "__main__":
+    import time
+    from bf16Codec import roundToBF16
+
+    assert bf16Divide(0x3F80, 0x4040) == 0x3EAB # 1/3 = 0.333984375 rounded to nearest
+    assert bf16Divide(0x0000, 0x0000) == HARDFLOAT_NAN and bf16Divide(0x3F80, 0x8000) == 0xFF80
+    assert bf16LessThan(0x8000, 0x0000) and not bf16LessThan(0x0000, 0x8000) and bf16LessThan(0xC000, 0xBF80)
+
+    # test 1 of rangeGNTest: 0, 1, ..., 9 gives ((i - 4.5) * 2.146) / 9 within 0.012, here for every group of a pixel
+    codes = floatToBF16(np.tile(np.arange(10, dtype=np.float32), 32))
+    stages = rangeGNStages(codes)
+    assert np.all(stages["sum"] == floatToBF16(np.float32(45.0))) and np.all(stages["range"] == floatToBF16(np.float32(9.0)))
+    expected = (np.arange(10) - 4.5) * 2.146 / 9
+    assert np.max(np.abs(BF16ToFloat(stages["output"]).reshape(32, 10) - expected)) < 0.012
+
+    rng = np.random.default_rng(0)
+    for C, size in [(320, 64), (640, 32), (1280, 16)]:
+        x = roundToBF16(rng.standard_normal((size, size, C)).astype(np.float32) * 2 + 0.5)
+        start = time.perf_counter()
+        output = rangeGN(floatToBF16(x))
+        elapsed = time.perf_counter() - start
+        arithmetic = normErrorStats(output, rangeGNFloat(x))
+        approximation = normErrorStats(output, groupNorm(x))
+        print(f"C={C:<5} {size}x{size}: {x.size / elapsed / 1e6:5.1f} M elements/s   "
+              f"vs float rangeGN MSE {arithmetic['MSE']:.3e} max {arithmetic['maxAbsError']:.3e}   "
+              f"vs GroupNorm MSE {approximation['MSE']:.3e} max {approximation['maxAbsError']:.3e}")
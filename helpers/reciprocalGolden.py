@@ -0,0 +1,142 @@
+import math
+import numpy as np
+from bf16Codec import floatToBF16
+from fpUnitsGolden import fpMult16ALT, fpAdd16ALT
+from generateLUTs import buildReciprocalTable
+from quadraticGolden import FP_MULT_LATENCY, FP_ADD_LATENCY
+from rangeGNGolden import GROUPS, HARDFLOAT_NAN, rangeGNStages, rangeGNFloat, groupNorm, normErrorStats
+from toplevelThroughputModel import DIVIDER_INTERVAL, rangeGNLatency
+
+"""
+Bit-accurate golden model of a BF16 reciprocal from a small table, to replace the C/32 DivSqrtRecFN_small(8, 8) dividers
+of rangeGN.scala by one shared reciprocal per group (see rangeGNGolden.rangeGNStages(codes, reciprocal)).
+
+The top mantissaBits mantissa bits of the input index the table of generateLUTs.buildReciprocalTable, which holds 1 / m
+in (0.5, 1]. The exponent of the result is the exponent of the entry minus the unbiased input exponent, an 8-bit
+subtraction, so the reciprocal costs a ROM read and no arithmetic. Optionally, newtonSteps Newton-Raphson steps refine it:
+
+    y1 = y0 * (2 - r * y0)                                             FPMult16ALT, FPAdd16ALT, FPMult16ALT
+
+Zero and subnormal inputs give infinity, infinities give zero and results below the smallest normal BF16 flush to zero.
+"""
+
+BF16_TWO = 0x4000
+DIVIDER_LATENCY = DIVIDER_INTERVAL + 1 # DivSqrtRecFN_small(8, 8), with its input register
+NEWTON_LATENCY = 2 * FP_MULT_LATENCY + FP_ADD_LATENCY
+
+
+def reciprocalFromInput(codes, mantissaBits=7):
+    """
+    1 / x for BF16 codes from the reciprocal table alone.
+    """
+    codes = np.asarray(codes, dtype=np.uint16).astype(np.int32)
+    sign, exponent, mantissa = codes & 0x8000, (codes >> 7) & 0xFF, codes & 0x7F
+    entry = buildReciprocalTable(mantissaBits)[mantissa >> (7 - mantissaBits)].astype(np.int32)
+    resultExponent = ((entry >> 7) & 0xFF) + 127 - exponent
+    output = np.where(resultExponent <= 0, 0, (resultExponent << 7) | (entry & 0x7F))
+    output = np.where(exponent == 0, 0x7F80, np.where(exponent == 0xFF, 0, output)) # 1/0 = inf, 1/inf = 0
+    output = np.where((exponent == 0xFF) & (mantissa != 0), HARDFLOAT_NAN, output | sign)
+    return output.astype(np.uint16)
+
+
+def reciprocalActivation(codes, mantissaBits=7, newtonSteps=0):
+    """
+    1 / x for BF16 codes: the table read, then newtonSteps Newton-Raphson steps on the finite, non-zero results.
+    """
+    codes = np.asarray(codes, dtype=np.uint16)
+    y = reciprocalFromInput(codes, mantissaBits)
+    refine = ((y & 0x7FFF) != 0) & (((y >> 7) & 0xFF) != 0xFF)
+    for _ in range(newtonSteps):
+        correction = fpAdd16ALT(BF16_TWO, fpMult16ALT(codes, y) ^ 0x8000)
+        y = np.where(refine, fpMult16ALT(y, correction), y).astype(np.uint16)
+    return y
+
+
+def reciprocalDesign(mantissaBits=7, newtonSteps=0):
+    """
+    The reciprocal as a callable on BF16 codes, for exhaustiveErrorStats or rangeGNGolden.rangeGNStages.
+    """
+    return lambda codes: reciprocalActivation(codes, mantissaBits, newtonSteps)
+
+
+def reciprocalLatency(newtonSteps=0):
+    return 1 + newtonSteps * NEWTON_LATENCY
+
+
+def rangeGNReciprocalLatency(C, newtonSteps=0):
+    """
+    rangeGN latency with the reciprocal path. The numerators and the scale are computed in parallel and meet at the
+    per-channel FPMult16ALT:
+
+        numerator  sum tree, mean FPMult16ALT and register, FPAdd16ALT     rangeGNLatency(C) minus the divider and the
+                                                                           FPMult16ALT with recip_alpha after it
+        scale      max/min trees (one register per level), FPAdd16ALT,     ceil(log2(N)) + 3 + reciprocalLatency + 1
+                   reciprocal, FPMult16ALT with recip_alpha
+        output     numerator * scale                                       FPMult16ALT
+    """
+    numeratorLatency = rangeGNLatency(C) - DIVIDER_LATENCY - FP_MULT_LATENCY
+    scaleLatency = math.ceil(math.log2(C // GROUPS)) + FP_ADD_LATENCY + reciprocalLatency(newtonSteps) + FP_MULT_LATENCY
+    return max(numeratorLatency, scaleLatency) + FP_MULT_LATENCY
+
+
+def rangeGNReciprocalTradeoff(x, variants=((7, 0), (5, 0), (4, 0), (3, 1), (4, 1))):
+    """
+    The divider and the reciprocal paths of rangeGN on a (..., C) BF16 feature map x in float, as a list of dicts with
+    name, the output error against the float rangeGN and against GroupNorm (normErrorStats), latency, the dividers and
+    multipliers per rangeGN, ROM bits and the group interval (cycles between groups).
+    variants are (mantissaBits, newtonSteps) pairs.
+    """
+    C = x.shape[-1]
+    N = C // GROUPS
+    codes = floatToBF16(x)
+    arithmetic, approximation = rangeGNFloat(x), groupNorm(x)
+    rows = []
+    output = rangeGNStages(codes)["output"]
+    rows.append({"name": "divider", "float": normErrorStats(output, arithmetic), "groupNorm": normErrorStats(output, approximation),
+                 "latency": rangeGNLatency(C), "dividers": N, "multipliers": N + 1, "romBits": 0, "interval": DIVIDER_INTERVAL})
+    for mantissaBits, newtonSteps in variants:
+        output = rangeGNStages(codes, reciprocalDesign(mantissaBits, newtonSteps))["output"]
+        rows.append({"name": f"table {1 << mantissaBits}" + (f" + {newtonSteps} Newton" if newtonSteps else ""),
+                     "float": normErrorStats(output, arithmetic), "groupNorm": normErrorStats(output, approximation),
+                     "latency": rangeGNReciprocalLatency(C, newtonSteps), "dividers": 0, "multipliers": N + 2 + 2 * newtonSteps,
+                     "romBits": (1 << mantissaBits) * 8, "interval": 1}) # entries in (0.5, 1]: one exponent bit, 7 mantissa bits
+    return rows
+
+
+def printTradeoff(C, rows):
+    print(f"rangeGN C={C}:")
+    for row in rows:
+        print(f"  {row['name']:<20} {row['latency']:>2} cycles, a group every {row['interval']:>2}  {row['dividers']:>2} dividers "
+              f"{row['multipliers']:>2} FPMult16ALTs {row['romBits']:>5} ROM bits   vs float rangeGN MSE {row['float']['MSE']:.3e} "
+              f"max {row['float']['maxAbsError']:.3e}   vs GroupNorm MSE {row['groupNorm']['MSE']:.3e}")
+
+
+if __name__ == "__main__":
+    from bf16Codec import roundToBF16
+    from calculateMSE_exhaustive import exhaustiveErrorStats, rangeCodes
+    from rangeGNGolden import bf16Divide
+    from toplevelThroughputModel import unetCycles
+
+    assert reciprocalFromInput(0x4000) == 0x3F00 and reciprocalFromInput(0xBF80) == 0xBF80 # 1/2, 1/-1
+    assert reciprocalFromInput(0x0000) == 0x7F80 and reciprocalFromInput(0x7F80) == 0 and reciprocalFromInput(0x7FC1) == HARDFLOAT_NAN
+    # a full table is correctly rounded: the same as the divider wherever the result is normal
+    codes = rangeCodes(2.0**-126, 2.0**126)
+    assert np.array_equal(reciprocalFromInput(codes), bf16Divide(0x3F80, codes))
+    # the scale path hides under the 17-cycle numerator path of C = 320 up to one Newton step
+    assert [rangeGNReciprocalLatency(320, newtonSteps) for newtonSteps in range(3)] == [18, 18, 20]
+
+    # 1/x only scales by a power of two outside [1, 2), so [1, 2) covers every mantissa
+    codes = rangeCodes(1.0, 2.0)[:-1]
+    for mantissaBits, newtonSteps in [(7, 0), (6, 0), (5, 0), (4, 0), (3, 0), (5, 1), (4, 1), (3, 1), (2, 1), (2, 2)]:
+        stats = exhaustiveErrorStats(reciprocalDesign(mantissaBits, newtonSteps), lambda x: 1 / x, codes=codes)
+        print(f"1/x, table {1 << mantissaBits:>3} + {newtonSteps} Newton: MSE {stats['MSE']:.3e}  max|err| {stats['maxAbsError']:.3e}  "
+              f"max ULP {stats['maxULPError']:.2f}  ({reciprocalLatency(newtonSteps)} cycles)")
+
+    rng = np.random.default_rng(0)
+    for C, size in [(320, 64), (640, 32), (1280, 16)]:
+        printTradeoff(C, rangeGNReciprocalTradeoff(roundToBF16(rng.standard_normal((size, size, C)).astype(np.float32) * 2 + 0.5)))
+
+    # without the iterative dividers, rangeGN takes a new group every cycle
+    for interval in [DIVIDER_INTERVAL, 1]:
+        results = unetCycles(rangeGNInterval=interval)
+        print(f"SD1.5 UNet pass, a group every {interval:>2} cycles: {sum(result['cycles'] for result in results):>12,} cycles")
@@ -0,0 +1,93 @@
+import numpy as np
+from bf16Codec import BF16ToFloat
+from calculateMSE_exhaustive import REFERENCE_FUNCTIONS, exhaustiveErrorStats, rangeCodes
+from optimizePWLBreakpoints import _fitSegment, _quantizeSegment
+from pwlSigmoidGolden import bitSliceVariant, pwlDesign
+from toplevelThroughputModel import ACTIVATION_LATENCIES
+
+"""
+Search over bit-slice segmentations of the sigmoid, where the segment index is a bit slice of the BF16 input: the low
+exponent bits and the top mantissaBits mantissa bits (see pwlSigmoidGolden.bitSliceIndex). Such a design needs neither
+the when-tree on in_a_fp nor BF16toFP, only one 8-bit comparator on the exponent for segment 0 (|x| < 2^eMin), so the
+segment lookup is that compare and a ROM read on input bits.
+
+A segmentation is fixed by eMin (below 2^eMin everything is one segment) and mantissaBits (2^mantissaBits segments per
+binade up to 8). Each segment gets its least-squares line, rounded to BF16 like optimizePWLBreakpoints does, and the
+mirrored intercept 1 - q for negative inputs. The candidates are then ranked on the error of the bit-accurate PWL golden
+model for SiLU or GELU. The latency is assumed, not synthesized: one cycle less than
+siluandgeluPWLSigmoid20NonUniformSegments, on the assumption that the single exponent compare fits in the stage that reads
+the ROM, so the when-tree stage and its register go away.
+"""
+
+BIT_SLICE_LATENCY = ACTIVATION_LATENCIES["pwl20NonUniform"] - 1
+
+
+def bitSliceBreakpoints(eMin=-2, mantissaBits=2):
+    """
+    The segment starts of a bit-slice segmentation, the last segment ends at 8.
+    """
+    binades = 2.0 ** np.arange(eMin, 3)
+    return np.concatenate([[0.0], (binades[:, None] * (1 + np.arange(2**mantissaBits) / 2**mantissaBits)).ravel()])
+
+
+def fitBitSliceSegmentation(eMin=-2, mantissaBits=2, samplesPerSegment=64):
+    """
+    Least-squares sigmoid lines per segment with BF16 coefficients, returned as a PWL variant.
+    """
+    starts = bitSliceBreakpoints(eMin, mantissaBits)
+    ends = np.append(starts[1:], 8.0)
+    slopes, intercepts = [], []
+    for start, end in zip(starts, ends):
+        x = np.linspace(start, end, samplesPerSegment + 1)
+        y = REFERENCE_FUNCTIONS["sigmoid"](x)
+        slopeCode, interceptCode = _quantizeSegment(x, y, *_fitSegment(x, y, "mse"), "mse")
+        slopes.append(BF16ToFloat(slopeCode))
+        intercepts.append(BF16ToFloat(interceptCode))
+    mirroredIntercepts = 1.0 - np.asarray(intercepts, dtype=np.float32)
+    return bitSliceVariant(eMin, mantissaBits, slopes, intercepts, mirroredIntercepts)
+
+
+def searchBitSliceSegmentations(function="silu", eMins=range(-6, 1), mantissaBitWidths=range(0, 5), maxSegments=64, codes=None):
+    """
+    Scores every (eMin, mantissaBits) with at most maxSegments segments, returns a list of dicts with eMin, mantissaBits,
+    segments, the error statistics of exhaustiveErrorStats and the variant, best MSE first.
+    codes defaults to every BF16 code in [-8, 8] except |x| < 2^-20, like the "bf16" inputs of sweepDesignSpace.
+    """
+    if codes is None:
+        codes = rangeCodes(-8.0, 8.0)
+        codes = codes[np.abs(BF16ToFloat(codes)) >= 2.0**-20]
+    candidates = []
+    for eMin in eMins:
+        for mantissaBits in mantissaBitWidths:
+            segments = 1 + ((3 - eMin) << mantissaBits)
+            if segments > maxSegments:
+                continue
+            variant = fitBitSliceSegmentation(eMin, mantissaBits)
+            stats = exhaustiveErrorStats(pwlDesign(variant, function), function, codes=codes)
+            candidates.append(dict(stats, eMin=eMin, mantissaBits=mantissaBits, segments=segments, variant=variant))
+    return sorted(candidates, key=lambda candidate: candidate["MSE"])
+
+
+def printBitSliceRanking(function, candidates, top=10):
+    print(f"{function}: {len(candidates)} bit-slice segmentations, best {min(top, len(candidates))} on MSE "
+          f"(latency {BIT_SLICE_LATENCY} cycles)")
+    for candidate in candidates[:top]:
+        print(f"  eMin {candidate['eMin']:>2}  mantissa bits {candidate['mantissaBits']}  {candidate['segments']:>3} segments  "
+              f"MSE {candidate['MSE']:.3e}  max|err| {candidate['maxAbsError']:.3e}")
+
+
+if __name__ == "__main__":
+    from pwlSigmoidGolden import bitSliceIndex, PWL_VARIANTS
+
+    # 1.5 = 2^0 * 1.1b: segment 1 + (0 - (-2)) * 4 + 2 with eMin -2 and 2 mantissa bits, 2^-3 falls below eMin
+    assert bitSliceIndex(0x3FC0, -2, 2) == 11 and bitSliceIndex(0x3E00, -2, 2) == 0 and bitSliceIndex(0xBFC0, -2, 2) == 11
+    assert np.all(bitSliceBreakpoints(-1, 1) == [0.0, 0.5, 0.75, 1.0, 1.5, 2.0, 3.0, 4.0, 6.0])
+
+    codes = rangeCodes(-8.0, 8.0)
+    codes = codes[np.abs(BF16ToFloat(codes)) >= 2.0**-20]
+    for function in ["silu", "gelu"]:
+        for name in ["20NonUniform", "36NonUniform"]:
+            stats = exhaustiveErrorStats(pwlDesign(name, function), function, codes=codes)
+            print(f"{function} PWL{name} ({len(PWL_VARIANTS[name]['segments'])} segments, comparators): MSE {stats['MSE']:.3e}  "
+                  f"max|err| {stats['maxAbsError']:.3e}  latency {ACTIVATION_LATENCIES['pwl' + name]} cycles")
+        printBitSliceRanking(function, searchBitSliceSegmentations(function, codes=codes))
@@ -0,0 +1,197 @@
+import heapq
+import math
+from toplevelThroughputModel import ACTIVATION_LATENCIES, DIVIDER_INTERVAL, DYT_LATENCY, GROUPS, layerCycles, rangeGNLatency
+
+"""
+Discrete-event simulator of the toplevel.scala datapath: spatial_array_size lanes with one SiLU/GELU and one DyT module
+each, and a single rangeGN(C) fed by the first C/32 lanes. A workload of pixels (or tokens) x C channels is streamed in
+rows of spatial_array_size elements per cycle from the scratchpad, through the path that sel0/sel1 select.
+
+Events are scheduled per row and per group, not per cycle:
+    issue     the scratchpad sends the next row, unless the rangeGN input buffer is full (a stall)
+    accept    rangeGN takes a complete group once its dividers accept inputs again, every rangeGNInterval cycles
+    gnDone    the normalized group leaves rangeGN, rangeGNLatency(C) cycles later, and enters the activation lanes
+The activation lanes are fully pipelined, so they take a row per cycle and only add their latency.
+
+Two input layouts are simulated:
+    groupPerRow  what toplevel wires up: every row holds (part of) one group on lanes 0..N-1, the other lanes are idle.
+                 Groups of N = 20 or 40 channels (C = 640, 1280) take several rows on 16 lanes and are gathered first,
+                 toplevel.scala itself cannot be built for those.
+    packed       rows are filled with consecutive channels, a staging buffer in front of rangeGN cuts them into groups
+"""
+
+# the mode names of toplevel.scala, which writes the select bits with sel(0) first: GN(01) is sel0(0) = 0, sel0(1) = 1
+SEL0_MODES = {"GN+act": 0b00, "GN": 0b10, "act": 0b01, "bypass": 0b11}
+SEL1_MODES = {"SiLU": 0b00, "GELU": 0b10, "DyT": 0b01, "bypass": 0b11}
+LAYOUTS = ("groupPerRow", "packed")
+
+
+def datapathRoute(sel0, sel1):
+    """
+    Follows the demuxes and muxes of toplevel.scala for one lane. Returns a dict with:
+      rangeGN   True if the elements go through rangeGN
+      function  "silu", "gelu", "dyt" or None, the activation that reaches out_a
+      output    "computed", "passthrough" (rangeGN output or input unchanged) or "zero"
+    mux2 selects demux1.out(1) whenever sel1(1) is set, so GELU (in_select = sel1(1) = 1) never reaches out_a.
+    """
+    gn = (sel0 & 1) == 0 # demux0 and mux0: sel0(0)
+    actBypassed = (sel0 >> 1) & 1 == 1 # demux1: sel0(1)
+    dyt = sel1 & 1 == 1 # demux2 and mux1: sel1(0)
+    gelu = (sel1 >> 1) & 1 == 1 # in_select of the PWL modules and mux2: sel1(1)
+    if gelu: # mux2 takes the bypass output of demux1, which only carries data when the activation is bypassed
+        return {"rangeGN": gn, "function": None, "output": "passthrough" if actBypassed else "zero"}
+    if actBypassed: # the activation modules get 0 and their output (SiLU(0) = DyT(0) = 0) reaches out_a
+        return {"rangeGN": gn, "function": None, "output": "zero"}
+    return {"rangeGN": gn, "function": "dyt" if dyt else "silu", "output": "computed"}
+
+
+class ToplevelSimulator:
+    """
+    Streams pixels x C elements through toplevel in the mode sel0/sel1, see simulate() for the statistics.
+    bufferGroups is the number of complete groups the rangeGN input buffer holds besides the one being filled.
+    """
+    def __init__(self, C=320, sel0=SEL0_MODES["GN+act"], sel1=SEL1_MODES["SiLU"], spatialArraySize=16,
+                 activation="pwl20NonUniform", rangeGNInterval=DIVIDER_INTERVAL, layout="groupPerRow", bufferGroups=1):
+        if layout not in LAYOUTS:
+            raise ValueError(f"Unsupported layout '{layout}'. Use one of {LAYOUTS}.")
+        self.C, self.N, self.lanes = C, C // GROUPS, spatialArraySize
+        self.route = datapathRoute(sel0, sel1)
+        self.rangeGNInterval, self.layout, self.bufferGroups = rangeGNInterval, layout, bufferGroups
+        self.gnLatency = rangeGNLatency(C)
+        if self.route["function"] == "dyt":
+            self.actLatency = DYT_LATENCY
+        elif self.route["function"] == "silu":
+            self.actLatency = ACTIVATION_LATENCIES[activation]
+        else:
+            self.actLatency = 0 # demux1 to mux2 is combinational
+
+    def _rows(self, elements):
+        """
+        Sizes of the rows the scratchpad sends.
+        """
+        if not self.route["rangeGN"] or self.layout == "packed":
+            full, rest = divmod(elements, self.lanes)
+            return [self.lanes] * full + ([rest] if rest else [])
+        perGroup = [min(self.lanes, self.N - start) for start in range(0, self.N, self.lanes)]
+        return perGroup * (elements // self.N)
+
+    def simulate(self, pixels):
+        """
+        Returns cycles, elementsPerCycle, laneUtilization (elements / (lanes * cycles) at the scratchpad side),
+        stallCycles (cycles the scratchpad had to wait for rangeGN), rangeGNUtilization (fraction of the cycles its
+        dividers are busy), the route and supported (False where toplevel.scala cannot be built for this C).
+        """
+        elements = pixels * self.C
+        rows = self._rows(elements)
+        events = [] # (time, order, kind, value)
+        order = 0
+        def schedule(time, kind, value=0):
+            nonlocal order
+            heapq.heappush(events, (time, order, kind, value))
+            order += 1
+
+        nextRow = 0
+        issued = stallCycles = lastIssue = 0
+        buffered = 0 # elements in front of rangeGN
+        # room for bufferGroups complete groups besides the one being filled, which a packed row can overfill
+        capacity = self.bufferGroups * self.N + (self.N + self.lanes - 1 if self.layout == "packed" else self.N)
+        gnFree = gnBusy = 0
+        actFree = 0 # the activation lanes take one row of spatial_array_size elements per cycle
+        finish = 0
+        waitingForSpace = acceptPending = False # at most one pending issue and one pending accept event
+
+        def scheduleAccept(time):
+            nonlocal acceptPending
+            if not acceptPending and buffered >= self.N:
+                acceptPending = True
+                schedule(max(time, gnFree), "accept")
+
+        def emit(time, rows=1):
+            # rows through the activation lanes (or the bypass) to out_a, a fraction when a packed row holds several groups
+            nonlocal actFree, finish
+            actFree = max(time, actFree) + rows
+            finish = max(finish, math.ceil(actFree) + self.actLatency)
+
+        schedule(0, "issue")
+        while events:
+            time, _, kind, value = heapq.heappop(events)
+            if kind == "issue":
+                if nextRow >= len(rows):
+                    continue
+                size = rows[nextRow]
+                if self.route["rangeGN"] and buffered + size > capacity:
+                    waitingForSpace = True # resumed by the next accept
+                    continue
+                stallCycles += time - lastIssue - (1 if issued else 0)
+                issued += 1
+                lastIssue = time
+                nextRow += 1
+                if self.route["rangeGN"]:
+                    buffered += size
+                    scheduleAccept(time + 1) # the row is in the buffer at the end of the cycle
+                else:
+                    emit(time)
+                schedule(time + 1, "issue")
+            elif kind == "accept":
+                acceptPending = False
+                buffered -= self.N
+                gnFree = time + self.rangeGNInterval
+                gnBusy += self.rangeGNInterval
+                schedule(time + self.gnLatency, "gnDone", self.N)
+                scheduleAccept(gnFree)
+                if waitingForSpace:
+                    waitingForSpace = False
+                    schedule(time, "issue")
+            elif kind == "gnDone":
+                emit(time, value / self.lanes if self.layout == "packed" else math.ceil(value / self.lanes))
+        assert nextRow == len(rows) and buffered < self.N, "the simulation stopped with rows left"
+
+        cycles = max(finish, lastIssue + 1)
+        return {"C": self.C, "pixels": pixels, "elements": elements, "layout": self.layout, "route": self.route,
+                "cycles": cycles, "elementsPerCycle": elements / cycles, "laneUtilization": elements / (self.lanes * cycles),
+                "stallCycles": stallCycles, "rangeGNUtilization": min(1.0, gnBusy / cycles) if self.route["rangeGN"] else 0.0,
+                "supported": not self.route["rangeGN"] or (self.C in (320, 640, 1280) and self.N <= self.lanes)}
+
+
+def sustainedElementsPerCycle(C=320, spatialArraySize=16, rangeGNInterval=DIVIDER_INTERVAL, layout="groupPerRow"):
+    """
+    The steady-state ceiling of the GN path the simulation converges to: a group of N elements per max(interval, rows) cycles.
+    """
+    N = C // GROUPS
+    if layout == "packed":
+        return min(spatialArraySize, N / rangeGNInterval)
+    return N / max(rangeGNInterval, math.ceil(N / spatialArraySize))
+
+
+def printSimulation(name, result):
+    print(f"{name:<46} {result['cycles']:>9,} cycles  {result['elementsPerCycle']:6.2f} elements/cycle  "
+          f"lanes {result['laneUtilization']:6.1%}  rangeGN {result['rangeGNUtilization']:6.1%}  "
+          f"stalls {result['stallCycles']:>9,}  output: {result['route']['output']}{'' if result['supported'] else '  (not buildable)'}")
+
+
+if __name__ == "__main__":
+    print("sel0/sel1 modes of toplevel.scala:")
+    for sel0Name, sel0 in SEL0_MODES.items():
+        for sel1Name, sel1 in SEL1_MODES.items():
+            print(f"  sel0 {sel0Name:<7} sel1 {sel1Name:<7} -> {datapathRoute(sel0, sel1)}")
+    assert datapathRoute(SEL0_MODES["act"], SEL1_MODES["SiLU"]) == {"rangeGN": False, "function": "silu", "output": "computed"}
+    assert datapathRoute(SEL0_MODES["act"], SEL1_MODES["GELU"])["output"] == "zero"
+    # the throughput model agrees: no GELU layer is supported
+    assert not layerCycles({"op": "gelu", "shape": (64, 64, 1280)})["supported"]
+    assert datapathRoute(SEL0_MODES["GN"], SEL1_MODES["bypass"]) == {"rangeGN": True, "function": None, "output": "passthrough"}
+
+    pixels = 32 * 32
+    # streaming without rangeGN: a row per cycle, only the pipeline latency on top
+    result = ToplevelSimulator(sel0=SEL0_MODES["act"], sel1=SEL1_MODES["DyT"]).simulate(pixels)
+    assert result["cycles"] == pixels * 320 // 16 + DYT_LATENCY and result["stallCycles"] == 0
+    printSimulation("act DyT, C=320", result)
+
+    for C in [320, 640, 1280]:
+        for layout in LAYOUTS:
+            for interval in [DIVIDER_INTERVAL, 1]:
+                result = ToplevelSimulator(C, layout=layout, rangeGNInterval=interval).simulate(pixels)
+                assert math.isclose(result["elementsPerCycle"], sustainedElementsPerCycle(C, 16, interval, layout), rel_tol=0.01)
+                printSimulation(f"GN+act SiLU, C={C}, {layout}, interval {interval}", result)
+    for lanes in [8, 16, 32, 64]:
+        result = ToplevelSimulator(1280, spatialArraySize=lanes, rangeGNInterval=1).simulate(pixels)
+        printSimulation(f"GN+act SiLU, C=1280, {lanes} lanes, interval 1", result)
@@ -0,0 +1,146 @@
+import numpy as np
+from bf16Codec import floatToBF16, BF16ToFloat
+from fpUnitsGolden import fpMult16ALT, fpAdd16ALT, bf16ToFixedPoint, actualExponent
+from generateLUTs import buildExp2Table
+from rangeGNGolden import HARDFLOAT_NAN, bf16Divide, bf16LessThan, _reduceTree
+
+"""
+Bit-accurate golden model of a LUT-based exp and of a streaming softmax built around it, from the same FPAdd16ALT,
+FPMult16ALT and DivSqrtRecFN_small(8, 8) units the other designs use. Nothing of it exists in Chisel yet.
+
+exp(x) is range-reduced to base 2:
+
+    t        = x * log2(e)                                           FPMult16ALT, log2(e) rounded to BF16 (0x3FB9)
+    n, f     = t = n + f with n = floor(t), 0 <= f < 1               BF16toFP(intBits, fracBits), f truncated to fracBits
+    exp(x)   = 2^f * 2^n                                             2^f from the exp2 table of generateLUTs.buildExp2Table,
+                                                                     2^n spliced in as the exponent field, no adder
+
+The table entries lie in [1, 2), so only their 7 mantissa bits are stored. Results below the smallest normal BF16 flush to
+zero and |t| >= 2^intBits gives 0 or infinity, like the out-of-range check of the LUT designs.
+
+softmax(x) along the last axis streams each row three times:
+
+    max      bf16LessThan over the row (a running max, exact in any order)
+    sum      e_i = exp(x_i + (-max)) into `accumulators` interleaved FPAdd16ALT running sums, element i into sum i % k,
+             then an adder tree over the k sums. k = 3 keeps a 3-stage FPAdd16ALT busy every cycle.
+    output   e_i * (1 / sum)                                         one DivSqrtRecFN_small per row, FPMult16ALT per element
+"""
+
+LOG2E = 0x3FB9 # 1.4453125
+BF16_ONE = 0x3F80
+BF16_INF = 0x7F80
+
+
+def exp2FromInput(t, fracBits=7, intBits=7):
+    """
+    2^t for BF16 codes t through the exp2 table: BF16toFP splits |t| into intBits integer and fracBits fraction bits,
+    negative t read the table at 1 - f and take one more off the exponent.
+    """
+    t = np.asarray(t, dtype=np.uint16)
+    table = buildExp2Table(fracBits)
+    assert np.all(table >> 7 == 127), "every exp2 table entry must lie in [1, 2)"
+    sign, intPart, fracPart = bf16ToFixedPoint(t, intBits, fracBits)
+    tiny = actualExponent(t) < -fracBits # truncates to 0, without the wrap-around of the 6-bit shift in BF16toFP
+    intPart, fracPart = np.where(tiny, 0, intPart), np.where(tiny, 0, fracPart)
+
+    borrow = (sign == 1) & (fracPart > 0)
+    n = np.where(sign == 1, -intPart - borrow, intPart)
+    index = np.where(borrow, (1 << fracBits) - fracPart, fracPart)
+    exponent = 127 + n
+    output = np.where(exponent <= 0, 0, np.where(exponent >= 255, BF16_INF, (exponent << 7) | (table[index] & 0x7F)))
+    outOfRange = np.where(sign == 1, 0, BF16_INF)
+    return np.where((actualExponent(t) >= intBits) & ~tiny, outOfRange, output).astype(np.uint16)
+
+
+def expActivation(codes, fracBits=7, intBits=7):
+    """
+    exp(x) for BF16 inputs: FPMult16ALT with log2(e), then exp2FromInput. -inf gives 0, +inf infinity and NaN 0x7FC0.
+    """
+    codes = np.asarray(codes, dtype=np.uint16)
+    output = exp2FromInput(fpMult16ALT(codes, LOG2E), fracBits, intBits)
+    nonFinite = ((codes >> 7) & 0xFF) == 0xFF
+    special = np.where((codes & 0x7F) != 0, HARDFLOAT_NAN, np.where(codes >> 15 == 1, 0, BF16_INF))
+    return np.where(nonFinite, special, output).astype(np.uint16)
+
+
+def expDesign(fracBits=7, intBits=7):
+    """
+    The exp as a callable on BF16 codes, to pass to calculateMSE_exhaustive.exhaustiveErrorStats(..., reference="exp").
+    """
+    return lambda codes: expActivation(codes, fracBits, intBits)
+
+
+def _accumulate(values, accumulators):
+    # element i goes into running sum i % accumulators, the sums are then added by a tree
+    values = np.asarray(values, dtype=np.uint16)
+    accumulators = min(accumulators, values.shape[-1])
+    sums = values[..., :accumulators]
+    for start in range(accumulators, values.shape[-1], accumulators):
+        chunk = values[..., start:start + accumulators]
+        sums = np.concatenate([fpAdd16ALT(sums[..., :chunk.shape[-1]], chunk), sums[..., chunk.shape[-1]:]], axis=-1)
+    return _reduceTree(sums, fpAdd16ALT)
+
+
+def softmaxStages(codes, accumulators=3, fracBits=7, intBits=7):
+    """
+    All intermediate values of the softmax of a (..., L) array of BF16 codes along its last axis, as a dict of arrays:
+    max, differences, exps, sum, reciprocal and output. Per-row values have shape (...), per-element values (..., L).
+    """
+    codes = np.asarray(codes, dtype=np.uint16)
+    maximum = _reduceTree(codes, lambda a, b: np.where(bf16LessThan(a, b), b, a))
+    differences = fpAdd16ALT(codes, (maximum ^ 0x8000)[..., None])
+    differences = np.where(codes == 0xFF80, 0xFF80, differences) # a masked -inf input stays -inf, exp gives 0
+    exps = expActivation(differences, fracBits, intBits)
+    total = _accumulate(exps, accumulators)
+    reciprocal = bf16Divide(BF16_ONE, total)
+    output = fpMult16ALT(exps, reciprocal[..., None])
+    return {"max": maximum, "differences": differences, "exps": exps, "sum": total, "reciprocal": reciprocal, "output": output}
+
+
+def softmax(codes, accumulators=3, fracBits=7, intBits=7):
+    """
+    Output of the softmax along the last axis of an array of BF16 codes.
+    """
+    return softmaxStages(codes, accumulators, fracBits, intBits)["output"]
+
+
+def softmaxFloat(x):
+    """
+    The exact softmax along the last axis in float64.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    e = np.exp(x - np.max(x, axis=-1, keepdims=True))
+    return e / np.sum(e, axis=-1, keepdims=True)
+
+
+if __name__ == "__main__":
+    import time
+    from bf16Codec import roundToBF16
+    from calculateMSE_exhaustive import exhaustiveErrorStats, printErrorStats, rangeCodes
+    from rangeGNGolden import normErrorStats
+
+    assert LOG2E == floatToBF16(np.float32(np.log2(np.e)), rounding="rne")
+    assert exp2FromInput(0x0000) == BF16_ONE and exp2FromInput(0x4040) == 0x4100 # 2^0 = 1, 2^3 = 8
+    assert exp2FromInput(0xBF00) == floatToBF16(np.float32(np.sqrt(0.5)), rounding="rne") # 2^-0.5 = 0.7071
+    assert exp2FromInput(0x42FE) == 0x7F00 and exp2FromInput(0x4300) == BF16_INF # 2^127, 2^128 overflows
+    assert exp2FromInput(0xC2FC) == 0x0080 and exp2FromInput(0xC2FE) == 0 # 2^-126, 2^-127 flushes to zero
+    assert expActivation(0xFF80) == 0 and expActivation(0x7F80) == BF16_INF and expActivation(0x7FC1) == HARDFLOAT_NAN
+
+    # softmax inputs after the max subtraction are <= 0, exp underflows below -87
+    for fracBits in [5, 6, 7]:
+        printErrorStats(f"exp2 LUT {1 << fracBits}", exhaustiveErrorStats(expDesign(fracBits), "exp", codes=rangeCodes(-87.0, 0.0)))
+
+    # one head of SD1.5 self-attention at 64x64 latents, and cross-attention on the 77 text tokens
+    rng = np.random.default_rng(0)
+    for rows, length in [(4096, 4096), (4096, 77)]:
+        x = roundToBF16((rng.standard_normal((rows, length)) * 3).astype(np.float32))
+        codes = floatToBF16(x)
+        reference = softmaxFloat(x)
+        for accumulators in [1, 3, length]:
+            start = time.perf_counter()
+            output = softmax(codes, accumulators)
+            elapsed = time.perf_counter() - start
+            stats = normErrorStats(output, reference)
+            rowSums = BF16ToFloat(output).astype(np.float64).sum(axis=-1)
+            print(f"softmax {rows}x{length}, {accumulators:>4} accumulators: MSE {stats['MSE']:.3e}  max|err| {stats['maxAbsError']:.3e}"
+                  f"  row sums {rowSums.min():.4f} ... {rowSums.max():.4f}  ({x.size / elapsed / 1e6:.1f} M elements/s)")
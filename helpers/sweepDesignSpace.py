@@ -0,0 +1,258 @@
+import functools
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+from bf16Codec import floatToBF16, BF16ToFloat
+from calculateMSE_exhaustive import exhaustiveErrorStats, rangeCodes
+from lutGolden import lutDesign
+from invSigmoidGolden import invSigmoidDesign
+from hsiluGolden import hsiluDesign, HSILU_SCALE
+from pwlSigmoidGolden import pwlDesign, pwlVariant, PWL_VARIANTS, SIGMOID_SCALES
+from pwlSiLUGolden import pwlSiLUDesign, PWL_SILU_VARIANTS
+from optimizePWLBreakpoints import optimizeBreakpoints
+from optimizeQuadraticSegments import optimizeQuadraticSegments
+from searchBitSliceSegmentations import fitBitSliceSegmentation
+from quadraticGolden import quadraticDesign, quadraticVariantFromSegmentation, QUADRATIC_FUNCTIONS
+from estimateArea import CALIBRATED_FORMATS, estimateArea, extrapolationReasons, synthesizedArea
+
+"""
+Design-space exploration: enumerates configurations of every design family that has a golden model,
+scores them in parallel worker processes and streams the results back as they finish.
+The results turn into the SILU_DATA/GELU_DATA/DYT_DATA dictionaries that visualizeParetoCurves.py plots:
+
+    lut         zero-order direct LUT, intBits x fracBits                        (siluUsingLUT, geluUsingLUT, DyTUsingLUT)
+    invSigmoid  zero-order inverted sigmoid LUT, 4 up to 128 entries             (siluandgeluUsingInvSigmoid32/64/128)
+    hsilu       h-SiLU/h-GELU with other offset, 1/6 and GELU gain constants     (hsilugelu)
+    pwlSigmoid  first-order sigmoid, the Scala variants, DP-optimized segment counts (siluandgeluPWLSigmoid*Segments)
+                and bit-slice segmentations (searchBitSliceSegmentations)
+    pwlSiLU     first-order direct SiLU, the Scala variants                      (siluPWL24Segments, siluPWL30SegmentsDetailAroundZero)
+    quadratic   second-order sigmoid (SiLU/GELU) or tanh (DyT), DP-optimized segment counts (quadraticGolden, no Scala yet)
+
+Each configuration is a plain dict, so it can be sent to a worker and written to a JSON-lines file as is.
+Designs that have been synthesized keep their recorded area and label, all others get the estimate of estimateArea.py,
+so dominated designs can be pruned before anyone synthesizes them. Designs in entryFormats the area model is not
+calibrated on get no area and stay off the Pareto fronts.
+"""
+
+FUNCTION_LABELS = {"silu": "SiLU", "gelu": "GELU", "dyt": "DyT"}
+FUNCTION_COLORS = {"silu": "#366FC0", "gelu": "#9231C2", "dyt": "#EF5048"}
+FAMILY_MARKERS = {"lut": '*', "invSigmoid": 's', "hsilu": '^', "pwlSigmoid": 'o', "pwlSiLU": '<', "quadratic": 'D'}
+REFERENCES = {"silu": "silu", "gelu": "gelu", "dyt": "tanh"} # DyT with alpha = 1.0
+
+def _bf16Offsets(code, offsets):
+    return [int(code) + offset for offset in offsets]
+
+
+def _withEntryFormat(config, entryFormat):
+    if entryFormat == "bf16":
+        return config
+    return dict(config, name=f"{config['name']}-{entryFormat}", entryFormat=entryFormat)
+
+
+def enumerateDesigns(functions=("silu", "gelu", "dyt"), lutIntBits=(1, 2, 3, 4), lutFracBits=(2, 3, 4, 5, 6, 7),
+                     invSigmoidEntries=(4, 8, 16, 32, 64, 128), pwlVariants=tuple(PWL_VARIANTS), pwlSegments=tuple(range(4, 41, 2)),
+                     pwlNorms=("mse", "max"), pwlBitSlices=((-1, 1), (-1, 2), (-2, 2), (-2, 3)), quadraticSegments=(2, 3, 4, 6, 8),
+                     hsiluOffsets=(2.5, 2.75, 3.0, 3.25, 3.5),
+                     hsiluScales=tuple(_bf16Offsets(HSILU_SCALE, range(-2, 3))),
+                     hsiluGains=tuple(_bf16Offsets(SIGMOID_SCALES["gelu"], range(-4, 5, 2))), pwlSiLUVariants=tuple(PWL_SILU_VARIANTS),
+                     entryFormats=("bf16",)):
+    """
+    Returns the list of configurations to sweep. DyT only exists as a LUT and a quadratic design, pwlSiLU only computes SiLU,
+    the other families compute SiLU and GELU.
+    pwlBitSlices are (eMin, mantissaBits) of bit-slice segmentations. hsiluScales and hsiluGains are BF16 codes (neighbours of 1/6 and 1.703125), hsiluOffsets are floats.
+    entryFormats are the minifloatCodec formats the LUT entries and the PWL coefficients of the Scala variants are stored in,
+    a format other than "bf16" adds an entryFormat key and a suffix to the name.
+    """
+    designs = []
+    for function in functions:
+        label = FUNCTION_LABELS[function]
+        for intBits in lutIntBits:
+            for fracBits in lutFracBits:
+                for entryFormat in entryFormats:
+                    designs.append(_withEntryFormat({"name": f"{label}-LUT{intBits}.{fracBits}", "family": "lut", "function": function,
+                                                     "intBits": intBits, "fracBits": fracBits}, entryFormat))
+        for segments in quadraticSegments:
+            designs.append({"name": f"{label}-Quadratic{segments}", "family": "quadratic", "function": function, "segments": segments})
+        if function == "dyt":
+            continue
+        for entries in invSigmoidEntries:
+            designs.append({"name": f"{label}-InvSigmoid{entries}", "family": "invSigmoid", "function": function, "entries": entries})
+        for variant in pwlVariants:
+            for entryFormat in entryFormats:
+                designs.append(_withEntryFormat({"name": f"{label}-PWL{variant}", "family": "pwlSigmoid", "function": function,
+                                                 "variant": variant}, entryFormat))
+        for segments in pwlSegments:
+            for norm in pwlNorms:
+                designs.append({"name": f"{label}-PWL{segments}opt-{norm}", "family": "pwlSigmoid", "function": function,
+                                "segments": segments, "norm": norm})
+        for eMin, mantissaBits in pwlBitSlices:
+            designs.append({"name": f"{label}-PWLBitSlice({eMin}, {mantissaBits})", "family": "pwlSigmoid", "function": function,
+                            "eMin": eMin, "mantissaBits": mantissaBits})
+        if function == "silu":
+            for variant in pwlSiLUVariants:
+                designs.append({"name": f"{label}-PWLDirect{variant}", "family": "pwlSiLU", "function": function, "variant": variant})
+        for offset in hsiluOffsets:
+            for scale in hsiluScales:
+                for gain in (hsiluGains if function == "gelu" else [SIGMOID_SCALES["silu"]]):
+                    constants = [offset, float(BF16ToFloat(np.uint16(scale)))]
+                    if function == "gelu":
+                        constants.append(float(BF16ToFloat(np.uint16(gain))))
+                    designs.append({"name": f"h-{label}({', '.join(f'{c:.7g}' for c in constants)})", "family": "hsilu",
+                                    "function": function, "offset": int(floatToBF16(np.float32(offset))), "scale": scale, "gain": gain})
+    return designs
+
+
+def buildDesign(config):
+    """
+    The golden model of a configuration as a callable on BF16 codes.
+    """
+    family, function = config["family"], config["function"]
+    entryFormat = config.get("entryFormat", "bf16")
+    if family == "lut":
+        return lutDesign(function, config["intBits"], config["fracBits"], entryFormat)
+    if family == "invSigmoid":
+        return invSigmoidDesign(config["entries"], function)
+    if family == "hsilu":
+        return hsiluDesign(function, config["offset"], config["scale"], config["gain"])
+    if family == "pwlSigmoid":
+        if "variant" in config:
+            return pwlDesign(config["variant"], function, entryFormat)
+        if "mantissaBits" in config:
+            return pwlDesign(fitBitSliceSegmentation(config["eMin"], config["mantissaBits"]), function)
+        result = optimizeBreakpoints("sigmoid", config["segments"], config["norm"], xmin=0.0, xmax=6.0, fracBits=7)
+        return pwlDesign(pwlVariant(result["breakpoints"], result["slopes"], result["intercepts"], fracBits=7), function)
+    if family == "pwlSiLU":
+        if function != "silu":
+            raise ValueError(f"The pwlSiLU family only computes silu, not {function}.")
+        return pwlSiLUDesign(config["variant"])
+    if family == "quadratic":
+        result = optimizeQuadraticSegments(QUADRATIC_FUNCTIONS[function], config["segments"])
+        return quadraticDesign(quadraticVariantFromSegmentation(result), function)
+    raise ValueError(f"Unknown design family '{family}'.")
+
+
+@functools.lru_cache(maxsize=None)
+def sweepCodes(inputs="uniform", xmin=-8.0, xmax=8.0):
+    """
+    The inputs every design is scored on, computed once per worker process:
+      "uniform": a 2^-12 grid on [xmin, xmax] rounded to BF16, so every part of the range weighs the same, like the random
+                 inputs of the sbt tests the recorded MSE values come from
+      "bf16":    every finite BF16 code in [xmin, xmax] once, except |x| < 2^-20: there BF16toFP wraps around
+                 and FPMult16ALT underflows (see fpUnitsGolden.py), which no activation in a network gets near
+    """
+    if inputs == "uniform":
+        return floatToBF16(np.arange(xmin, xmax + 2**-12, 2**-12, dtype=np.float64).astype(np.float32))
+    if inputs == "bf16":
+        codes = rangeCodes(xmin, xmax)
+        return codes[np.abs(BF16ToFloat(codes)) >= 2.0**-20]
+    raise ValueError(f"Unsupported inputs '{inputs}'. Use 'uniform' or 'bf16'.")
+
+
+def evaluateDesign(config, inputs="uniform", xmin=-8.0, xmax=8.0):
+    """
+    Scores one configuration, returns the configuration with the error statistics and the time it took added.
+    """
+    start = time.perf_counter()
+    stats = exhaustiveErrorStats(buildDesign(config), REFERENCES[config["function"]], codes=sweepCodes(inputs, xmin, xmax))
+    return dict(config, **stats, inputs=inputs, seconds=time.perf_counter() - start)
+
+
+def runSweep(designs, workers=None, inputs="uniform", xmin=-8.0, xmax=8.0, outputPath=None, maxArea=None):
+    """
+    Evaluates the designs in a ProcessPoolExecutor and yields every result as soon as it is done (so not in order).
+    With outputPath, every result is also appended to that JSON-lines file right away, see loadResults.
+    With maxArea, designs with a larger (estimated) area are skipped without evaluating them, designs the area model
+    cannot price are evaluated anyway.
+    """
+    if maxArea is not None:
+        designs = [config for config in designs if designArea(config) is None or designArea(config) <= maxArea]
+    output = open(outputPath, "a") if outputPath else None
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(evaluateDesign, config, inputs, xmin, xmax) for config in designs]
+            for future in as_completed(futures):
+                result = future.result()
+                if output:
+                    output.write(json.dumps(result) + "\n")
+                    output.flush()
+                yield result
+    finally:
+        if output:
+            output.close()
+
+
+def loadResults(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def designArea(result):
+    """
+    Area in um² of a swept design: the synthesized area when there is one, otherwise the estimate, or None for an
+    entryFormat the area model is not calibrated on.
+    """
+    known = synthesizedArea(result)
+    if known:
+        return known[1]
+    return estimateArea(result) if result.get("entryFormat", "bf16") in CALIBRATED_FORMATS else None
+
+
+def designLabel(result):
+    known = synthesizedArea(result)
+    return known[0] if known else result["name"]
+
+
+def paretoFront(results):
+    """
+    The results no other result beats on both area and MSE, sorted on area. Results without an area are left out.
+    """
+    front = []
+    for result in sorted((r for r in results if designArea(r) is not None), key=lambda r: (designArea(r), r["MSE"])):
+        if not front or result["MSE"] < front[-1]["MSE"]:
+            front.append(result)
+    return front
+
+
+def paretoData(results, onlyParetoOptimal=False, onlySynthesized=False):
+    """
+    Converts sweep results into (SILU_DATA, GELU_DATA, DYT_DATA) for pareto_plot_1function and pareto_plot_allfunctions.
+    """
+    data = {function: {} for function in FUNCTION_LABELS}
+    for function in FUNCTION_LABELS:
+        functionResults = [result for result in results if result["function"] == function]
+        if onlyParetoOptimal:
+            functionResults = paretoFront(functionResults)
+        for result in functionResults:
+            if (onlySynthesized and synthesizedArea(result) is None) or designArea(result) is None:
+                continue
+            data[function][designLabel(result)] = {"MSE": result["MSE"], "area": designArea(result), "color": FUNCTION_COLORS[function],
+                                     "marker": FAMILY_MARKERS[result["family"]]}
+    return data["silu"], data["gelu"], data["dyt"]
+
+
+if __name__ == "__main__":
+    designs = enumerateDesigns(entryFormats=("bf16", "fp16", "e5m2", "e4m3"))
+    print(f"sweeping {len(designs)} designs on {os.cpu_count()} cores")
+    start = time.perf_counter()
+    results = []
+    for result in runSweep(designs):
+        results.append(result)
+        print(f"[{len(results):>4}/{len(designs)}] {result['name']:<32} MSE: {result['MSE']:.3e}  max|err|: {result['maxAbsError']:.3e}"
+              f"  ({result['seconds']:.2f} s)")
+    print(f"sweep took {time.perf_counter() - start:.1f} s")
+
+    for function in FUNCTION_LABELS:
+        print(f"{FUNCTION_LABELS[function]} Pareto front:")
+        functionResults = [r for r in results if r["function"] == function]
+        for result in paretoFront(functionResults):
+            source = "synthesized" if synthesizedArea(result) else "estimated"
+            reasons = [] if synthesizedArea(result) else extrapolationReasons(result)
+            print(f"  {designLabel(result):<32} area: {designArea(result):8.2f} ({source})  MSE: {result['MSE']:.3e}"
+                  + (f"  ({'; '.join(reasons)})" if reasons else ""))
+        unpriced = sum(designArea(r) is None for r in functionResults)
+        print(f"  {unpriced} designs in entryFormats outside {list(CALIBRATED_FORMATS)} have no area and are not on the front")
+
+    from visualizeParetoCurves import pareto_plot_allfunctions
+    pareto_plot_allfunctions(data=paretoData(results, onlyParetoOptimal=True), xmin=500, xmax=4000, ymin=0, ymax=0.01, n_yticks=11, with_grid=True)
@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+from bf16Codec import allBF16Codes, BF16ToFloat
+from lutGolden import lutActivation
+from rangeGNGolden import RANGEGN_CONSTANTS, rangeGN
+from sweepDesignSpace import buildDesign
+
+torch = pytest.importorskip("torch")
+from torchHardwareModules import DESIGN_CONFIGS, HardwareActivation, HardwareDyT, HardwareRangeGN
+
+"""
+Every module of torchHardwareModules against the numpy golden model of its design, on all 65,536 BF16 codes, fed in as
+float32 tensors. NaN outputs only have to be NaN, the cast through float32 does not keep their payload.
+"""
+
+CODES = allBF16Codes()
+ACTIVATION_LABELS = [label for label, config in DESIGN_CONFIGS.items() if config["function"] in ("silu", "gelu")]
+DYT_LABELS = [label for label, config in DESIGN_CONFIGS.items() if config["function"] == "dyt"]
+
+
+def _inputs():
+    return torch.from_numpy(BF16ToFloat(CODES))
+
+
+def _codes(output):
+    # float32 outputs hold BF16 values, so the cast back to BF16 is exact
+    return output.detach().contiguous().to(torch.bfloat16).view(torch.int16).numpy().view(np.uint16)
+
+
+def _assertSameCodes(output, expected):
+    nan = np.isnan(BF16ToFloat(expected))
+    assert np.array_equal(np.isnan(BF16ToFloat(output)), nan)
+    assert np.array_equal(output[~nan], expected[~nan])
+
+
+@pytest.mark.parametrize("label", ACTIVATION_LABELS)
+def test_hardwareActivation(label):
+    _assertSameCodes(_codes(HardwareActivation(label)(_inputs())), buildDesign(DESIGN_CONFIGS[label])(CODES))
+
+
+@pytest.mark.parametrize("label", DYT_LABELS)
+def test_hardwareDyT(label):
+    config = DESIGN_CONFIGS[label]
+    output = HardwareDyT(label, 1, alphaInit=0.5)(_inputs()[:, None])[:, 0].detach().numpy()
+    # the affine part runs in float32, weight 1 and bias 0 turn -0 into +0 there as well
+    expected = BF16ToFloat(lutActivation(CODES, "dyt", config["intBits"], config["fracBits"], alpha=0x3F00)) * np.float32(1) + np.float32(0)
+    nan = np.isnan(expected)
+    assert np.array_equal(np.isnan(output), nan)
+    assert np.array_equal(output[~nan].view(np.uint32), expected[~nan].view(np.uint32))
+
+
+@pytest.mark.parametrize("C", sorted(RANGEGN_CONSTANTS))
+def test_hardwareRangeGN(C):
+    # every code in some channel of some pixel, (N, C) with the channels on axis 1
+    codes = np.resize(CODES, (-(-len(CODES) // C), C))
+    output = HardwareRangeGN(C, affine=False)(torch.from_numpy(BF16ToFloat(codes)))
+    _assertSameCodes(_codes(output), rangeGN(codes))
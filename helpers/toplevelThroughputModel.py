@@ -0,0 +1,240 @@
+import math
+from pwlSigmoidGolden import PWL_VARIANTS
+
+"""
+Cycle-level throughput model of the toplevel.scala datapath for whole Stable Diffusion 1.5 UNet passes.
+toplevel streams spatial_array_size elements per cycle from the scratchpad to the systolic array, through:
+
+    activation lanes  one SiLU/GELU and one DyT module per lane, fully pipelined: one element per lane per cycle
+    rangeGN           a single module fed by the first C/32 lanes, so one group of N = C/32 channels per pass.
+                      Its N DivSqrtRecFN_small(8, 8) dividers are iterative: a division takes sigWidth + 2 = 10 cycles
+                      before the divider accepts the next input, so a new group can only enter every DIVIDER_INTERVAL cycles
+
+A layer streams its whole tensor through one of the paths, so its cycles are the cycles to push the tensor in plus the
+pipeline latency of the path, which drains once per layer. With sel0 = GN+act, a GroupNorm and the SiLU after it
+go through toplevel in the same pass and the SiLU only adds its latency.
+
+The layer shapes are those of the SD1.5 UNet (diffusers UNet2DConditionModel, 64x64 latents): only the GroupNorms,
+LayerNorms (replaced by DyT), SiLUs and GELUs that toplevel computes are listed; convolutions, matmuls, SoftMax and the
+residual additions stay on Gemmini and the CPU. With unetLayers(softmax=True) the attention SoftMaxes are listed too,
+to compare their CPU cycles against a softmax unit on the lanes (softmaxGolden.py, not in Chisel yet):
+
+    softmax unit      one exp (FPAdd16ALT for x - max, FPMult16ALT by log2(e), exp2 LUT) and one FPAdd16ALT accumulator
+                      per lane, streaming every row three times (max, exp and sum, normalize). The reciprocal of a row
+                      sum takes a DivSqrtRecFN_small(8, 8), so a row can only finish every DIVIDER_INTERVAL cycles
+"""
+
+SD15_BLOCK_CHANNELS = (320, 640, 1280, 1280)
+SD15_ATTENTION_LEVELS = (0, 1, 2)
+SD15_ATTENTION_HEADS = 8
+SD15_TEXT_TOKENS = 77 # the CLIP text embeddings of cross-attention
+GROUPS = 32
+
+# pipeline latency in cycles of the SiLU/GELU designs, see their sbt tests and the README:
+# the PWL designs take 8 cycles, 11 for the variants with the extra 1 - f(-x) adder for negative inputs
+ACTIVATION_LATENCIES = {
+    "lut": 1,
+    "invSigmoid": 6,
+    "hsilu": 5,
+    **{f"pwl{variant}": 8 if properties["signedInput"] else 11 for variant, properties in PWL_VARIANTS.items()},
+}
+DYT_LATENCY = 3
+RANGEGN_LATENCIES = {320: 29, 640: 31, 1280: 39} # README, the C values rangeGN.scala accepts
+DIVIDER_INTERVAL = 10 # DivSqrtRecFN_small(8, 8): cycleNum counts down from sigWidth + 2 before inReady is set again
+SOFTMAX_PASSES = 3
+SOFTMAX_LATENCY = 1 + (3 + 1 + 1) + 3 + DIVIDER_INTERVAL + 1 # max, exp, accumulate, reciprocal, normalize
+# the "CPU SoftMax" of visualizeSpeedupBarCharts.py: 233,255,710 cycles for the self-attention SoftMax of down0.attention0
+CPU_SOFTMAX_CYCLES_PER_ELEMENT = 233255710 / (SD15_ATTENTION_HEADS * 4096 * 4096)
+
+DEFAULT_ACCELERATOR = {"spatialArraySize": 16, "activation": "pwl20NonUniform", "rangeGNInterval": DIVIDER_INTERVAL,
+                       "fuseGroupNormActivation": True, "softmax": "cpu"}
+
+
+def rangeGNLatency(C):
+    """
+    Latency of rangeGN in cycles. For C values rangeGN.scala does not accept (the concatenated skip connections
+    of the up path, 960, 1920 and 2560) the adder tree formula of rangeGN.scala is used: 3 * ceil(log2(N)) + 17.
+    """
+    return RANGEGN_LATENCIES.get(C, 3 * math.ceil(math.log2(C // GROUPS)) + 17)
+
+
+def _resnetLayers(name, level, height, width, inChannels, outChannels):
+    layers = []
+    for norm, channels in [("1", inChannels), ("2", outChannels)]:
+        shape = (height, width, channels)
+        layers.append({"name": f"{name}.norm{norm}", "level": level, "block": "resnet", "op": "groupNorm", "shape": shape})
+        layers.append({"name": f"{name}.silu{norm}", "level": level, "block": "resnet", "op": "silu", "shape": shape,
+                       "afterGroupNorm": True})
+    return layers
+
+
+def _transformerLayers(name, level, height, width, channels, softmax=False):
+    layers = [{"name": f"{name}.norm", "level": level, "block": "transformer", "op": "groupNorm", "shape": (height, width, channels)}]
+    for norm, keys in [("1", height * width), ("2", SD15_TEXT_TOKENS), ("3", None)]: # self-attention, cross-attention, feed-forward
+        layers.append({"name": f"{name}.layerNorm{norm}", "level": level, "block": "transformer", "op": "layerNorm",
+                       "shape": (height * width, channels)})
+        if softmax and keys is not None: # one row of attention scores per query token and head
+            layers.append({"name": f"{name}.softmax{norm}", "level": level, "block": "transformer", "op": "softmax",
+                           "shape": (SD15_ATTENTION_HEADS, height * width, keys)})
+    # GEGLU: proj(x) is split in two halves of 4C channels, GELU of one half gates the other
+    layers.append({"name": f"{name}.gelu", "level": level, "block": "transformer", "op": "gelu", "shape": (height * width, 4 * channels)})
+    return layers
+
+
+def unetLayers(latentSize=64, blockChannels=SD15_BLOCK_CHANNELS, attentionLevels=SD15_ATTENTION_LEVELS, layersPerBlock=2,
+               softmax=False):
+    """
+    The layers of one UNet pass that toplevel computes, in execution order, as dicts with
+    name, level, block ("resnet", "transformer" or "output"), op ("groupNorm", "silu", "gelu" or "layerNorm") and shape.
+    With softmax=True the two attention SoftMaxes of every transformer block are included, op "softmax" with shape
+    (heads, queries, keys).
+    """
+    layers = []
+    skips = [blockChannels[0]] # conv_in
+    channels = blockChannels[0]
+    size = latentSize
+    for level, outChannels in enumerate(blockChannels):
+        for i in range(layersPerBlock):
+            layers += _resnetLayers(f"down{level}.resnet{i}", level, size, size, channels, outChannels)
+            channels = outChannels
+            if level in attentionLevels:
+                layers += _transformerLayers(f"down{level}.attention{i}", level, size, size, channels, softmax)
+            skips.append(channels)
+        if level < len(blockChannels) - 1:
+            size //= 2 # downsampling conv
+            skips.append(channels)
+
+    level = len(blockChannels) - 1
+    layers += _resnetLayers("mid.resnet0", level, size, size, channels, channels)
+    layers += _transformerLayers("mid.attention0", level, size, size, channels, softmax)
+    layers += _resnetLayers("mid.resnet1", level, size, size, channels, channels)
+
+    for level in reversed(range(len(blockChannels))):
+        outChannels = blockChannels[level]
+        for i in range(layersPerBlock + 1):
+            inChannels = channels + skips.pop() # the skip connection is concatenated to the input
+            layers += _resnetLayers(f"up{level}.resnet{i}", level, size, size, inChannels, outChannels)
+            channels = outChannels
+            if level in attentionLevels:
+                layers += _transformerLayers(f"up{level}.attention{i}", level, size, size, channels, softmax)
+        if level > 0:
+            size *= 2 # upsampling
+
+    layers.append({"name": "out.norm", "level": 0, "block": "output", "op": "groupNorm", "shape": (size, size, channels)})
+    layers.append({"name": "out.silu", "level": 0, "block": "output", "op": "silu", "shape": (size, size, channels),
+                   "afterGroupNorm": True})
+    return layers
+
+
+def layerCycles(layer, spatialArraySize=16, activation="pwl20NonUniform", rangeGNInterval=DIVIDER_INTERVAL,
+                fuseGroupNormActivation=True, softmax="cpu"):
+    """
+    Cycles toplevel needs for one layer, returns the layer with elements, cycles, latency and supported added.
+    supported is False where toplevel.scala cannot run the layer: rangeGN only exists for C = 320, 640 and 1280, and it
+    needs all C/32 channels of a group on the lanes at once. GELU layers are never supported: mux2 selects on sel1(1), so
+    in GELU mode it routes demux1.out(1) to out_a instead of the activation (see simulateToplevel.datapathRoute), and their
+    cycles are those the lanes would take if it routed the GELU output.
+    SoftMax layers take the measured CPU cycles per element with softmax="cpu", the softmax unit with softmax="hardware".
+    """
+    elements = math.prod(layer["shape"])
+    supported = True
+    if layer["op"] == "softmax":
+        if softmax not in ("cpu", "hardware"):
+            raise ValueError(f"Unsupported softmax '{softmax}'. Use 'cpu' or 'hardware'.")
+        if softmax == "cpu":
+            latency = 0
+            cycles = round(elements * CPU_SOFTMAX_CYCLES_PER_ELEMENT)
+        else:
+            rows, length = elements // layer["shape"][-1], layer["shape"][-1]
+            latency = SOFTMAX_LATENCY
+            cycles = rows * max(SOFTMAX_PASSES * math.ceil(length / spatialArraySize), DIVIDER_INTERVAL) + latency
+    elif layer["op"] == "groupNorm":
+        C = layer["shape"][-1]
+        N = C // GROUPS
+        latency = rangeGNLatency(C)
+        cycles = (elements // N) * max(rangeGNInterval, math.ceil(N / spatialArraySize)) + latency
+        supported = C in RANGEGN_LATENCIES and N <= spatialArraySize
+    else:
+        latency = DYT_LATENCY if layer["op"] == "layerNorm" else ACTIVATION_LATENCIES[activation]
+        supported = layer["op"] != "gelu" # mux2 never routes the GELU output to out_a
+        if fuseGroupNormActivation and layer.get("afterGroupNorm"):
+            cycles = latency # streams right behind the rangeGN outputs, in the same pass
+        else:
+            cycles = math.ceil(elements / spatialArraySize) + latency
+    return dict(layer, elements=elements, cycles=cycles, latency=latency, supported=supported)
+
+
+def unetCycles(layers=None, **accelerator):
+    """
+    layerCycles of every layer of a UNet pass (unetLayers() by default), for the accelerator parameters of layerCycles.
+    """
+    accelerator = dict(DEFAULT_ACCELERATOR, **accelerator)
+    return [layerCycles(layer, **accelerator) for layer in (unetLayers() if layers is None else layers)]
+
+
+def cycleBreakdown(results, key="op"):
+    """
+    Total cycles per value of a layer key ("op", "block", "level", ...), e.g. {"groupNorm": ..., "silu": ...}.
+    """
+    totals = {}
+    for result in results:
+        totals[result[key]] = totals.get(result[key], 0) + result["cycles"]
+    return totals
+
+
+def blockCycles(name, **accelerator):
+    """
+    Cycles per op of one block, e.g. blockCycles("down0.resnet0") or blockCycles("down0.attention0"),
+    as {op: (number of layers, cycles)}, the way the bar charts of visualizeSpeedupBarCharts.py list them.
+    """
+    breakdown = {}
+    for result in unetCycles(**accelerator):
+        if result["name"].startswith(name + "."):
+            count, cycles = breakdown.get(result["op"], (0, 0))
+            breakdown[result["op"]] = (count + 1, cycles + result["cycles"])
+    return breakdown
+
+
+def printCycles(results):
+    total = sum(result["cycles"] for result in results)
+    for op, cycles in cycleBreakdown(results).items():
+        print(f"  {op:<10} {cycles:>12,} cycles ({cycles / total:6.1%})")
+    unsupported = [result["name"] for result in results if not result["supported"]]
+    print(f"  {'total':<10} {total:>12,} cycles, {len(unsupported)} of {len(results)} layers not supported by toplevel.scala")
+
+
+if __name__ == "__main__":
+    layers = unetLayers()
+    assert sum(layer["op"] == "groupNorm" for layer in layers) == 61 and sum(layer["op"] == "layerNorm" for layer in layers) == 48
+    assert layers[-1]["shape"] == (64, 64, 320)
+
+    # the hand-entered cycles of visualizeSpeedupBarCharts.py: 16 lanes, 3 cycles per group and separate passes
+    handEntered = unetCycles(rangeGNInterval=3, fuseGroupNormActivation=False)
+    resnet = {result["op"]: result for result in handEntered if result["name"].startswith("down0.resnet0.")}
+    assert resnet["groupNorm"]["cycles"] - resnet["groupNorm"]["latency"] == 786432 // 2
+    assert resnet["silu"]["cycles"] - resnet["silu"]["latency"] == 163840 // 2
+    assert not any(result["supported"] for result in handEntered if result["op"] == "gelu")
+
+    print("SD1.5 UNet pass on toplevel.scala (default accelerator):")
+    printCycles(unetCycles())
+    for spatialArraySize in [8, 16, 32, 64]:
+        for rangeGNInterval in [DIVIDER_INTERVAL, 1]:
+            results = unetCycles(spatialArraySize=spatialArraySize, rangeGNInterval=rangeGNInterval)
+            breakdown = cycleBreakdown(results)
+            print(f"{spatialArraySize:>3} lanes, a group every {rangeGNInterval:>2} cycles: {sum(breakdown.values()):>12,} cycles"
+                  f"  (groupNorm {breakdown['groupNorm']:>11,}, activations and DyT {sum(breakdown.values()) - breakdown['groupNorm']:>10,})")
+    for activation in ACTIVATION_LATENCIES:
+        total = sum(result["cycles"] for result in unetCycles(activation=activation, fuseGroupNormActivation=False))
+        print(f"{activation:<26} {total:>12,} cycles without GN+act fusion")
+
+    # the next offload: the attention SoftMaxes on the CPU or on a softmax unit next to the activation lanes
+    withSoftmax = unetLayers(softmax=True)
+    assert sum(layer["op"] == "softmax" for layer in withSoftmax) == 32 and len(withSoftmax) == len(layers) + 32
+    cpu = {result["name"]: result for result in unetCycles(withSoftmax, softmax="cpu")}
+    assert cpu["down0.attention0.softmax1"]["cycles"] == 233255710
+    for spatialArraySize in [16, 32, 64]:
+        results = unetCycles(withSoftmax, spatialArraySize=spatialArraySize, softmax="hardware")
+        softmaxCycles = sum(result["cycles"] for result in results if result["op"] == "softmax")
+        cpuCycles = sum(result["cycles"] for result in cpu.values() if result["op"] == "softmax")
+        print(f"{spatialArraySize:>3} lanes: SoftMax {cpuCycles:>14,} cycles on the CPU, {softmaxCycles:>12,} on the softmax unit "
+              f"({cpuCycles / softmaxCycles:.0f}x), rest of toplevel {sum(result['cycles'] for result in results) - softmaxCycles:>12,}")
@@ -0,0 +1,227 @@
+import numpy as np
+import torch
+from torch import nn
+from bf16Codec import floatToBF16
+from compileDesign import compileTable
+from estimateArea import SYNTHESIZED_DESIGNS
+from lutGolden import lutActivation
+from rangeGNGolden import GROUPS, RANGEGN_CONSTANTS, rangeGN
+
+"""
+Drop-in torch.nn.Modules that run a model on the CPU with the activations and normalizations of the hardware: the input
+is cast to BF16, goes through the golden model of the chosen design and the BF16 result is cast back to the
+input dtype. They are for inference, no gradient flows through a table. Designs are the labels of the synthesized designs
+(SiLU1a ... SiLU5b, GELU1a ... GELU4b, DyT1a ... DyT1f, see estimateArea.SYNTHESIZED_DESIGNS) or any sweepDesignSpace
+configuration dict.
+
+Every activation is a unary function on BF16 codes, so it runs as one gather from its compiled 65,536-entry table (see
+compileDesign.py), which keeps the emulation within a small multiple of the native op. DyT compiles one table per BF16
+value of alpha. rangeGN normalizes the channels of one pixel per group, so it runs rangeGNGolden on channel-last codes
+and is as slow as that model. test_torchHardwareModules.py compares every module against its golden model on all 65,536
+BF16 codes, it is skipped where torch is not installed.
+
+replaceModules swaps every nn.SiLU, nn.GELU, DyT (a module with alpha, weight and bias, as in the DyT paper) and
+rangeGN-sized nn.GroupNorm of a model for its hardware version, in place.
+"""
+
+DESIGN_CONFIGS = {label: config for label, _, config in SYNTHESIZED_DESIGNS}
+DYT_CLASS_NAMES = ("DyT", "DynamicTanh")
+
+
+def _designConfig(design, function=None):
+    if isinstance(design, dict):
+        return design
+    if design not in DESIGN_CONFIGS:
+        raise ValueError(f"No golden model for design '{design}', choose one of {sorted(DESIGN_CONFIGS)} or pass a configuration.")
+    config = DESIGN_CONFIGS[design]
+    if function is not None and config["function"] != function:
+        raise ValueError(f"Design '{design}' computes {config['function']}, not {function}.")
+    return config
+
+
+def _tableTensor(table):
+    # int16 so that the gathered codes can be viewed as torch.bfloat16
+    return torch.from_numpy(np.ascontiguousarray(table).view(np.int16).copy())
+
+
+def bf16Codes(x):
+    """
+    The BF16 codes of a tensor (rounded to nearest even), as int32 in [0, 65535] to index a table with.
+    """
+    return x.to(torch.bfloat16).view(torch.int16).to(torch.int32) & 0xFFFF
+
+
+def lookup(table, x):
+    """
+    A compiled design on a tensor: x to BF16, one gather from the int16 table, and back to the dtype of x.
+    """
+    output = torch.index_select(table, 0, bf16Codes(x).reshape(-1))
+    return output.view(torch.bfloat16).reshape(x.shape).to(x.dtype)
+
+
+class HardwareActivation(nn.Module):
+    """
+    A SiLU or GELU design, e.g. HardwareActivation("SiLU1f") in place of nn.SiLU().
+    """
+    def __init__(self, design):
+        super().__init__()
+        config = _designConfig(design)
+        if config["function"] not in ("silu", "gelu"):
+            raise ValueError(f"HardwareActivation computes SiLU or GELU, use HardwareDyT for {config['function']}.")
+        self.design = design if isinstance(design, str) else config.get("name", config["family"])
+        self.register_buffer("table", _tableTensor(compileTable(config)), persistent=False)
+
+    def forward(self, x):
+        return lookup(self.table, x)
+
+    def extra_repr(self):
+        return f"design={self.design}"
+
+
+class HardwareDyT(nn.Module):
+    """
+    DyT, weight * tanh(alpha * x) + bias, with tanh(alpha * x) from a DyT LUT design (DyTUsingLUT). alpha is learnable
+    like in the DyT paper, the table used is the one of alpha rounded to BF16. The affine part stays in the input dtype.
+    """
+    def __init__(self, design, normalizedShape, alphaInit=0.5, channelsLast=True):
+        super().__init__()
+        config = _designConfig(design, "dyt")
+        if config["family"] != "lut":
+            raise ValueError(f"Only the DyT LUT designs take alpha, got family '{config['family']}'.")
+        self.design = design if isinstance(design, str) else config.get("name", config["family"])
+        self.intBits, self.fracBits = config["intBits"], config["fracBits"]
+        self.channelsLast = channelsLast
+        self.alpha = nn.Parameter(torch.full((1,), float(alphaInit)))
+        self.weight = nn.Parameter(torch.ones(normalizedShape))
+        self.bias = nn.Parameter(torch.zeros(normalizedShape))
+        self._tables = {} # BF16 code of alpha -> table
+
+    def table(self, alphaCode):
+        if alphaCode not in self._tables:
+            spec = {"family": "lut", "function": "dyt", "intBits": self.intBits, "fracBits": self.fracBits, "alpha": alphaCode}
+            design = lambda codes: lutActivation(codes, "dyt", self.intBits, self.fracBits, alpha=alphaCode)
+            self._tables[alphaCode] = _tableTensor(compileTable(design, spec, modules=("lutGolden",)))
+        return self._tables[alphaCode]
+
+    def forward(self, x):
+        alphaCode = int(floatToBF16(np.float32(self.alpha.item()), rounding="rne"))
+        output = lookup(self.table(alphaCode).to(x.device), x)
+        if self.channelsLast:
+            return output * self.weight + self.bias
+        return output * self.weight[:, None, None] + self.bias[:, None, None]
+
+    def extra_repr(self):
+        return f"design={self.design}, channelsLast={self.channelsLast}"
+
+
+class HardwareRangeGN(nn.Module):
+    """
+    rangeGN in place of nn.GroupNorm(32, C) on (N, C, ...) inputs, C in {320, 640, 1280}, with the affine part of
+    GroupNorm in the input dtype. Runs the golden model in numpy, so the input is moved to the CPU.
+    """
+    def __init__(self, numChannels, affine=True):
+        super().__init__()
+        if numChannels not in RANGEGN_CONSTANTS:
+            raise ValueError(f"rangeGN only exists for C in {sorted(RANGEGN_CONSTANTS)}, got C = {numChannels}.")
+        self.numChannels = numChannels
+        self.affine = affine
+        if affine:
+            self.weight = nn.Parameter(torch.ones(numChannels))
+            self.bias = nn.Parameter(torch.zeros(numChannels))
+
+    def forward(self, x):
+        channelsLast = x.detach().to(torch.bfloat16).view(torch.int16).movedim(1, -1).contiguous().cpu().numpy().view(np.uint16)
+        codes = torch.from_numpy(rangeGN(channelsLast).view(np.int16)).movedim(-1, 1).to(x.device)
+        output = codes.view(torch.bfloat16).to(x.dtype)
+        if self.affine:
+            shape = (1, -1) + (1,) * (x.dim() - 2)
+            output = output * self.weight.reshape(shape) + self.bias.reshape(shape)
+        return output
+
+    def extra_repr(self):
+        return f"numChannels={self.numChannels}, affine={self.affine}"
+
+
+def _isDyT(module):
+    return type(module).__name__ in DYT_CLASS_NAMES and all(hasattr(module, name) for name in ("alpha", "weight", "bias"))
+
+
+def hardwareModule(module, silu=None, gelu=None, dyt=None, groupNorm=False):
+    """
+    The hardware version of one module, carrying over its parameters, or None if it is not replaced.
+    """
+    if silu is not None and isinstance(module, nn.SiLU):
+        return HardwareActivation(silu)
+    if gelu is not None and isinstance(module, nn.GELU):
+        return HardwareActivation(gelu)
+    if dyt is not None and _isDyT(module):
+        replacement = HardwareDyT(dyt, tuple(module.weight.shape), channelsLast=getattr(module, "channels_last", True))
+        replacement.load_state_dict(module.state_dict(), strict=False)
+        return replacement.to(module.weight.device)
+    if groupNorm and isinstance(module, nn.GroupNorm) and module.num_groups == GROUPS and module.num_channels in RANGEGN_CONSTANTS:
+        replacement = HardwareRangeGN(module.num_channels, module.affine)
+        if module.affine:
+            replacement.load_state_dict(module.state_dict())
+        return replacement.to(module.weight.device) if module.affine else replacement
+    return None
+
+
+def replaceModules(model, silu=None, gelu=None, dyt=None, groupNorm=False):
+    """
+    Swaps every matching submodule of model in place: nn.SiLU for the design silu, nn.GELU for gelu, DyT modules for the
+    DyT design dyt and, with groupNorm=True, nn.GroupNorm(32, C) for rangeGN. Returns model and the names of the swapped
+    submodules. Note that nn.GELU(approximate="tanh") is swapped too, all GELU designs approximate the erf GELU.
+    """
+    replaced = []
+    for name, child in list(model.named_children()):
+        replacement = hardwareModule(child, silu, gelu, dyt, groupNorm)
+        if replacement is None:
+            replaced += [f"{name}.{childName}" for childName in replaceModules(child, silu, gelu, dyt, groupNorm)[1]]
+        else:
+            setattr(model, name, replacement)
+            replaced.append(name)
+    return model, replaced
+
+
+if __name__ == "__main__":
+    import time
+    from bf16Codec import allBF16Codes, BF16ToFloat
+    from sweepDesignSpace import buildDesign
+
+    # the golden model on every BF16 code, through the float32 cast and back, see test_torchHardwareModules.py for all designs
+    codes = allBF16Codes()
+    x = torch.from_numpy(BF16ToFloat(codes).astype(np.float32))
+    for label in ["SiLU1a", "GELU1f", "SiLU2b", "GELU3", "SiLU4b"]:
+        output = HardwareActivation(label)(x).to(torch.bfloat16).view(torch.int16).numpy().view(np.uint16)
+        expected = buildDesign(DESIGN_CONFIGS[label])(codes)
+        nan = np.isnan(BF16ToFloat(expected))
+        assert np.array_equal(output[~nan], expected[~nan]), label
+    dyt = HardwareDyT("DyT1f", 8)
+    output = dyt(x[:, None].expand(-1, 8)).detach()[:, 0].to(torch.bfloat16).view(torch.int16).numpy().view(np.uint16)
+    expected = lutActivation(codes, "dyt", 3, 6, alpha=0x3F00)
+    nan = np.isnan(BF16ToFloat(expected))
+    assert np.array_equal(output[~nan], expected[~nan])
+
+    features = torch.randn(2, 320, 8, 8) * 2 + 0.5
+    expected = rangeGN(features.to(torch.bfloat16).view(torch.int16).movedim(1, -1).contiguous().numpy().view(np.uint16))
+    output = HardwareRangeGN(320)(features).detach().to(torch.bfloat16).view(torch.int16).movedim(1, -1).contiguous().numpy().view(np.uint16)
+    assert np.array_equal(output, expected)
+
+    model = nn.Sequential(nn.Conv2d(320, 320, 3, padding=1), nn.GroupNorm(32, 320), nn.SiLU(),
+                          nn.Sequential(nn.Conv2d(320, 640, 1), nn.GELU()))
+    model, replaced = replaceModules(model, silu="SiLU1f", gelu="GELU4b", groupNorm=True)
+    assert replaced == ["1", "2", "3.1"], replaced
+    print(model)
+
+    # emulation overhead against the native op, 16M elements
+    x = torch.randn(1 << 24)
+    for name, native, emulated in [("SiLU", nn.SiLU(), HardwareActivation("SiLU1f")),
+                                   ("GELU", nn.GELU(), HardwareActivation("GELU4b"))]:
+        times = []
+        for module in [native, emulated]:
+            module(x)
+            start = time.perf_counter()
+            module(x)
+            times.append(time.perf_counter() - start)
+        print(f"{name}: native {x.numel() / times[0] / 1e6:7.1f} M elements/s, emulated {x.numel() / times[1] / 1e6:7.1f} M elements/s "
+              f"({times[1] / times[0]:.1f}x)")
@@ -0,0 +1,259 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory
+import numpy as np
+from bf16Codec import floatToBF16, BF16ToFloat, allBF16Codes, isFiniteBF16
+from fpUnitsGolden import fpMult16ALT, fpAdd16ALT
+from rangeGNGolden import bf16Divide
+from divSqrtGolden import divSqrtRecFNSmall
+
+"""
+Exhaustive verification of the two-operand BF16 units against correctly rounded IEEE results, on all 2^32 operand pairs
+instead of the handful of points of FPMultTest.scala and FPAddTest.scala.
+
+The operand space is cut into chunks of rowsPerChunk a codes x all 65,536 b codes. Worker processes only get the a codes of
+a chunk and write their per-row results straight into shared-memory buffers, so nothing but a few counterexamples goes
+through a pipe and the run scales with the number of cores. Per a code the buffers hold:
+
+    histogram     ULP differences between unit and reference, in the bins of ULP_BIN_EDGES (pairs with a NaN left out)
+    classCounts   mismatching pairs per ERROR_CLASSES entry, the first class that applies
+
+plus the first maxExamples counterexamples of every error class in (a, b) order. With a checkpointPath the buffers and the
+finished chunks are saved every checkpointSeconds, and a run on the same unit and a codes resumes from there.
+
+The references are exact: a BF16 product fits in float32, and float32 sums and quotients rounded again to nearest even
+in BF16 are correctly rounded, since 24 >= 2 * 8 + 2 bits rule out double rounding errors.
+"""
+
+# ULP difference bins: 0, 1, 2, 3-4, 5-8, ..., the ordinal distance between two codes can be at most 65,280
+ULP_BIN_EDGES = np.array([0, 1, 2] + [2**k + 1 for k in range(1, 17)], dtype=np.int64)
+ERROR_CLASSES = (
+    "nonFiniteOperand", # an operand is an infinity or a NaN, which FPMult16ALT and FPAdd16ALT do not handle
+    "nanResult",        # the unit or the reference gives a NaN
+    "overflow",         # the unit or the reference gives an infinity
+    "subnormal",        # an operand or the reference is subnormal
+    "signedZero",       # both are zero, with different signs
+    "oneUlp",
+    "multiUlp",
+)
+DEFAULT_ROWS_PER_CHUNK = 16
+
+
+def ieeeMultiply(a, b):
+    """
+    a * b correctly rounded to BF16: the float32 product of two 8-bit significands is exact.
+    """
+    with np.errstate(over="ignore", invalid="ignore"):
+        return floatToBF16(BF16ToFloat(a) * BF16ToFloat(b), rounding="rne")
+
+
+def ieeeAdd(a, b):
+    """
+    a + b correctly rounded to BF16.
+    """
+    with np.errstate(over="ignore", invalid="ignore"):
+        return floatToBF16(BF16ToFloat(a) + BF16ToFloat(b), rounding="rne")
+
+
+# unit -> (golden model, correctly rounded reference, operator for printing)
+UNITS = {
+    "FPMult16ALT": (fpMult16ALT, ieeeMultiply, "*"),
+    "FPAdd16ALT": (fpAdd16ALT, ieeeAdd, "+"),
+    "DivSqrtRecFN_small": (divSqrtRecFNSmall, bf16Divide, "/"),
+}
+
+
+def ulpDistance(a, b):
+    """
+    Number of BF16 steps between two codes, with +0 and -0 the same value; infinities are one step past the largest number.
+    """
+    def ordinal(codes):
+        codes = np.asarray(codes, dtype=np.uint16).astype(np.int64)
+        return np.where(codes >> 15, -(codes & 0x7FFF), codes & 0x7FFF)
+    return np.abs(ordinal(a) - ordinal(b))
+
+
+def _isNaN(codes):
+    return (codes & 0x7FFF) > 0x7F80
+
+
+def _isSubnormal(codes):
+    return ((codes & 0x7F80) == 0) & ((codes & 0x7F) != 0)
+
+
+def classifyPairs(a, b, result, reference):
+    """
+    For broadcast operand codes and the unit and reference results: the ULP bin of every pair (-1 where a NaN is involved)
+    and its index in ERROR_CLASSES (-1 where unit and reference agree, any two NaNs agree).
+    """
+    a, b = np.broadcast_arrays(np.asarray(a, dtype=np.uint16), np.asarray(b, dtype=np.uint16))
+    nan = _isNaN(result) | _isNaN(reference)
+    distance = ulpDistance(result, reference)
+    ulpBin = np.where(nan, -1, np.searchsorted(ULP_BIN_EDGES, distance, side="right") - 1)
+    equal = (result == reference) | (_isNaN(result) & _isNaN(reference))
+    errorClass = np.select(
+        [equal, ~isFiniteBF16(a) | ~isFiniteBF16(b), nan, ~isFiniteBF16(result) | ~isFiniteBF16(reference),
+         _isSubnormal(a) | _isSubnormal(b) | _isSubnormal(reference), distance == 0, distance == 1],
+        [-1, 0, 1, 2, 3, 4, 5], 6)
+    return ulpBin, errorClass
+
+
+_shared = {} # the buffers of the current run, attached once per worker process
+
+
+def _attach(names):
+    for key, (name, shape) in names.items():
+        memory = shared_memory.SharedMemory(name=name)
+        _shared[key] = (memory, np.ndarray(shape, dtype=np.int64, buffer=memory.buf))
+
+
+def _verifyChunk(unit, names, chunk, first, aCodes, maxExamples):
+    # runs in a worker: the rows of aCodes against all b codes, written into the shared histogram and class counts
+    if not _shared or _shared["histogram"][0].name != names["histogram"][0]:
+        _attach(names)
+    histogram, classCounts = _shared["histogram"][1], _shared["classCounts"][1]
+    model, reference, _ = UNITS[unit]
+    a = aCodes[:, None]
+    b = allBF16Codes()[None, :]
+    result, expected = model(a, b), reference(a, b)
+    ulpBin, errorClass = classifyPairs(a, b, result, expected)
+    rows = np.arange(len(aCodes))[:, None]
+    bins, classes = len(ULP_BIN_EDGES), len(ERROR_CLASSES)
+    histogram[first:first + len(aCodes)] = np.bincount((rows * bins + ulpBin)[ulpBin >= 0], minlength=len(aCodes) * bins).reshape(-1, bins)
+    classCounts[first:first + len(aCodes)] = np.bincount((rows * classes + errorClass)[errorClass >= 0],
+                                                        minlength=len(aCodes) * classes).reshape(-1, classes)
+    examples = {}
+    for index, name in enumerate(ERROR_CLASSES):
+        row, column = np.nonzero(errorClass == index)
+        examples[name] = [(int(aCodes[i]), int(b[0, j]), int(result[i, j]), int(expected[i, j]))
+                          for i, j in zip(row[:maxExamples], column[:maxExamples])]
+    return chunk, examples
+
+
+def _saveCheckpoint(path, unit, aCodes, done, histogram, classCounts, examples):
+    # written next to the checkpoint and renamed, so an interrupted save leaves the previous checkpoint intact
+    temporaryPath = path + ".tmp.npz"
+    np.savez(temporaryPath, unit=unit, aCodes=aCodes, done=done, histogram=histogram, classCounts=classCounts,
+             examples=np.array([[name, *example] for name, classExamples in examples.items() for example in classExamples],
+                               dtype=object).reshape(-1, 5))
+    os.replace(temporaryPath, path)
+
+
+def _loadCheckpoint(path, unit, aCodes, chunks):
+    if not path or not os.path.exists(path):
+        return None
+    with np.load(path, allow_pickle=True) as checkpoint:
+        if str(checkpoint["unit"]) != unit or not np.array_equal(checkpoint["aCodes"], aCodes) or len(checkpoint["done"]) != chunks:
+            raise ValueError(f"The checkpoint {path} belongs to another run, remove it or use another checkpointPath.")
+        examples = {name: [] for name in ERROR_CLASSES}
+        for name, *example in checkpoint["examples"].tolist():
+            examples[name].append(tuple(example))
+        return checkpoint["done"].copy(), checkpoint["histogram"], checkpoint["classCounts"], examples
+
+
+def verifyUnit(unit, aCodes=None, rowsPerChunk=DEFAULT_ROWS_PER_CHUNK, workers=None, maxExamples=16,
+               checkpointPath=None, checkpointSeconds=60.0, progress=False):
+    """
+    Compares the golden model of a unit in UNITS with its correctly rounded reference for the a codes (all 65,536 by
+    default) against all 65,536 b codes. Returns pairs, the ULP histogram (one count per bin of ULP_BIN_EDGES), the
+    mismatches per error class, the first maxExamples (a, b, unit, reference) counterexamples per class, and per a code
+    the histogram rows and class counts (histogramPerA, classCountsPerA).
+    """
+    if unit not in UNITS:
+        raise ValueError(f"Unsupported unit '{unit}'. Use one of {list(UNITS)}.")
+    aCodes = allBF16Codes() if aCodes is None else np.asarray(aCodes, dtype=np.uint16).reshape(-1)
+    chunks = (len(aCodes) + rowsPerChunk - 1) // rowsPerChunk
+    buffers = {"histogram": (len(aCodes), len(ULP_BIN_EDGES)), "classCounts": (len(aCodes), len(ERROR_CLASSES))}
+    memories = {key: shared_memory.SharedMemory(create=True, size=max(1, int(np.prod(shape))) * 8) for key, shape in buffers.items()}
+    try:
+        arrays = {key: np.ndarray(shape, dtype=np.int64, buffer=memories[key].buf) for key, shape in buffers.items()}
+        checkpoint = _loadCheckpoint(checkpointPath, unit, aCodes, chunks)
+        if checkpoint:
+            done, arrays["histogram"][:], arrays["classCounts"][:], examples = checkpoint
+        else:
+            done = np.zeros(chunks, dtype=bool)
+            arrays["histogram"][:] = arrays["classCounts"][:] = 0
+            examples = {name: [] for name in ERROR_CLASSES}
+        names = {key: (memories[key].name, shape) for key, shape in buffers.items()}
+
+        start = lastCheckpoint = time.perf_counter()
+        pending = [chunk for chunk in range(chunks) if not done[chunk]]
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(_verifyChunk, unit, names, chunk, chunk * rowsPerChunk,
+                                       aCodes[chunk * rowsPerChunk:(chunk + 1) * rowsPerChunk], maxExamples) for chunk in pending]
+            for finished, future in enumerate(as_completed(futures), 1):
+                chunk, chunkExamples = future.result()
+                done[chunk] = True
+                for name, classExamples in chunkExamples.items():
+                    # chunks finish in any order, keeping the smallest (a, b) keeps the first counterexamples
+                    examples[name] = sorted(examples[name] + classExamples)[:maxExamples]
+                now = time.perf_counter()
+                if checkpointPath and now - lastCheckpoint > checkpointSeconds:
+                    _saveCheckpoint(checkpointPath, unit, aCodes, done, arrays["histogram"], arrays["classCounts"], examples)
+                    lastCheckpoint = now
+                if progress:
+                    pairs = finished * rowsPerChunk * 65536
+                    print(f"  {unit}: {int(done.sum())}/{chunks} chunks, {pairs / (now - start) / 1e6:.1f} M pairs/s, "
+                          f"{int(arrays['classCounts'].sum())} mismatches", flush=True)
+        if checkpointPath:
+            _saveCheckpoint(checkpointPath, unit, aCodes, done, arrays["histogram"], arrays["classCounts"], examples)
+        classCounts = arrays["classCounts"].sum(axis=0)
+        return {"unit": unit, "pairs": len(aCodes) * 65536, "histogram": arrays["histogram"].sum(axis=0),
+                "mismatches": dict(zip(ERROR_CLASSES, classCounts.tolist())), "examples": examples,
+                "histogramPerA": arrays["histogram"].copy(), "classCountsPerA": arrays["classCounts"].copy(),
+                "seconds": time.perf_counter() - start}
+    finally:
+        for memory in memories.values():
+            memory.close()
+            memory.unlink()
+
+
+def ulpBinLabels():
+    labels = []
+    for low, high in zip(ULP_BIN_EDGES[:-1], ULP_BIN_EDGES[1:] - 1):
+        labels.append(f"{low}" if low == high else f"{low}-{high}")
+    return labels + [f">={ULP_BIN_EDGES[-1]}"]
+
+
+def printVerification(result):
+    pairs = result["pairs"]
+    operator = UNITS[result["unit"]][2]
+    print(f"{result['unit']}: {pairs:,} operand pairs in {result['seconds']:.1f} s ({pairs / result['seconds'] / 1e6:.1f} M pairs/s)")
+    print("  ULP difference: " + "  ".join(f"{label}: {count:,}" for label, count in zip(ulpBinLabels(), result["histogram"].tolist()) if count))
+    for name, count in result["mismatches"].items():
+        if count:
+            example = ", ".join(f"0x{a:04X} {operator} 0x{b:04X} = 0x{unit:04X} (IEEE 0x{reference:04X})"
+                                for a, b, unit, reference in result["examples"][name][:3])
+            print(f"  {name:<17} {count:>13,} ({count / pairs:8.3%})  e.g. {example}")
+
+
+if __name__ == "__main__":
+    import sys
+    import tempfile
+
+    assert ulpDistance(0x0000, 0x8000) == 0 and ulpDistance(0x0001, 0x8001) == 2 and ulpDistance(0x7F7F, 0x7F80) == 1
+    assert np.all(ieeeMultiply(0x3FC0, 0x3FC0) == 0x4010) and np.all(ieeeAdd(0x3F80, 0x3B80) == 0x3F80) # 1.5^2, 1 + 2^-8 ties to even
+
+    # every 64th a code against all b codes, or the full 2^32 pairs with --exhaustive
+    exhaustive = "--exhaustive" in sys.argv
+    aCodes = allBF16Codes() if exhaustive else (np.arange(0, 1 << 16, 64) | (np.arange(1024) & 0x3F)).astype(np.uint16)
+    results = {}
+    for unit in UNITS:
+        results[unit] = verifyUnit(unit, aCodes, progress=exhaustive)
+        printVerification(results[unit])
+
+    # a run interrupted after every other chunk resumes from its checkpoint to the same result
+    checkpointPath = os.path.join(tempfile.mkdtemp(), "FPAdd16ALT.npz")
+    verifyUnit("FPAdd16ALT", aCodes[:256], rowsPerChunk=16, checkpointPath=checkpointPath)
+    with np.load(checkpointPath, allow_pickle=True) as checkpoint:
+        interrupted = dict(checkpoint)
+    interrupted["done"][1::2] = False
+    for chunk in range(1, 16, 2):
+        interrupted["histogram"][chunk * 16:(chunk + 1) * 16] = interrupted["classCounts"][chunk * 16:(chunk + 1) * 16] = 0
+    np.savez(checkpointPath, **interrupted)
+    resumed = verifyUnit("FPAdd16ALT", aCodes[:256], rowsPerChunk=16, checkpointPath=checkpointPath)
+    uninterrupted = verifyUnit("FPAdd16ALT", aCodes[:256], rowsPerChunk=16)
+    assert resumed["mismatches"] == uninterrupted["mismatches"] and np.array_equal(resumed["histogram"], uninterrupted["histogram"])
+    assert resumed["examples"] == uninterrupted["examples"]
+    os.remove(checkpointPath)
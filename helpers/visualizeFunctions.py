@@ -4,25 +4,9 @@ import math
 import struct
 from typing import List
 from scipy.special import erf
-
-def getGELUTableValues() -> tuple[List[float], List[float]]:
-    outX = []
-    outY = []
-    for j in np.arange(-3.9375, 4.00000, 0.0625): # -3.9375 inclusive, 4.0000 exclusive
-        gelu_float = round(j*0.5*(1+math.erf(j/math.sqrt(2))), 6)
-        # Convert float32 to 4-byte representation (big-endian)
-        gelu_bytes = struct.pack('>f', np.float32(gelu_float))
-        # Take the first 2 bytes (most significant bits) for BF16
-        gelu_bf16_bytes = gelu_bytes[:2]
-        # Convert to bit string
-        gelu_bf16_bits = ''.join(f'{byte:08b}' for byte in gelu_bf16_bytes)
-        # Convert the bf16 back to its float representation
-        gelu_bf16_int = int(gelu_bf16_bits, 2) << 16  # Shift back to 32-bit float position
-        gelu_bf16_float = struct.unpack('>f', struct.pack('>I', gelu_bf16_int))[0]
-        outX.append(j)
-        outY.append(gelu_bf16_float) # append the gelu_bf16_float value
-    return outX, outY
-
+from bf16Codec import floatToBF16
+from artifactCache import cachedArtifact
+from generateLUTs import functionTableValues
 
 def visualizeGELUAndApprox():
     gelu_plot = plt.figure(figsize=(10, 8)) 
@@ -53,7 +37,7 @@ def visualizeGELUAndApprox():
     # for x<=-4, y=0
     # for -4<x<4, y=one of 128 values out of a LookUpTable: just plot these values as points
     # for x>=4, y=x
-    outX, outY = getGELUTableValues()
+    outX, outY = functionTableValues("gelu")
 
     approx_gelu = np.piecewise(x, [x < -4, (x >= -4) & (x < 4), x >= 4], [0, lambda x: np.nan, lambda x: x]) # use np.nan for -4<x<4
     plt.plot(outX, outY, '.', color=colors[2], markersize=3.6)
@@ -64,25 +48,6 @@ def visualizeGELUAndApprox():
     # plt.subplots_adjust(left=0.15, right=0.85, top=0.95, bottom=0.15)
     plt.show()        
 
-def getSiluTableValues() -> tuple[List[float], List[float]]:
-    outX = []
-    outY = []
-    for j in np.arange(-3.9375, 4.00000, 0.0625): # -3.9375 inclusive, 4.0000 exclusive
-        silu_float = round(j/(1+math.exp(-j)), 6)
-        # Convert float32 to 4-byte representation (big-endian)
-        silu_bytes = struct.pack('>f', np.float32(silu_float))
-        # Take the first 2 bytes (most significant bits) for BF16
-        silu_bf16_bytes = silu_bytes[:2]
-        # Convert to bit string
-        silu_bf16_bits = ''.join(f'{byte:08b}' for byte in silu_bf16_bytes)
-        # Convert the bf16 back to its float representation
-        silu_bf16_int = int(silu_bf16_bits, 2) << 16  # Shift back to 32-bit float position
-        silu_bf16_float = struct.unpack('>f', struct.pack('>I', silu_bf16_int))[0]
-        outX.append(j)
-        outY.append(silu_bf16_float) # append the silu_bf16_float value
-    return outX, outY
-
-
 def getSigmoidTableValues(entries=32) -> tuple[List[float], List[float]]:
     outX = []
     sigmoidLUT = []
@@ -149,7 +114,7 @@ def visualizeSiLUAndApprox():
     # for x<=-4, y=0
     # for -4<x<4, y=LUT(x): one of 128 values out of a LookUpTable: just plot these values as points
     # for x>=4, y=x
-    outX, outY = getSiluTableValues()
+    outX, outY = functionTableValues("silu")
     approx_silu2_left = np.where(x <= -4, 0, np.nan)
     approx_silu2_right = np.where(x >= 4, x, np.nan)
     plt.plot(x, approx_silu2_left, color=colors[2], linestyle='-', linewidth=1.5, label=None)
@@ -177,25 +142,6 @@ def visualizeSiLUAndApprox():
     plt.show()
 
 
-def getDyTTableValues() -> tuple[List[float], List[float]]:
-    outX = []
-    outY = []
-    for j in np.arange(-3.9375, 4.00000, 0.0625): # -3.9375 inclusive, 4.0000 exclusive
-        DyT_float = round(math.tanh(j), 6)
-        # Convert float32 to 4-byte representation (big-endian)
-        DyT_bytes = struct.pack('>f', np.float32(DyT_float))
-        # Take the first 2 bytes (most significant bits) for BF16
-        DyT_bf16_bytes = DyT_bytes[:2]
-        # Convert to bit string
-        DyT_bf16_bits = ''.join(f'{byte:08b}' for byte in DyT_bf16_bytes)
-        # Convert the bf16 back to its float representation
-        DyT_bf16_int = int(DyT_bf16_bits, 2) << 16  # Shift back to 32-bit float position
-        DyT_bf16_float = struct.unpack('>f', struct.pack('>I', DyT_bf16_int))[0]
-        outX.append(j)
-        outY.append(DyT_bf16_float) # append the silu_bf16_float value
-    return outX, outY
-
-
 def visualizeDyTAndApprox():
     DyT_plot = plt.figure(figsize=(10, 8)) 
     plt.rcParams["font.family"] = "Times New Roman"
@@ -225,7 +171,7 @@ def visualizeDyTAndApprox():
     # for x<=-4, y=-1
     # for -4<x<4, y=one of 128 values out of a LookUpTable: just plot these values as points
     # for x>=4, y=+1
-    outX, outY = getDyTTableValues()
+    outX, outY = functionTableValues("tanh")
 
     approx_DyT = np.piecewise(x, [x < -4, (x >= -4) & (x < 4), x >= 4], [-1, lambda x: np.nan, lambda x: 1]) # use np.nan for -4<x<4
     plt.plot(outX, outY, '.', color=colors[1], markersize=3.6)
@@ -532,20 +478,14 @@ def visualizeSigmoidAndFirstOrderApprox():
 def mantissaRounder(function_bytes):
     """
     Rounds the mantissa of a float32 to the nearest BF16 value, if tied round to even.
+    Takes the 4-byte big-endian float32 representation, returns the 2-byte big-endian BF16 representation.
+    For whole arrays, use bf16Codec.floatToBF16(values, rounding="rne") directly.
     """
-    # Take the first 2 bytes (most significant bits) for BF16
-    rounded_function_bf16_bytes = function_bytes[:2]
-    # Convert the last 2 bytes to an integer for comparison
-    mantissa_tail = int.from_bytes(function_bytes[2:4], byteorder='big')
-    retained_mantissa = int.from_bytes(rounded_function_bf16_bytes, byteorder='big')
-    if ((mantissa_tail > 0x8000) or (mantissa_tail==0x8000 and retained_mantissa&1)): # If (bit 15 is 1 and any lower bit is 1) or if (bit 15 is 1 and LSB of retained 7-bit mantissa is 1), round up
-        # Convert the first 2 bytes to int, add 1, then back to bytes
-        rounded_bf16_int = int.from_bytes(rounded_function_bf16_bytes, byteorder='big') + 1 # rounding up
-        return rounded_bf16_int.to_bytes(2, byteorder='big')
-    else:
-        return rounded_function_bf16_bytes # else we can just truncate(=rounding down)
+    function_float = np.frombuffer(function_bytes, dtype='>f4')
+    return int(floatToBF16(function_float, rounding="rne")[0]).to_bytes(2, byteorder='big')
 
-def createBreakpoints(min, max, step, function):
+@cachedArtifact("visualizeFunctions.breakpoints")
+def _createBreakpoints(min, max, step, function):
     breakpoints = []
     # Create breakpoints for the sigmoid function, or for the silu function
     j= min
@@ -569,7 +509,11 @@ def createBreakpoints(min, max, step, function):
         # breakpoints.append((round(j,14), round(function_bf16_float, 14))) # round to 9 decimal places
         breakpoints.append((j, function_float))
         j += step
-    return breakpoints
+    return np.array(breakpoints)
+
+
+def createBreakpoints(min, max, step, function):
+    return [tuple(breakpoint) for breakpoint in _createBreakpoints(min, max, step, function).tolist()]
 
 def calculateSlopesAndYIntercepts(breakpoints):
     slopes = []
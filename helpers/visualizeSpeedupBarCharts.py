@@ -1,8 +1,15 @@
 import numpy as np
 from matplotlib.lines import Line2D
 import matplotlib.pyplot as plt
+from toplevelThroughputModel import blockCycles, layerCycles
 
-def bar_chart_silu_speedup():
+
+def accelerated_block_cycles(block, spatial_array_size=16, activation="lut"):
+    # cycles per op of one UNet block on toplevel.scala, one pass per layer like the bars below (no GN+act fusion)
+    breakdown = blockCycles(block, spatialArraySize=spatial_array_size, activation=activation, fuseGroupNormActivation=False)
+    return {op: cycles for op, (_, cycles) in breakdown.items()}
+
+def bar_chart_silu_speedup(spatial_array_size=16, activation="lut"):
     # cpu_silu_cycles = 2621555 # for 32x32x32 input tensor.
     # assume 16by16 systolic array, and thus 16 hardware units in parallel, to compute SiLU activation, each with 1 cycle latency
     # create a bar chart that compares amount of cycles for CPU versus hardware SiLU activation for different sized input tensors [X,Y,C], and plot the relative speedup
@@ -12,7 +19,8 @@ def bar_chart_silu_speedup():
     # 64x64x32: 10632921 -> 64x64x320: 10632921*10
     input_sizes = ['64x64x320', '32x32x640', '16x16x1280', '8x8x1280']  # Input tensor sizes
     cpu_cycles = [10632921*10, 5299805*10, 5299805*5, 5299805*5/4]  # Replace actual CPU cycles for 64x64x320
-    hardware_cycles = [(64*64*320)/16, (32*32*640)/16, (16*16*1280)/16, (8*8*1280)/16]  # Assuming 16 hardware units in parallel
+    shapes = [(64, 64, 320), (32, 32, 640), (16, 16, 1280), (8, 8, 1280)]
+    hardware_cycles = [layerCycles({"op": "silu", "shape": shape}, spatial_array_size, activation)["cycles"] for shape in shapes]  # spatial_array_size lanes in parallel
     speedups = [cpu / hardware for cpu, hardware in zip(cpu_cycles, hardware_cycles)]
     average_speedup = sum(speedups) / len(speedups)
     # Create the bar chart
@@ -116,7 +124,7 @@ def cumulative_bar_chart_transfo_block(systolic_array_size=16, staticmm_ws_cycle
     plt.show()
 
 
-def cumulative_barchart_L0_resnet_and_transformer_block(nonlinearfunctions_on_CPU=True):
+def cumulative_barchart_L0_resnet_and_transformer_block(nonlinearfunctions_on_CPU=True, spatial_array_size=16, activation="lut"):
     plt.rcParams["font.family"] = "Times New Roman"
     ResNet_colors = ["#9231C2", "#366FC0", "#EA190E", "#979595"]
     Transformer_colors = ["#9231C2", "#E1BD4F", "#EA190E", '#366FC0', "#902E28", '#979595']
@@ -134,12 +142,14 @@ def cumulative_barchart_L0_resnet_and_transformer_block(nonlinearfunctions_on_CP
             233255710, 2410756]
     else:
         ResNet_Block_layers = ["2 × CONV3", "2 × range GN", "2 × LUT-based SiLU", "2 × residual addition"]
-        ResNet_Block_layers_cycles = [31749978, 786432, 163840, 1205378]
+        resnet = accelerated_block_cycles("down0.resnet0", spatial_array_size, activation)
+        transformer = accelerated_block_cycles("down0.attention0", spatial_array_size, activation)
+        ResNet_Block_layers_cycles = [31749978, resnet["groupNorm"], resnet["silu"], 1205378]
         Transformer_Block_layers = [
-            "2 × CONV1", "1 × LUT-based GELU", "4 × range GN or LUT-based LN",
+            "2 × CONV1", "1 × LUT-based GELU (not routed by toplevel)", "4 × range GN or LUT-based LN",
             "1 × CPU SoftMax", "9 × MatMuls", "4 × residual addition"]
         Transformer_Block_layers_cycles = [
-            8958538, 81920, (393216+245760),
+            8958538, transformer["gelu"], (transformer["groupNorm"]+transformer["layerNorm"]),
             233255710, (3835741+5719444+13346980+6770071+5795875+1756063), 2410756]
 
     plt.figure(figsize=(12, 2.8))  # Reduce height to bring bars closer
@@ -207,7 +217,7 @@ def cumulative_barchart_L0_resnet_and_transformer_block(nonlinearfunctions_on_CP
     plt.show()
 
 
-def cumulative_barchart_L0_resnet_and_transformer_block_highlight_the_speedup():
+def cumulative_barchart_L0_resnet_and_transformer_block_highlight_the_speedup(spatial_array_size=16, activation="lut"):
     plt.rcParams["font.family"] = "Times New Roman"
     ResNet_colors = ["#9231C2", "#366FC0", "#EA190E", "#979595"]
     Transformer_colors = ["#9231C2", "#EA190E", '#366FC0', "#902E28", "#E1BD4F", '#979595']
@@ -225,12 +235,14 @@ def cumulative_barchart_L0_resnet_and_transformer_block_highlight_the_speedup():
         233255710, (3835741+5719444+13346980+6770071+5795875+1756063), 2410756]
     
     ResNet_Block_layers_accel = ["2 × CONV3", "2 × range GN", "2 × LUT-based SiLU", "2 × residual addition"]
-    ResNet_Block_layers_cycles_accel = [31749978, 786432, 163840, 1205378]
+    resnet = accelerated_block_cycles("down0.resnet0", spatial_array_size, activation)
+    transformer = accelerated_block_cycles("down0.attention0", spatial_array_size, activation)
+    ResNet_Block_layers_cycles_accel = [31749978, resnet["groupNorm"], resnet["silu"], 1205378]
     Transformer_Block_layers_accel = [
-        "2 × CONV1", "1 × LUT-based GELU", "4 × range GN or LUT-based LN",
+        "2 × CONV1", "1 × LUT-based GELU (not routed by toplevel)", "4 × range GN or LUT-based LN",
         "1 × CPU SoftMax", "9 × MatMuls", "4 × residual addition"]
     Transformer_Block_layers_cycles_accel = [
-        8958538, 81920, (393216+245760),
+        8958538, transformer["gelu"], (transformer["groupNorm"]+transformer["layerNorm"]),
         233255710, (3835741+5719444+13346980+6770071+5795875+1756063), 2410756]
 
     plt.figure(figsize=(10, 4.8))  # Reduce height to bring bars closer